@@ -0,0 +1,66 @@
+"""Benchmark PnL attribution between two synthetic snapshots
+
+The current snapshot is the previous one a day later with spot +1%, IV +2
+points, repriced with Black-Scholes, and with 2% of positions closed, 2%
+opened and 2% resized.
+
+Usage: python benchmarks/bench_attribution.py [positions]
+"""
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_pipeline import synthetic_positions
+from src.analysis.attribution import ATTRIBUTION_COMPONENTS, AttributionEngine
+from src.analysis.greeks import GreeksEngine, black_scholes_price
+from src.models.position_book import PositionBook
+from src.services.deribit_client import DeribitClient
+
+def snapshot(payloads, valuation_time: datetime, spot_move: float = 0.0, iv_move: float = 0.0) -> PositionBook:
+    """Book with options marked at their Black-Scholes coin price and futures at spot"""
+    book = DeribitClient.parse_position_book(payloads)
+    options = book.column('is_option')
+    spot = book.column('underlying_price')
+    spot *= 1 + spot_move
+    book.column('mark_iv')[options] += iv_move
+    t = GreeksEngine.time_to_expiry(book, valuation_time)
+    price = black_scholes_price(spot, book.column('strike'), t, book.column('mark_iv') / 100,
+                                book.column('option_type') > 0) / spot
+    book.column('current_price')[:] = np.where(options, price, spot)
+    return book
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    payloads = [pos for positions in synthetic_positions(count + count // 50).values() for pos in positions]
+    start, end = datetime.now(), datetime.now() + timedelta(days=1)
+    churn = count // 50
+
+    previous_payloads = payloads[:count]
+    current_payloads = [dict(pos) for pos in previous_payloads[churn:]] + payloads[count:]
+    for pos in current_payloads[:churn]:
+        pos['size'] *= 1.5
+    previous = snapshot(previous_payloads, start)
+    current = snapshot(current_payloads, end, spot_move=0.01, iv_move=2.0)
+
+    engine = AttributionEngine()
+    engine.attribute(previous, current, start, end)  # warm up
+    timings = []
+    for _ in range(5):
+        t0 = time.perf_counter()
+        attribution = engine.attribute(previous, current, start, end)
+        timings.append(time.perf_counter() - t0)
+    print(f"{count:,} positions attributed in {min(timings) * 1000:.1f} ms")
+
+    totals = AttributionEngine.summary(attribution)
+    for name in ('pnl_change',) + ATTRIBUTION_COMPONENTS:
+        print(f"{name:>14}: {totals[name]:14,.4f}")
+    components = sum(attribution[name] for name in ATTRIBUTION_COMPONENTS)
+    print(f"max |components - pnl_change| per instrument: {np.abs(components - attribution['pnl_change']).max():.2e}")
+
+if __name__ == '__main__':
+    main()
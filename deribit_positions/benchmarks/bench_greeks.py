@@ -0,0 +1,57 @@
+"""Benchmark the vectorized Greeks engine on a synthetic option book
+
+Usage: python benchmarks/bench_greeks.py [legs]
+"""
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.analysis.greeks import GreeksEngine
+from src.models.position_book import PositionBook
+
+def synthetic_option_book(legs: int, seed: int = 7) -> PositionBook:
+    rng = np.random.default_rng(seed)
+    now = np.datetime64('now', 'us')
+    expiry = now + rng.integers(1, 365, legs).astype('timedelta64[D]')
+    spot = 60000.0
+    return PositionBook.from_arrays(
+        [f"BTC-SYN{i}-C" for i in range(legs)],
+        size=rng.uniform(0.1, 10, legs),
+        entry_price=rng.uniform(0.001, 0.1, legs),
+        current_price=rng.uniform(0.001, 0.1, legs),
+        sign=rng.choice(np.array([-1, 1], dtype=np.int8), legs),
+        is_option=np.ones(legs, dtype=bool),
+        option_type=rng.choice(np.array([-1, 1], dtype=np.int8), legs),
+        strike=np.round(spot * rng.uniform(0.5, 1.5, legs), -3),
+        expiry=expiry,
+        timestamp=np.full(legs, now),
+        mark_iv=rng.uniform(30, 120, legs),
+        underlying_price=np.full(legs, spot),
+    )
+
+def main():
+    legs = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    book = synthetic_option_book(legs)
+    engine = GreeksEngine()
+
+    for label, run in [
+        ('position_greeks', lambda: engine.position_greeks(book)),
+        ('portfolio_greeks', lambda: engine.portfolio_greeks(book)),
+        ('expiry_buckets', lambda: engine.expiry_buckets(book)),
+    ]:
+        run()  # warm up
+        timings = []
+        for _ in range(5):
+            start = time.perf_counter()
+            run()
+            timings.append(time.perf_counter() - start)
+        print(f"{label:>18}: {legs:,} legs in {min(timings) * 1000:.1f} ms "
+              f"({legs / min(timings):,.0f} legs/s)")
+
+    print(engine.portfolio_greeks(book))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""Benchmark position ingestion on a synthetic get_positions response
+
+Compares the Position-object path (stdlib JSON, parse_position,
+PositionBook.from_positions) with the columnar path (orjson when installed,
+parse_position_book).
+
+Usage: python benchmarks/bench_ingest.py [positions]
+"""
+import json
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.models.position_book import PositionBook
+from src.services import codec
+from src.services.deribit_client import DeribitClient
+from src.services.instrument_catalog import MONTHS
+
+def synthetic_payloads(count: int, seed: int = 7) -> list:
+    """Option and future position payloads with unique, parseable instrument names"""
+    rng = np.random.default_rng(seed)
+    months = list(MONTHS)
+    payloads = []
+    for i in range(count):
+        day, month, year = 1 + i % 28, months[(i // 28) % 12], 25 + (i // 336) % 4
+        if i % 10 == 0:
+            name, kind = f"BTC-{day}{month}{year}-F{i}", 'future'  # unparseable names fall back to 'kind'
+        else:
+            strike = 1000 * (1 + i // 1344)
+            name, kind = f"BTC-{day}{month}{year}-{strike}-{'C' if i % 2 else 'P'}", 'option'
+        payloads.append({
+            'instrument_name': name,
+            'kind': kind,
+            'size': float(rng.uniform(-10, 10)),
+            'average_price': float(rng.uniform(0.001, 0.1)),
+            'mark_price': float(rng.uniform(0.001, 0.1)),
+            'mark_iv': float(rng.uniform(30, 120)) if kind == 'option' else None,
+            'index_price': 60000.0,
+            'leverage': 10 if kind == 'future' else None,
+            'timestamp': 1_700_000_000_000 + i,
+        })
+    return payloads
+
+def best_of(run, repeat: int = 3) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    body = json.dumps({'jsonrpc': '2.0', 'result': synthetic_payloads(count)}).encode()
+    payloads = json.loads(body)['result']
+    print(f"{count:,} positions, {len(body) / 1e6:.1f} MB response")
+
+    stages = [
+        ('json.loads', lambda: json.loads(body)['result']),
+        (f"codec.loads ({'orjson' if codec.orjson else 'json'})", lambda: codec.loads(body)['result']),
+        ('parse_position', lambda: [DeribitClient.parse_position(pos) for pos in payloads]),
+        ('parse_position_book', lambda: DeribitClient.parse_position_book(payloads)),
+    ]
+    positions = [DeribitClient.parse_position(pos) for pos in payloads]
+    stages.append(('from_positions', lambda: PositionBook.from_positions(positions)))
+    book = DeribitClient.parse_position_book(payloads)
+    stages.append(('book.to_positions', book.to_positions))
+
+    timings = {}
+    for label, run in stages:
+        timings[label] = best_of(run)
+        print(f"{label:>24}: {timings[label] * 1000:8.1f} ms")
+
+    legacy = timings['json.loads'] + timings['parse_position'] + timings['from_positions']
+    columnar = timings[stages[1][0]] + timings['parse_position_book']
+    print(f"{'objects -> book':>24}: {legacy * 1000:8.1f} ms")
+    print(f"{'columnar -> book':>24}: {columnar * 1000:8.1f} ms ({legacy / columnar:.1f}x)")
+
+if __name__ == '__main__':
+    main()
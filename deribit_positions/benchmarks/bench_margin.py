@@ -0,0 +1,60 @@
+"""Benchmark margin estimates and the per-tick margin check of monitor mode
+
+Times MarginEstimator.estimate (standard margin and liquidation prices), the
+portfolio-margin grid, and PositionMonitor.on_update for single-instrument
+ticker updates on a synthetic book.
+
+Usage: python benchmarks/bench_margin.py [positions ...]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_pipeline import UNDERLYINGS, synthetic_positions
+from src.analysis.margin import MarginEstimator
+from src.monitoring.monitor import PositionMonitor
+from src.services.deribit_client import DeribitClient
+from src.services.deribit_stream import PositionStream
+
+TICKS = 1000
+
+def best_time(run, repeat: int = 5) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [100, 1_000, 10_000, 100_000]
+    print(f"{'positions':>10} {'estimate':>10} {'portfolio':>10} {'tick mean':>10} {'tick p99':>10}   (ms)")
+    for count in sizes:
+        payloads = [pos for positions in synthetic_positions(count).values() for pos in positions]
+        book = DeribitClient.parse_position_book(payloads)
+        estimator = MarginEstimator(balances={underlying: 1e9 for underlying in UNDERLYINGS})
+        estimate = best_time(lambda: estimator.estimate(book))
+        portfolio = best_time(lambda: estimator.portfolio_margin(book), repeat=3)
+
+        stream = PositionStream(client_id='bench', client_secret='bench')
+        monitor = PositionMonitor(stream, rules=[], sinks=[], margin=estimator)
+        for payload in payloads:
+            stream._set_position(DeribitClient.parse_position(payload))
+        stream._notify(list(stream.positions))
+        # Only the ticks count towards the latency figures
+        monitor.updates_evaluated = 0
+        monitor.total_evaluation_time = 0.0
+        monitor._recent_latencies.clear()
+        name = payloads[0]['instrument_name']
+        for tick in range(TICKS):
+            stream._apply_ticker({'instrument_name': name, 'mark_price': 60_000.0 + tick})
+            stream._notify([name])
+        latency = monitor.latency_report()
+        print(f"{count:>10,} {estimate * 1000:>10.2f} {portfolio * 1000:>10.1f} "
+              f"{latency['mean_us'] / 1000:>10.2f} {latency['p99_us'] / 1000:>10.2f}")
+
+if __name__ == '__main__':
+    main()
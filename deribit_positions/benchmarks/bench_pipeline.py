@@ -0,0 +1,201 @@
+"""Time every stage of the main.py pipeline offline, against a local mock Deribit server
+
+Stages: auth, instrument catalog, position fetch, parse (Position objects and
+columnar book), market data, RiskCalculator, PositionReporter summary, CSV
+export and plot. Each book size is timed as the best of --repeat runs.
+Results are written as JSON and can be compared with a stored baseline; the
+exit status is 1 when a stage regressed by more than --tolerance. The mock
+server runs in this process, so the network stages include its JSON encoding.
+
+Usage:
+    python benchmarks/bench_pipeline.py [--sizes 10 100 1000 10000 100000] [--repeat 3]
+        [--output results.json] [--baseline benchmarks/baseline.json] [--save-baseline]
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.config import Config
+from src.analysis.risk_calculator import RiskCalculator
+from src.mock.deribit_server import MockDeribitServer, instrument_payload
+from src.reporting.position_reporter import PositionReporter
+from src.services.deribit_client import DeribitClient
+
+DEFAULT_SIZES = [10, 100, 1_000, 10_000, 100_000]
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+STAGES = ('auth', 'catalog', 'fetch', 'parse', 'parse_book', 'market_data', 'risk', 'report', 'csv', 'plot')
+UNDERLYINGS = {'BTC': 60_000.0, 'ETH': 3_000.0}
+
+def synthetic_positions(count: int, seed: int = 7) -> Dict[str, List[Dict[str, Any]]]:
+    """get_positions payloads per currency: mostly options, plus perpetuals and dated futures
+
+    Names are valid Deribit names, so the mock server can describe them as
+    instruments and book summaries (its market data) are derived from them.
+    """
+    rng = np.random.default_rng(seed)
+    today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    expiries = [(today + timedelta(days=7 * week)).strftime('%d%b%y').upper().lstrip('0')
+                for week in range(1, 53)]
+    positions = {currency: [] for currency in UNDERLYINGS}
+    currencies = list(UNDERLYINGS)
+    for i in range(count):
+        currency = currencies[i % len(currencies)]
+        spot = UNDERLYINGS[currency]
+        n = i // len(currencies)
+        if n == 0:
+            name, kind, mark = f"{currency}-PERPETUAL", 'future', spot
+        elif n <= len(expiries):
+            name, kind, mark = f"{currency}-{expiries[n - 1]}", 'future', spot
+        else:
+            # Walk strikes outward from spot across every expiry, calls and puts
+            n -= len(expiries) + 1
+            expiry = expiries[n % len(expiries)]
+            step = n // len(expiries)
+            strike = int(spot * 0.5 + (step // 2) * spot * 0.01)
+            name, kind, mark = f"{currency}-{expiry}-{strike}-{'C' if step % 2 else 'P'}", 'option', None
+        size = float(rng.uniform(-10, 10)) or 1.0
+        price = mark if mark is not None else float(rng.uniform(0.001, 0.2))
+        positions[currency].append({
+            'instrument_name': name,
+            'kind': kind,
+            'size': size,
+            'average_price': price * float(rng.uniform(0.9, 1.1)),
+            'mark_price': price,
+            'mark_iv': float(rng.uniform(30, 120)) if kind == 'option' else None,
+            'index_price': spot,
+            'leverage': 10 if kind == 'future' else None,
+            'timestamp': int(time.time() * 1000),
+        })
+    return positions
+
+def best_time(run: Callable[[], Any], repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+def run_size(count: int, repeat: int, workdir: str) -> Dict[str, float]:
+    """Seconds per stage for one book size"""
+    positions = synthetic_positions(count)
+    currencies = [currency for currency, payloads in positions.items() if payloads]
+    # Built up front so the catalog stage does not time the mock describing instruments
+    instruments = {currency: [instrument_payload(pos['instrument_name']) for pos in payloads]
+                   for currency, payloads in positions.items()}
+    timings = {}
+    with MockDeribitServer(positions, instruments=instruments) as server, \
+            DeribitClient(base_url=server.url, client_id='bench', client_secret='bench') as client:
+        timings['auth'] = best_time(client.authenticate, repeat)
+        timings['catalog'] = best_time(lambda: client.catalog.refresh(currencies, force=True), repeat)
+
+        payloads = []
+        def fetch():
+            payloads[:] = client._fetch_positions(currencies)
+        timings['fetch'] = best_time(fetch, repeat)
+
+        parsed = []
+        def parse():
+            parsed[:] = [DeribitClient.parse_position(pos, client.catalog) for pos in payloads]
+        timings['parse'] = best_time(parse, repeat)
+        timings['parse_book'] = best_time(lambda: DeribitClient.parse_position_book(payloads, client.catalog),
+                                          repeat)
+        timings['market_data'] = best_time(lambda: client.market_data.refresh(currencies, force=True), repeat)
+
+        def risk():
+            book = RiskCalculator.as_book(parsed, client.market_data)
+            RiskCalculator.calculate_portfolio_metrics(book)
+            RiskCalculator.calculate_book_risks(book)
+            RiskCalculator.calculate_portfolio_greeks(book)
+        timings['risk'] = best_time(risk, repeat)
+
+        # A fresh reporter per run, so its memoized model is rebuilt every time
+        timings['report'] = best_time(
+            lambda: PositionReporter(parsed, market_data=client.market_data).generate_summary_report(), repeat)
+        reporter = PositionReporter(parsed, market_data=client.market_data)
+        reporter.generate_summary_report()
+        csv_path = os.path.join(workdir, f"report_{count}.csv")
+        timings['csv'] = best_time(lambda: reporter.export_to_csv(csv_path), repeat)
+        plot_path = os.path.join(workdir, f"plot_{count}.html")
+        timings['plot'] = best_time(
+            lambda: reporter.save_plot(reporter.plot_position_distribution(), plot_path), repeat)
+    timings['total'] = sum(timings.values())
+    return timings
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float,
+            min_time: float) -> List[str]:
+    """Stages slower than baseline by more than tolerance; stages under min_time are noise"""
+    regressions = []
+    for size, stages in results['results'].items():
+        for stage, seconds in stages.items():
+            reference = baseline.get('results', {}).get(size, {}).get(stage)
+            if reference is None or max(seconds, reference) < min_time:
+                continue
+            if seconds > reference * (1 + tolerance):
+                regressions.append(f"{size} positions, {stage}: {seconds * 1000:.1f} ms "
+                                   f"vs baseline {reference * 1000:.1f} ms (+{seconds / reference - 1:.0%})")
+    return regressions
+
+def print_table(results: Dict[str, Any]):
+    columns = list(STAGES) + ['total']
+    print(f"{'positions':>10} " + ' '.join(f"{stage:>11}" for stage in columns) + '   (ms)')
+    for size, stages in results['results'].items():
+        print(f"{int(size):>10,} " + ' '.join(f"{stages[stage] * 1000:>11.1f}" for stage in columns))
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmark of the deribit_positions pipeline")
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', help="Write results as JSON to this file")
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help="Baseline JSON to compare against")
+    parser.add_argument('--save-baseline', action='store_true', help="Store these results as the baseline")
+    parser.add_argument('--tolerance', type=float, default=0.5, help="Allowed slowdown, 0.5 = 50%%")
+    parser.add_argument('--min-time', type=float, default=0.005, help="Ignore stages faster than this (s)")
+    args = parser.parse_args()
+
+    # No disk cache, so every run measures the same work
+    Config.INSTRUMENT_CACHE_PATH = ''
+    results = {
+        'meta': {
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'repeat': args.repeat,
+        },
+        'results': {},
+    }
+    with tempfile.TemporaryDirectory() as workdir:
+        for count in args.sizes:
+            results['results'][str(count)] = run_size(count, args.repeat, workdir)
+    print_table(results)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Saved baseline to {args.baseline}")
+        return
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance, args.min_time)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions against {args.baseline}")
+
+if __name__ == '__main__':
+    main()
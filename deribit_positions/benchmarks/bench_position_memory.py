@@ -0,0 +1,62 @@
+"""Measure memory per position for Position, CompactPosition and FrozenCompactPosition
+
+Positions are materialized from the same PositionBook, so instrument names
+are shared in every case and only the per-object cost is counted. Each
+variant is measured in a fresh interpreter so allocator reuse between runs
+does not skew the numbers.
+
+Usage: python benchmarks/bench_position_memory.py [positions]
+"""
+import gc
+import os
+import subprocess
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_ingest import synthetic_payloads
+from src.services.deribit_client import DeribitClient
+
+VARIANTS = {
+    'Position': {},
+    'CompactPosition': {'compact': True},
+    'FrozenCompactPosition': {'compact': True, 'frozen': True},
+}
+
+def measure(count: int, variant: str):
+    """Print bytes still allocated per position after materializing, and the build time"""
+    book = DeribitClient.parse_position_book(synthetic_payloads(count))
+    start = time.perf_counter()
+    positions = book.to_positions(**VARIANTS[variant])
+    elapsed = time.perf_counter() - start  # timed outside tracemalloc, which slows allocation
+    del positions
+
+    # The second build is measured, so the one-off growth of the interned-string table is excluded
+    gc.collect()
+    tracemalloc.start()
+    positions = book.to_positions(**VARIANTS[variant])
+    allocated, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(allocated / len(positions), elapsed)
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    if len(sys.argv) > 2:
+        measure(count, sys.argv[2])
+        return
+
+    print(f"{count:,} positions")
+    baseline = None
+    for variant in VARIANTS:
+        output = subprocess.run([sys.executable, __file__, str(count), variant],
+                                capture_output=True, text=True, check=True).stdout
+        per_position, elapsed = map(float, output.split())
+        baseline = baseline or per_position
+        print(f"{variant:>22}: {per_position:6.0f} B/position ({per_position / baseline:4.0%} of Position), "
+              f"built in {elapsed * 1000:.0f} ms")
+
+if __name__ == '__main__':
+    main()
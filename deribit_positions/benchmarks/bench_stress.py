@@ -0,0 +1,36 @@
+"""Benchmark the stress grid revaluation on a synthetic option book
+
+Usage: python benchmarks/bench_stress.py [legs]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_greeks import synthetic_option_book
+from src.analysis.stress import StressEngine
+
+def main():
+    legs = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    book = synthetic_option_book(legs)
+    engine = StressEngine()
+    cells = legs * len(engine.spot_shocks) * len(engine.vol_shocks) * len(engine.time_shocks)
+
+    for label, run in [
+        ('portfolio_surface', lambda: engine.portfolio_surface(book)),
+        ('position_surface', lambda: engine.position_surface(book)),
+    ]:
+        run()  # warm up
+        timings = []
+        for _ in range(3):
+            start = time.perf_counter()
+            run()
+            timings.append(time.perf_counter() - start)
+        print(f"{label:>18}: {legs:,} legs x {engine.shape} grid in {min(timings) * 1000:.1f} ms "
+              f"({cells / min(timings):,.0f} revaluations/s)")
+
+    print(f"BTC -20%, vol +10: {engine.scenario(book, spot_shock=-0.2, vol_shock=10):,.2f}")
+
+if __name__ == '__main__':
+    main()
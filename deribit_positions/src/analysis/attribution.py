@@ -0,0 +1,148 @@
+from datetime import datetime
+from typing import Dict, Optional
+import numpy as np
+from ..config import Config
+from ..models.position_book import PositionBook
+from .greeks import SECONDS_PER_YEAR, black_scholes
+
+ATTRIBUTION_COMPONENTS = ('new_trades', 'closed_trades', 'delta', 'gamma', 'vega', 'theta', 'residual')
+
+def _valuation_time(book: PositionBook, valuation_time: Optional[datetime]) -> np.datetime64:
+    """Explicit time, else the book's latest position timestamp, else now"""
+    if valuation_time is not None:
+        return np.datetime64(valuation_time, 'us')
+    timestamps = book.column('timestamp')
+    timestamps = timestamps[~np.isnat(timestamps)]
+    return timestamps.max() if len(timestamps) else np.datetime64(datetime.now(), 'us')
+
+class AttributionEngine:
+    """Explains the PnL change between two PositionBook snapshots
+
+    Instruments only in the current book are new trades and those only in the
+    previous book are closed trades. For instruments in both, the move on the
+    previous quantity is split with the previous snapshot's Greeks into
+    delta, gamma, vega (IV points) and theta (calendar time); what the Taylor
+    terms miss is the residual. Size changes on held instruments count as new
+    or closed trades depending on whether the position grew or shrank.
+    Futures move one for one with their own price. The components of each
+    row sum exactly to its PnL change.
+
+    Option Greeks are in quote currency; with OPTION_PRICES_IN_UNDERLYING they
+    are converted to coin prices (P / S) so they match the book's marks.
+    """
+
+    def __init__(self, rate: float = 0.0, prices_in_underlying: bool = Config.OPTION_PRICES_IN_UNDERLYING):
+        self.rate = rate
+        self.prices_in_underlying = prices_in_underlying
+
+    def attribute(self, previous: PositionBook, current: PositionBook,
+                  previous_time: Optional[datetime] = None,
+                  current_time: Optional[datetime] = None) -> Dict[str, np.ndarray]:
+        """Per-instrument PnL change and its components, over the union of both books"""
+        start = _valuation_time(previous, previous_time)
+        end = _valuation_time(current, current_time)
+
+        # Rows: current instruments, then instruments that were closed
+        previous_index = {name: row for row, name in enumerate(previous.instrument_names)}
+        previous_rows = np.fromiter((previous_index.get(name, -1) for name in current.instrument_names),
+                                    dtype=np.int64, count=len(current))
+        held = previous_rows >= 0
+        closed_rows = np.setdiff1d(np.arange(len(previous)), previous_rows[held], assume_unique=True)
+        names = current.instrument_names + [previous.instrument_names[row] for row in closed_rows]
+        n_current = len(current)
+
+        previous_pnl = previous.pnl
+        current_pnl = current.pnl
+        previous_signed = previous.column('sign') * previous.column('size')
+        current_signed = current.column('sign') * current.column('size')
+
+        n = len(names)
+        result = {name: np.zeros(n) for name in ATTRIBUTION_COMPONENTS}
+        result['previous_pnl'] = np.zeros(n)
+        result['current_pnl'] = np.zeros(n)
+        result['previous_pnl'][:n_current][held] = previous_pnl[previous_rows[held]]
+        result['previous_pnl'][n_current:] = previous_pnl[closed_rows]
+        result['current_pnl'][:n_current] = current_pnl
+        result['pnl_change'] = result['current_pnl'] - result['previous_pnl']
+
+        result['new_trades'][:n_current][~held] = current_pnl[~held]
+        result['closed_trades'][n_current:] = -previous_pnl[closed_rows]
+
+        # Held instruments: market move on the previous quantity, then the size change
+        rows = previous_rows[held]
+        quantity = previous_signed[rows]
+        market = quantity * (current.column('current_price')[held] - previous.column('current_price')[rows])
+        resize = result['pnl_change'][:n_current][held] - market
+        grew = (np.abs(current_signed[held]) > np.abs(quantity)) & (current_signed[held] * quantity > 0)
+        held_rows = np.flatnonzero(held)
+        result['new_trades'][held_rows] = np.where(grew, resize, 0.0)
+        result['closed_trades'][held_rows] = np.where(grew, 0.0, resize)
+
+        explained = self._greek_effects(previous, current, rows, held, quantity, start, end)
+        for name, values in explained.items():
+            result[name][held_rows] = values
+        result['residual'][held_rows] = market - sum(explained.values())
+
+        result['instrument_name'] = np.asarray(names, dtype=object)
+        status = np.empty(n, dtype=object)
+        status[:n_current] = np.where(held, 'held', 'new')
+        status[n_current:] = 'closed'
+        result['status'] = status
+        return result
+
+    def _greek_effects(self, previous: PositionBook, current: PositionBook, rows: np.ndarray,
+                       held: np.ndarray, quantity: np.ndarray, start: np.datetime64,
+                       end: np.datetime64) -> Dict[str, np.ndarray]:
+        """Delta, gamma, vega and theta PnL of held positions from the previous Greeks"""
+        m = len(rows)
+        effects = {name: np.zeros(m) for name in ('delta', 'gamma', 'vega', 'theta')}
+
+        # Futures: the whole move on the previous quantity is delta
+        futures = ~previous.column('is_option')[rows]
+        price_move = current.column('current_price')[held] - previous.column('current_price')[rows]
+        effects['delta'][futures] = (quantity * price_move)[futures]
+
+        spot = previous.column('underlying_price')[rows]
+        strike = previous.column('strike')[rows]
+        vol = previous.column('mark_iv')[rows] / 100
+        t = (previous.column('expiry')[rows] - start) / np.timedelta64(1, 's') / SECONDS_PER_YEAR
+        valued = ~futures & np.isfinite(spot) & np.isfinite(strike) & (vol > 0) & (t > 0)
+        if not valued.any():
+            return effects
+
+        spot_v = spot[valued]
+        unit = black_scholes(spot_v, strike[valued], t[valued], vol[valued],
+                             previous.column('option_type')[rows][valued] > 0, self.rate)
+        delta, gamma, vega, theta = unit['delta'], unit['gamma'], unit['vega'], unit['theta']
+        if self.prices_in_underlying:
+            # Coin price f = P / S: f' = (P' - f) / S, f'' = (P'' - 2 f') / S
+            coin_price = unit['price'] / spot_v
+            delta = (unit['delta'] - coin_price) / spot_v
+            gamma = (unit['gamma'] - 2 * delta) / spot_v
+            vega = vega / spot_v
+            theta = theta / spot_v
+
+        # Fall back to the previous underlying/IV where the current book lacks them
+        current_spot = current.column('underlying_price')[held][valued]
+        current_spot = np.where(np.isfinite(current_spot), current_spot, spot_v)
+        current_iv = current.column('mark_iv')[held][valued]
+        current_iv = np.where(np.isfinite(current_iv), current_iv, vol[valued] * 100)
+        spot_move = current_spot - spot_v
+        vol_move = current_iv - vol[valued] * 100  # IV points, matching per-point vega
+        days = (end - start) / np.timedelta64(1, 's') / 86400
+
+        q = quantity[valued]
+        effects['delta'][valued] = q * delta * spot_move
+        effects['gamma'][valued] = q * 0.5 * gamma * spot_move ** 2
+        effects['vega'][valued] = q * vega * vol_move
+        effects['theta'][valued] = q * theta * days
+        return effects
+
+    @staticmethod
+    def summary(attribution: Dict[str, np.ndarray]) -> Dict[str, float]:
+        """Portfolio totals of the PnL change and each component"""
+        totals = {name: float(attribution[name].sum())
+                  for name in ('previous_pnl', 'current_pnl', 'pnl_change') + ATTRIBUTION_COMPONENTS}
+        totals['new_positions'] = int((attribution['status'] == 'new').sum())
+        totals['closed_positions'] = int((attribution['status'] == 'closed').sum())
+        return totals
@@ -0,0 +1,249 @@
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from ..config import Config
+from ..models.position_book import PositionBook
+from ..storage.price_history import underlying_of
+from .stress import StressEngine
+
+def _sum_by(rows: np.ndarray, values: np.ndarray, count: int) -> np.ndarray:
+    """NaN-skipping sums of values grouped by row index"""
+    return np.bincount(rows, weights=np.where(np.isnan(values), 0.0, values), minlength=count)
+
+class MarginEstimator:
+    """Margin requirements and futures liquidation prices for a whole PositionBook
+
+    Standard margin follows Deribit's schedule: futures need a rate of their
+    notional that grows with position size, short options need
+    max(15% of the underlying less the out-of-the-money amount, 10%) plus
+    their mark, and long options are fully paid. Futures sizes are taken in
+    base-currency units, so inverse futures (sized in USD) are converted at
+    the mark first. Portfolio margin is approximated per underlying as the
+    worst loss over a spot x vol grid, revalued with StressEngine. Amounts are
+    in quote currency; option marks are converted from coin prices when
+    OPTION_PRICES_IN_UNDERLYING is set.
+
+    Liquidation prices are for futures, one position at a time with the rest
+    of the book held fixed. Margin is cross per underlying: where the
+    underlying has a balance, a position is liquidated where that
+    underlying's equity falls to its total maintenance margin; otherwise the
+    position is isolated and its margin is its entry notional / leverage.
+    estimate() is plain array arithmetic, so it can be re-run on every tick;
+    portfolio_margin() reprices options.
+    """
+
+    def __init__(self, balances: Optional[Dict[str, float]] = None,
+                 prices_in_underlying: bool = Config.OPTION_PRICES_IN_UNDERLYING,
+                 spot_shocks: Optional[Sequence[float]] = None,
+                 vol_shocks: Optional[Sequence[float]] = None, rate: float = 0.0):
+        self.balances = balances if balances is not None else Config.MARGIN_ACCOUNT_BALANCES
+        self.prices_in_underlying = prices_in_underlying
+        self.stress = StressEngine(
+            Config.PORTFOLIO_MARGIN_SPOT_SHOCKS if spot_shocks is None else spot_shocks,
+            Config.PORTFOLIO_MARGIN_VOL_SHOCKS if vol_shocks is None else vol_shocks,
+            [0], rate=rate)
+        self._underlyings: Dict[str, str] = {}
+        self._group_names: List[str] = []
+        self._groups: Tuple[List[str], np.ndarray] = ([], np.empty(0, dtype=np.int64))
+
+    @staticmethod
+    def future_rates(size: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Initial and maintenance margin rates of futures positions of the given base-currency sizes"""
+        scale = Config.MARGIN_FUTURE_RATE_PER_SIZE * size
+        return Config.MARGIN_FUTURE_INITIAL_RATE + scale, Config.MARGIN_FUTURE_MAINTENANCE_RATE + scale
+
+    @staticmethod
+    def isolated_liquidation_price(entry_price: np.ndarray, leverage: np.ndarray, sign: np.ndarray,
+                                   maintenance_rate: np.ndarray) -> np.ndarray:
+        """Price where an isolated margin of entry notional / leverage is down to maintenance"""
+        return entry_price * (1 - sign / leverage) / (1 - sign * maintenance_rate)
+
+    @staticmethod
+    def liquidation_risk(distance: np.ndarray, leverage: np.ndarray) -> np.ndarray:
+        """'high', 'medium' or 'low' by distance to liquidation, else by leverage"""
+        by_distance = np.where(distance < Config.LIQUIDATION_DISTANCE_HIGH, 'high',
+                               np.where(distance < Config.LIQUIDATION_DISTANCE_MEDIUM, 'medium', 'low'))
+        by_leverage = np.where(leverage > 10, 'high', np.where(leverage > 5, 'medium', 'low'))
+        return np.where(np.isfinite(distance), by_distance, by_leverage).astype(object)
+
+    @staticmethod
+    def utilization(maintenance_margin: float, equity: float) -> float:
+        """Maintenance margin as a share of equity; liquidation starts at 1"""
+        return maintenance_margin / equity if equity > 0 else float('inf')
+
+    def underlying_groups(self, book: PositionBook) -> Tuple[List[str], np.ndarray]:
+        """Underlyings in the book and each position's index into them
+
+        Reused while the book holds the same instruments in the same rows, so
+        price updates do not pay for the per-name lookup.
+        """
+        if book.instrument_names != self._group_names:
+            codes: Dict[str, int] = {}
+            rows = np.fromiter((codes.setdefault(self._underlying(name), len(codes))
+                                for name in book.instrument_names), dtype=np.int64, count=len(book))
+            self._group_names = list(book.instrument_names)
+            self._groups = (list(codes), rows)
+        return self._groups
+
+    @staticmethod
+    def quote_pnl(book: PositionBook) -> np.ndarray:
+        """Unrealized PnL in quote currency; an inverse future of USD size q makes q * (P / P0 - 1)"""
+        pnl = book.pnl
+        inverse = np.flatnonzero(book.column('is_inverse'))
+        if len(inverse):
+            with np.errstate(divide='ignore', invalid='ignore'):
+                pnl[inverse] = (book.column('sign')[inverse] * book.column('size')[inverse]
+                                * (book.column('current_price')[inverse] / book.column('entry_price')[inverse] - 1))
+        return pnl
+
+    def _equity(self, book: PositionBook, underlyings: List[str], rows: np.ndarray) -> np.ndarray:
+        """Balance plus unrealized PnL per underlying; NaN where the balance is unknown"""
+        balance = np.array([self.balances.get(underlying, np.nan) for underlying in underlyings])
+        return balance + _sum_by(rows, self.quote_pnl(book), len(underlyings))
+
+    def equity(self, book: PositionBook) -> Dict[str, float]:
+        """Balance plus unrealized PnL of every underlying in the book with a known balance"""
+        underlyings, rows = self.underlying_groups(book)
+        equity = self._equity(book, underlyings, rows)
+        return {underlying: float(value) for underlying, value in zip(underlyings, equity) if np.isfinite(value)}
+
+    def estimate(self, book: PositionBook) -> Dict[str, np.ndarray]:
+        """Standard initial and maintenance margin, liquidation price and distance per position
+
+        With balances, the equity and total maintenance margin per underlying
+        (in underlying_groups order) are returned too, for margin_by_underlying.
+        """
+        size = book.column('size')
+        sign = book.column('sign')
+        price = book.column('current_price')
+        options = book.column('is_option')
+        futures = ~options
+        base_size = book.base_size
+
+        initial_rate, maintenance_rate = self.future_rates(base_size)
+        notional = base_size * price
+        initial = np.where(options, 0.0, notional * initial_rate)
+        maintenance = np.where(options, 0.0, notional * maintenance_rate)
+
+        short_options = np.flatnonzero(options & (sign < 0))
+        if len(short_options):
+            spot = book.column('underlying_price')[short_options]
+            strike = book.column('strike')[short_options]
+            quantity = size[short_options]
+            mark = price[short_options] * spot if self.prices_in_underlying else price[short_options]
+            out_of_the_money = np.where(book.column('option_type')[short_options] > 0,
+                                        np.maximum(strike - spot, 0.0), np.maximum(spot - strike, 0.0))
+            initial[short_options] = quantity * (np.maximum(Config.MARGIN_OPTION_INITIAL_RATE * spot - out_of_the_money,
+                                                            Config.MARGIN_OPTION_MIN_RATE * spot) + mark)
+            maintenance[short_options] = quantity * (Config.MARGIN_OPTION_MAINTENANCE_RATE * spot + mark)
+
+        estimate = {'initial_margin': initial, 'maintenance_margin': maintenance}
+        liquidation = np.full(len(book), np.nan)
+        uncovered = futures
+        if self.balances:
+            # Cross margin per underlying: equity + q * (P - P0) = total maintenance + mm * |q| * (P - P0)
+            underlyings, rows = self.underlying_groups(book)
+            equity = estimate['underlying_equity'] = self._equity(book, underlyings, rows)
+            total_maintenance = estimate['underlying_maintenance'] = _sum_by(rows, maintenance, len(underlyings))
+            excess = np.maximum(equity - total_maintenance, 0.0)[rows]
+            cross = futures & ~np.isnan(excess)
+            exposure = (sign * base_size * (1 - sign * maintenance_rate))[cross]
+            with np.errstate(divide='ignore', invalid='ignore'):
+                liquidation[cross] = np.maximum(price[cross] - excess[cross] / exposure, 0.0)
+            uncovered = futures & ~cross
+        if uncovered.any():
+            leverage = book.column('leverage')
+            isolated = uncovered & np.isfinite(leverage) & (leverage > 0)
+            liquidation[isolated] = self.isolated_liquidation_price(
+                book.column('entry_price')[isolated], leverage[isolated], sign[isolated],
+                maintenance_rate[isolated])
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            # Zero once the price is through the liquidation price
+            distance = np.maximum(sign * (price - liquidation) / price, 0.0)
+        estimate['liquidation_price'] = liquidation
+        estimate['liquidation_distance'] = distance
+        return estimate
+
+    def _underlying(self, instrument_name: str) -> str:
+        underlying = self._underlyings.get(instrument_name)
+        if underlying is None:
+            underlying = self._underlyings[instrument_name] = underlying_of(instrument_name)
+        return underlying
+
+    def portfolio_margin(self, book: PositionBook, valuation_time: Optional[datetime] = None,
+                         estimate: Optional[Dict[str, np.ndarray]] = None) -> Dict[str, Dict[str, float]]:
+        """Approximate portfolio margin per underlying from its worst loss over the shock grid
+
+        Portfolio margin only recognises offsets, so it is capped at the
+        underlying's standard margin.
+        """
+        if not len(book):
+            return {}
+        estimate = estimate if estimate is not None else self.estimate(book)
+        surface = self.stress.position_surface(book, valuation_time).reshape(len(book), -1)
+        underlyings, rows = self.underlying_groups(book)
+        standard_initial = _sum_by(rows, estimate['initial_margin'], len(underlyings))
+        standard_maintenance = _sum_by(rows, estimate['maintenance_margin'], len(underlyings))
+        spot_shock, vol_shock = np.meshgrid(self.stress.spot_shocks, self.stress.vol_shocks, indexing='ij')
+
+        margins = {}
+        for code, name in enumerate(underlyings):
+            pnl = surface[rows == code].sum(axis=0)
+            worst = int(np.argmin(pnl))
+            initial = min(max(-float(pnl[worst]), 0.0), float(standard_initial[code]))
+            margins[name] = {
+                'initial_margin': initial,
+                'maintenance_margin': min(initial * Config.PORTFOLIO_MARGIN_MAINTENANCE_RATIO,
+                                          float(standard_maintenance[code])),
+                'worst_spot_shock': float(spot_shock.ravel()[worst]),
+                'worst_vol_shock': float(vol_shock.ravel()[worst]),
+            }
+        return margins
+
+    def margin_by_underlying(self, book: PositionBook,
+                             estimate: Optional[Dict[str, np.ndarray]] = None) -> Dict[str, Dict[str, Any]]:
+        """Standard margin totals per underlying, against its equity where the balance is known"""
+        estimate = estimate if estimate is not None else self.estimate(book)
+        underlyings, rows = self.underlying_groups(book)
+        initial = _sum_by(rows, estimate['initial_margin'], len(underlyings))
+        maintenance = estimate.get('underlying_maintenance')
+        if maintenance is None:
+            maintenance = _sum_by(rows, estimate['maintenance_margin'], len(underlyings))
+        equity = estimate.get('underlying_equity')
+        if equity is None:
+            equity = self._equity(book, underlyings, rows)
+        margins = {}
+        for code, name in enumerate(underlyings):
+            known = bool(np.isfinite(equity[code]))
+            margins[name] = {
+                'equity': float(equity[code]) if known else None,
+                'initial_margin': float(initial[code]),
+                'maintenance_margin': float(maintenance[code]),
+                'available_margin': float(equity[code] - initial[code]) if known else None,
+                'margin_utilization': self.utilization(float(maintenance[code]), float(equity[code])) if known else None,
+            }
+        return margins
+
+    def account_summary(self, book: PositionBook, valuation_time: Optional[datetime] = None,
+                        estimate: Optional[Dict[str, np.ndarray]] = None) -> Dict[str, Any]:
+        """Standard and portfolio margin totals, and how much of each underlying's equity they use
+
+        equity and available_margin sum the underlyings with a known balance;
+        margin_utilization is the highest of them, the first to be liquidated.
+        """
+        estimate = estimate if estimate is not None else self.estimate(book)
+        portfolio = self.portfolio_margin(book, valuation_time, estimate)
+        standard = self.margin_by_underlying(book, estimate)
+        known = [margin for margin in standard.values() if margin['equity'] is not None]
+        return {
+            'equity': sum(margin['equity'] for margin in known) if known else None,
+            'initial_margin': float(np.nansum(estimate['initial_margin'])),
+            'maintenance_margin': float(np.nansum(estimate['maintenance_margin'])),
+            'available_margin': sum(margin['available_margin'] for margin in known) if known else None,
+            'margin_utilization': max(margin['margin_utilization'] for margin in known) if known else None,
+            'portfolio_initial_margin': sum(margin['initial_margin'] for margin in portfolio.values()),
+            'portfolio_maintenance_margin': sum(margin['maintenance_margin'] for margin in portfolio.values()),
+            'by_underlying': portfolio,
+            'standard_by_underlying': standard,
+        }
@@ -0,0 +1,198 @@
+import logging
+import math
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Tuple
+from ..config import Config
+from ..models.position import Position
+from .risk_calculator import RiskCalculator
+
+logger = logging.getLogger(__name__)
+
+class AggregateMismatchError(RuntimeError):
+    """The incremental totals disagree with a full recompute (check mode)"""
+
+@dataclass
+class Bucket:
+    value: float = 0.0
+    pnl: float = 0.0
+    position_count: int = 0
+
+    def to_dict(self) -> Dict[str, float]:
+        return {'value': self.value, 'pnl': self.pnl, 'position_count': self.position_count}
+
+# One position's contribution: value, pnl, type bucket key, expiry bucket key
+Contribution = Tuple[float, float, str, str]
+
+def expiry_key(position: Position) -> str:
+    """UTC expiry date, as in GreeksEngine.expiry_buckets; perpetuals are 'perpetual'"""
+    if position.expiration_date is None:
+        return 'perpetual'
+    return datetime.fromtimestamp(position.expiration_date.timestamp(), timezone.utc).date().isoformat()
+
+class PortfolioAggregator:
+    """Running portfolio totals and per-type/per-expiry buckets, updated in O(1) per change
+
+    Each position's last contribution is kept, so add/update/remove subtract
+    it and add the new one instead of rescanning the book. Totals are rebuilt
+    with math.fsum every rebase_interval changes to bound float drift. In
+    check mode every change is followed by a full recompute, through
+    RiskCalculator.calculate_portfolio_metrics, that must agree within
+    tolerance; use it for validation, not in production.
+    """
+
+    def __init__(self, positions: Iterable[Position] = (), check: bool = Config.AGGREGATE_CHECK,
+                 tolerance: float = Config.AGGREGATE_CHECK_TOLERANCE,
+                 rebase_interval: int = Config.AGGREGATE_REBASE_INTERVAL):
+        self.check = check
+        self.tolerance = tolerance
+        self.rebase_interval = rebase_interval
+        self.total_value = 0.0
+        self.total_pnl = 0.0
+        self.by_type: Dict[str, Bucket] = {}
+        self.by_expiry: Dict[str, Bucket] = {}
+        self._contributions: Dict[str, Contribution] = {}
+        # Check mode keeps the positions themselves for the recompute
+        self._positions: Dict[str, Position] = {}
+        self._changes = 0
+        for position in positions:
+            self.add(position)
+
+    def __len__(self) -> int:
+        return len(self._contributions)
+
+    def __contains__(self, instrument_name: str) -> bool:
+        return instrument_name in self._contributions
+
+    def add(self, position: Position):
+        """Add a position, or replace the contribution of one already held"""
+        previous = self._contributions.get(position.instrument_name)
+        if previous is not None:
+            self._discard(position.instrument_name)
+            # Type and expiry are fixed by the instrument, so reuse the bucket keys
+            keys = previous[2:]
+        else:
+            keys = (position.position_type, expiry_key(position))
+        contribution = (position.size * position.current_price, position.pnl) + keys
+        self._contributions[position.instrument_name] = contribution
+        self._apply(contribution, 1)
+        if self.check:
+            self._positions[position.instrument_name] = position
+        self._changed()
+
+    # An update is a replacement of the position's previous contribution
+    update = add
+
+    def remove(self, instrument_name: str):
+        """Remove a position; unknown names are ignored"""
+        if self._discard(instrument_name):
+            self._positions.pop(instrument_name, None)
+            self._changed()
+
+    def clear(self):
+        self.total_value = 0.0
+        self.total_pnl = 0.0
+        self.by_type.clear()
+        self.by_expiry.clear()
+        self._contributions.clear()
+        self._positions.clear()
+
+    def _discard(self, instrument_name: str) -> bool:
+        contribution = self._contributions.pop(instrument_name, None)
+        if contribution is None:
+            return False
+        self._apply(contribution, -1)
+        return True
+
+    def _apply(self, contribution: Contribution, sign: int):
+        value, pnl, position_type, expiry = contribution
+        self.total_value += sign * value
+        self.total_pnl += sign * pnl
+        for buckets, key in ((self.by_type, position_type), (self.by_expiry, expiry)):
+            bucket = buckets.get(key)
+            if bucket is None:
+                bucket = buckets[key] = Bucket()
+            bucket.value += sign * value
+            bucket.pnl += sign * pnl
+            bucket.position_count += sign
+            if bucket.position_count == 0:
+                del buckets[key]
+
+    def _changed(self):
+        self._changes += 1
+        if self.rebase_interval and self._changes % self.rebase_interval == 0:
+            self.rebase()
+        if self.check:
+            mismatches = self.verify(self._positions.values())
+            if mismatches:
+                raise AggregateMismatchError('; '.join(mismatches))
+
+    def rebase(self):
+        """Rebuild totals and buckets exactly from the stored contributions, O(n)"""
+        contributions = list(self._contributions.values())
+        self.total_value = math.fsum(c[0] for c in contributions)
+        self.total_pnl = math.fsum(c[1] for c in contributions)
+        self.by_type = self._buckets(contributions, 2)
+        self.by_expiry = self._buckets(contributions, 3)
+
+    @staticmethod
+    def _buckets(contributions: List[Contribution], key_index: int) -> Dict[str, Bucket]:
+        grouped: Dict[str, List[Contribution]] = {}
+        for contribution in contributions:
+            grouped.setdefault(contribution[key_index], []).append(contribution)
+        return {
+            key: Bucket(math.fsum(c[0] for c in members), math.fsum(c[1] for c in members), len(members))
+            for key, members in grouped.items()
+        }
+
+    def metrics(self) -> Dict[str, float]:
+        """Same keys and values as RiskCalculator.calculate_portfolio_metrics"""
+        return {
+            'total_value': self.total_value,
+            'total_pnl': self.total_pnl,
+            'pnl_percentage': (self.total_pnl / self.total_value) * 100 if self.total_value else 0,
+            'diversity_score': len(self.by_type) / 2,
+            'position_count': len(self)
+        }
+
+    def buckets(self) -> Dict[str, Dict[str, Dict[str, float]]]:
+        return {
+            'by_type': {key: bucket.to_dict() for key, bucket in self.by_type.items()},
+            'by_expiry': {key: bucket.to_dict() for key, bucket in sorted(self.by_expiry.items())}
+        }
+
+    def verify(self, positions: Iterable[Position]) -> List[str]:
+        """Compare against a full recompute over positions; returns the mismatches"""
+        positions = list(positions)
+        expected = RiskCalculator.calculate_portfolio_metrics(positions)
+        reference = PortfolioAggregator(rebase_interval=0, check=False)
+        for position in positions:
+            reference.add(position)
+        reference.rebase()
+        # Incremental sums drift relative to the gross size of what went through them
+        scale = max(1.0, math.fsum(abs(c[0]) + abs(c[1]) for c in reference._contributions.values()))
+
+        def close(actual: float, wanted: float) -> bool:
+            return abs(actual - wanted) <= self.tolerance * scale
+
+        mismatches = []
+        actual = self.metrics()
+        for key in ('total_value', 'total_pnl'):
+            if not close(actual[key], expected[key]):
+                mismatches.append(f"{key}: {actual[key]!r} != {expected[key]!r}")
+        for key in ('diversity_score', 'position_count'):
+            if actual[key] != expected[key]:
+                mismatches.append(f"{key}: {actual[key]!r} != {expected[key]!r}")
+        for label, buckets, wanted in (('type', self.by_type, reference.by_type),
+                                       ('expiry', self.by_expiry, reference.by_expiry)):
+            if buckets.keys() != wanted.keys():
+                mismatches.append(f"{label} buckets: {sorted(buckets)} != {sorted(wanted)}")
+                continue
+            for key, bucket in buckets.items():
+                other = wanted[key]
+                if (bucket.position_count != other.position_count or not close(bucket.value, other.value)
+                        or not close(bucket.pnl, other.pnl)):
+                    mismatches.append(f"{label} bucket {key}: {bucket} != {other}")
+        for mismatch in mismatches:
+            logger.error(f"Aggregate mismatch: {mismatch}")
+        return mismatches
@@ -1,16 +1,36 @@
-from typing import List, Dict
+from typing import List, Dict, Optional, Union
 import numpy as np
 from ..models.position import Position
+from ..models.position_book import PositionBook
+from ..config import Config
+from .greeks import GreeksEngine
+from .margin import MarginEstimator
+from .stress import StressEngine
+from .var_engine import VarEngine
+from ..services.market_data import MarketData
+
+Z_SCORE_95 = 1.6449
 
 class RiskCalculator:
+    @staticmethod
+    def as_book(positions: Union[List[Position], PositionBook],
+                 market_data: Optional[MarketData] = None) -> PositionBook:
+        """Columnar view of the positions, refreshed from shared market data if given"""
+        book = positions if isinstance(positions, PositionBook) else PositionBook.from_positions(positions)
+        if market_data is not None:
+            market_data.refresh_for(book.instrument_names)
+            market_data.apply(book)
+        return book
+
     @staticmethod
     def calculate_position_risks(position: Position) -> Dict[str, float]:
         """Calculate various risk metrics for a position"""
         value = position.size * position.current_price
         
-        # Calculate Value at Risk (VaR) using historical volatility
-        # This is a simplified version - you might want to use more sophisticated methods
-        daily_var_95 = value * 0.1  # Assuming 10% daily VaR at 95% confidence
+        # Standalone parametric VaR from the position's implied volatility;
+        # use calculate_portfolio_var for simulated portfolio VaR/ES
+        annual_volatility = position.mark_iv / 100 if position.mark_iv else Config.DEFAULT_ANNUAL_VOLATILITY
+        daily_var_95 = float(value * Z_SCORE_95 * annual_volatility / np.sqrt(365))
         
         # Calculate maximum loss
         max_loss = float('inf')
@@ -25,17 +45,65 @@ class RiskCalculator:
             else:
                 max_loss = value
         
+        # Distance to the isolated liquidation price implied by the position's own leverage
+        liquidation_price = liquidation_distance = float('nan')
+        if position.position_type == 'future' and position.leverage and position.current_price:
+            sign = 1 if position.direction == 'long' else -1
+            _, maintenance_rate = MarginEstimator.future_rates(position.base_size)
+            liquidation_price = MarginEstimator.isolated_liquidation_price(
+                position.entry_price, position.leverage, sign, maintenance_rate)
+            liquidation_distance = max(sign * (position.current_price - liquidation_price) / position.current_price, 0.0)
+        
         return {
             'position_value': value,
             'daily_var_95': daily_var_95,
             'max_loss': max_loss,
             'leverage_risk': position.leverage if position.leverage else 1.0,
-            'liquidation_risk': 'high' if (position.leverage or 1.0) > 10 else 'medium' if (position.leverage or 1.0) > 5 else 'low'
+            'liquidation_price': liquidation_price,
+            'liquidation_risk': MarginEstimator.liquidation_risk(liquidation_distance, position.leverage or 1.0).item()
         }
 
     @staticmethod
-    def calculate_portfolio_metrics(positions: List[Position]) -> Dict[str, float]:
+    def calculate_book_risks(book: PositionBook) -> Dict[str, np.ndarray]:
+        """Vectorized calculate_position_risks for every position in a book"""
+        value = book.value
+        mark_iv = book.column('mark_iv')
+        annual_volatility = np.where(np.isfinite(mark_iv) & (mark_iv != 0), mark_iv / 100,
+                                     Config.DEFAULT_ANNUAL_VOLATILITY)
+        leverage = book.column('leverage')
+        has_leverage = np.isfinite(leverage) & (leverage != 0)
+        effective_leverage = np.where(has_leverage, leverage, 1.0)
+
+        options = book.column('is_option')
+        long = book.column('sign') > 0
+        max_loss = np.where(options, np.where(long, value, np.inf), value / effective_leverage)
+
+        margin = MarginEstimator().estimate(book)
+        return {
+            'position_value': value,
+            'daily_var_95': value * Z_SCORE_95 * annual_volatility / np.sqrt(365),
+            'max_loss': max_loss,
+            'leverage_risk': effective_leverage,
+            'initial_margin': margin['initial_margin'],
+            'maintenance_margin': margin['maintenance_margin'],
+            'liquidation_price': margin['liquidation_price'],
+            'liquidation_risk': MarginEstimator.liquidation_risk(margin['liquidation_distance'], effective_leverage)
+        }
+
+    @staticmethod
+    def calculate_margin(positions: Union[List[Position], PositionBook],
+                         estimator: Optional[MarginEstimator] = None,
+                         market_data: Optional[MarketData] = None) -> Dict:
+        """Standard and approximate portfolio margin for the account"""
+        book = RiskCalculator.as_book(positions, market_data)
+        return (estimator or MarginEstimator()).account_summary(book)
+
+    @staticmethod
+    def calculate_portfolio_metrics(positions: Union[List[Position], PositionBook]) -> Dict[str, float]:
         """Calculate portfolio-wide risk metrics"""
+        if isinstance(positions, PositionBook):
+            return positions.portfolio_metrics()
+
         total_value = sum(pos.size * pos.current_price for pos in positions)
         total_pnl = sum(pos.pnl for pos in positions)
         
@@ -49,4 +117,41 @@ class RiskCalculator:
             'pnl_percentage': (total_pnl / total_value) * 100 if total_value else 0,
             'diversity_score': diversity_score,
             'position_count': len(positions)
+        }
+
+    @staticmethod
+    def calculate_portfolio_greeks(positions: Union[List[Position], PositionBook],
+                                   market_data: Optional[MarketData] = None) -> Dict[str, Dict]:
+        """Calculate net Greeks for the portfolio and per expiry"""
+        book = RiskCalculator.as_book(positions, market_data)
+        engine = GreeksEngine()
+        return {
+            'portfolio': engine.portfolio_greeks(book),
+            'by_expiry': engine.expiry_buckets(book)
+        }
+
+    @staticmethod
+    def calculate_portfolio_var(positions: Union[List[Position], PositionBook], method: str = 'historical',
+                                timeframes: Optional[List[str]] = None,
+                                engine: Optional[VarEngine] = None,
+                                market_data: Optional[MarketData] = None) -> List[Dict]:
+        """Calculate portfolio VaR and expected shortfall for each timeframe"""
+        book = RiskCalculator.as_book(positions, market_data)
+        if engine is not None:
+            return engine.run(book, method, timeframes)
+        with VarEngine() as var_engine:
+            return var_engine.run(book, method, timeframes)
+
+    @staticmethod
+    def calculate_stress_grid(positions: Union[List[Position], PositionBook],
+                              engine: Optional[StressEngine] = None,
+                              market_data: Optional[MarketData] = None) -> Dict:
+        """Revalue the portfolio across the spot x vol x time stress grid"""
+        book = RiskCalculator.as_book(positions, market_data)
+        engine = engine or StressEngine()
+        return {
+            'spot_shocks': engine.spot_shocks.tolist(),
+            'vol_shocks': engine.vol_shocks.tolist(),
+            'time_shocks': engine.time_shocks.tolist(),
+            'portfolio_pnl': engine.portfolio_surface(book)
         }
\ No newline at end of file
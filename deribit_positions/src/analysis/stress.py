@@ -0,0 +1,138 @@
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence
+import numpy as np
+from ..config import Config
+from ..models.position_book import PositionBook
+from ..storage.price_history import underlying_of
+from .greeks import MIN_TIME_TO_EXPIRY, GreeksEngine, black_scholes_price, norm_cdf
+
+MIN_STRESS_VOLATILITY = 0.01  # vol shocks cannot push IV below 1%
+
+class StressEngine:
+    """Revalues a PositionBook across a spot x vol x time scenario grid
+
+    Spot shocks are relative moves of the underlying (-0.2 is a 20% drop), vol
+    shocks are in IV points and time shocks in days forward. Futures move
+    linearly with spot; options are fully repriced with Black-Scholes against
+    their model price at the current market, so the base cell is zero PnL.
+    """
+
+    def __init__(self, spot_shocks: Optional[Sequence[float]] = None,
+                 vol_shocks: Optional[Sequence[float]] = None,
+                 time_shocks: Optional[Sequence[float]] = None,
+                 underlyings: Optional[List[str]] = None, rate: float = 0.0):
+        self.spot_shocks = np.asarray(Config.STRESS_SPOT_SHOCKS if spot_shocks is None else spot_shocks, dtype=np.float64)
+        self.vol_shocks = np.asarray(Config.STRESS_VOL_SHOCKS if vol_shocks is None else vol_shocks, dtype=np.float64)
+        self.time_shocks = np.asarray(Config.STRESS_TIME_SHOCKS if time_shocks is None else time_shocks, dtype=np.float64)
+        self.underlyings = set(underlyings) if underlyings else None
+        self.rate = rate
+
+    @property
+    def shape(self):
+        return len(self.spot_shocks), len(self.vol_shocks), len(self.time_shocks)
+
+    def _shocked(self, book: PositionBook) -> np.ndarray:
+        """Rows whose underlying is subject to the spot shock"""
+        if self.underlyings is None:
+            return np.ones(len(book), dtype=bool)
+        return np.fromiter((underlying_of(name) in self.underlyings for name in book.instrument_names),
+                           dtype=bool, count=len(book))
+
+    def position_surface(self, book: PositionBook,
+                         valuation_time: Optional[datetime] = None) -> np.ndarray:
+        """PnL per position and scenario, shaped (positions, spot, vol, time)"""
+        surface = np.zeros((len(book),) + self.shape)
+        self._revalue(book, valuation_time, surface)
+        return surface
+
+    def portfolio_surface(self, book: PositionBook,
+                          valuation_time: Optional[datetime] = None) -> np.ndarray:
+        """Portfolio PnL per scenario, shaped (spot, vol, time)
+
+        Sums batch by batch so the per-position surface is never held in memory.
+        """
+        return self._revalue(book, valuation_time)
+
+    def _revalue(self, book: PositionBook, valuation_time: Optional[datetime],
+                 out: Optional[np.ndarray] = None) -> np.ndarray:
+        total = np.zeros(self.shape)
+        shocked = self._shocked(book)
+        signed_size = book.column('sign') * book.column('size')
+        options = book.column('is_option')
+
+        # Futures are linear in spot and insensitive to vol and time; inverse
+        # futures are sized in USD, so their exposure is taken in base units
+        futures = np.flatnonzero(~options & shocked)
+        future_pnl = (book.column('sign') * book.base_size * book.column('current_price'))[futures]
+        total += future_pnl.sum() * self.spot_shocks[:, None, None]
+        if out is not None:
+            out[futures] = future_pnl[:, None, None, None] * self.spot_shocks[:, None, None]
+
+        spot = book.column('underlying_price')
+        strike = book.column('strike')
+        vol = book.column('mark_iv') / 100
+        t = GreeksEngine.time_to_expiry(book, valuation_time)
+        valued = np.flatnonzero(options & np.isfinite(spot) & np.isfinite(strike) & (vol > 0) & (t > 0))
+        if not len(valued):
+            return total
+
+        spot, strike, vol, t = spot[valued], strike[valued], vol[valued], t[valued]
+        is_call = book.column('option_type')[valued] > 0
+        size = signed_size[valued]
+        base_value = black_scholes_price(spot, strike, t, vol, is_call, self.rate) * size
+        spot_scale = np.where(shocked[valued, None], 1.0 + self.spot_shocks, 1.0)
+
+        # Terms that vary along fewer than all grid axes are computed on their
+        # own axes and broadcast, so only d1, the CDFs and the price touch the
+        # full (legs, spot, vol, time) grid
+        cells = int(np.prod(self.shape))
+        rows_per_batch = max(1, Config.STRESS_BATCH_CELLS // cells)
+        for start in range(0, len(valued), rows_per_batch):
+            batch = slice(start, start + rows_per_batch)
+            shocked_spot = spot[batch, None] * spot_scale[batch]
+            log_moneyness = np.log(shocked_spot / strike[batch, None])
+            shocked_vol = np.maximum(vol[batch, None] + self.vol_shocks / 100, MIN_STRESS_VOLATILITY)
+            # Expired scenarios fall back to intrinsic value via MIN_TIME_TO_EXPIRY
+            shocked_time = np.maximum(t[batch, None] - self.time_shocks / 365, MIN_TIME_TO_EXPIRY)
+            variance = shocked_vol[:, :, None] ** 2 * shocked_time[:, None, :]
+            vol_sqrt_t = np.sqrt(variance)[:, None]
+            discounted_strike = (strike[batch, None] * np.exp(-self.rate * shocked_time))[:, None, None, :]
+
+            drift = self.rate * shocked_time[:, None, :] + 0.5 * variance
+
+            d1 = (log_moneyness[:, :, None, None] + drift[:, None]) / vol_sqrt_t
+            shocked_spot = shocked_spot[:, :, None, None]
+            call_price = shocked_spot * norm_cdf(d1) - discounted_strike * norm_cdf(d1 - vol_sqrt_t)
+            price = np.where(is_call[batch, None, None, None], call_price,
+                             call_price - shocked_spot + discounted_strike)
+            if out is not None:
+                out[valued[batch]] = price * size[batch, None, None, None] - base_value[batch, None, None, None]
+            total += np.tensordot(size[batch], price, axes=1)
+        return total - base_value.sum()
+
+    def scenario(self, book: PositionBook, spot_shock: float = 0.0, vol_shock: float = 0.0,
+                 time_shock: float = 0.0, valuation_time: Optional[datetime] = None) -> float:
+        """Portfolio PnL for a single scenario, e.g. spot -20% and vol +10 points"""
+        engine = StressEngine([spot_shock], [vol_shock], [time_shock],
+                              sorted(self.underlyings) if self.underlyings else None, self.rate)
+        return float(engine.portfolio_surface(book, valuation_time)[0, 0, 0])
+
+    def grid_records(self, surface: np.ndarray,
+                     instrument_names: Optional[List[str]] = None) -> Dict[str, np.ndarray]:
+        """Flatten a portfolio or position surface into long-format columns"""
+        spot, vol, time_ = np.meshgrid(self.spot_shocks, self.vol_shocks, self.time_shocks, indexing='ij')
+        if instrument_names is None:
+            return {
+                'spot_shock': spot.ravel(),
+                'vol_shock': vol.ravel(),
+                'time_shock_days': time_.ravel(),
+                'pnl': surface.ravel(),
+            }
+        cells = spot.size
+        return {
+            'instrument_name': np.repeat(np.asarray(instrument_names, dtype=object), cells),
+            'spot_shock': np.tile(spot.ravel(), len(instrument_names)),
+            'vol_shock': np.tile(vol.ravel(), len(instrument_names)),
+            'time_shock_days': np.tile(time_.ravel(), len(instrument_names)),
+            'pnl': surface.ravel(),
+        }
@@ -0,0 +1,198 @@
+import logging
+import math
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+import numpy as np
+from ..config import Config
+from ..models.position_book import PositionBook
+from ..storage.price_history import PriceHistoryStore, timeframe_seconds, underlying_of
+from .greeks import SECONDS_PER_YEAR, GreeksEngine, black_scholes_price
+
+logger = logging.getLogger(__name__)
+
+MC_TASK_SCENARIOS = 2000  # fixed task size keeps seeded results independent of worker count
+
+def book_exposures(book: PositionBook, valuation_time: Optional[datetime] = None) -> Dict[str, Any]:
+    """Extract the arrays needed to revalue a book under underlying price scenarios
+
+    Futures are reduced to a linear exposure per underlying; options keep their
+    full Black-Scholes inputs for revaluation.
+    """
+    underlyings = sorted({underlying_of(name) for name in book.instrument_names})
+    lookup = {underlying: i for i, underlying in enumerate(underlyings)}
+    underlying_index = np.fromiter((lookup[underlying_of(name)] for name in book.instrument_names),
+                                   dtype=np.intp, count=len(book))
+
+    signed_size = book.column('sign') * book.column('size')
+    options = book.column('is_option')
+    futures = ~options
+    # Inverse futures are sized in USD, so exposure is taken in base units
+    future_exposure = np.bincount(underlying_index[futures],
+                                  weights=(book.column('sign') * book.base_size * book.column('current_price'))[futures],
+                                  minlength=len(underlyings))
+
+    spot = book.column('underlying_price')
+    strike = book.column('strike')
+    vol = book.column('mark_iv') / 100
+    t = GreeksEngine.time_to_expiry(book, valuation_time)
+    valued = options & np.isfinite(spot) & np.isfinite(strike) & (vol > 0) & (t > 0)
+    is_call = book.column('option_type') > 0
+
+    base_price = black_scholes_price(spot[valued], strike[valued], t[valued], vol[valued], is_call[valued])
+    return {
+        'underlyings': underlyings,
+        'future_exposure': future_exposure,
+        'option_underlying': underlying_index[valued],
+        'option_spot': spot[valued],
+        'option_strike': strike[valued],
+        'option_time': t[valued],
+        'option_vol': vol[valued],
+        'option_is_call': is_call[valued],
+        'option_size': signed_size[valued],
+        'option_base_price': base_price,
+        'unvalued_options': int((options & ~valued).sum()),
+    }
+
+def revalue(exposures: Dict[str, Any], log_returns: np.ndarray, horizon_years: float) -> np.ndarray:
+    """Portfolio PnL for each row of underlying log returns (scenarios x underlyings)"""
+    pnl = np.expm1(log_returns) @ exposures['future_exposure']
+
+    legs = len(exposures['option_size'])
+    if legs:
+        time_left = exposures['option_time'] - horizon_years
+        rows_per_batch = max(1, Config.VAR_BATCH_CELLS // legs)
+        for start in range(0, len(log_returns), rows_per_batch):
+            batch = log_returns[start:start + rows_per_batch]
+            spot = exposures['option_spot'] * np.exp(batch[:, exposures['option_underlying']])
+            price = black_scholes_price(spot, exposures['option_strike'], time_left,
+                                        exposures['option_vol'], exposures['option_is_call'])
+            pnl[start:start + rows_per_batch] += (price - exposures['option_base_price']) @ exposures['option_size']
+    return pnl
+
+def _historical_task(args) -> np.ndarray:
+    exposures, log_returns, horizon_years = args
+    return revalue(exposures, log_returns, horizon_years)
+
+def _monte_carlo_task(args) -> np.ndarray:
+    exposures, cholesky, drift, scenarios, seed, horizon_years = args
+    rng = np.random.default_rng(seed)
+    log_returns = drift + rng.standard_normal((scenarios, len(drift))) @ cholesky.T
+    return revalue(exposures, log_returns, horizon_years)
+
+class VarEngine:
+    """Portfolio VaR and expected shortfall by historical and Monte Carlo simulation"""
+
+    def __init__(self, history_store: Optional[PriceHistoryStore] = None, workers: Optional[int] = None,
+                 seed: Optional[int] = None, confidence_levels: Optional[List[float]] = None):
+        self.history_store = history_store or PriceHistoryStore()
+        self.workers = workers if workers is not None else (Config.VAR_WORKERS or 1)
+        self.seed = seed
+        self.confidence_levels = confidence_levels or Config.VAR_CONFIDENCE_LEVELS
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """Shut down the worker pool"""
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def _map(self, task: Callable, args: List) -> List[np.ndarray]:
+        if self.workers <= 1 or len(args) <= 1:
+            return [task(arg) for arg in args]
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        return list(self._executor.map(task, args))
+
+    def historical(self, book: PositionBook, timeframe: str = '1D',
+                   valuation_time: Optional[datetime] = None) -> Dict[str, Any]:
+        """Revalue the book under every overlapping historical move over the horizon"""
+        start = time.perf_counter()
+        exposures = book_exposures(book, valuation_time)
+        horizon = timeframe_seconds(timeframe)
+        if not exposures['underlyings']:
+            return self._summarize('historical', timeframe, np.zeros(1), exposures, start)
+
+        timestamps, log_prices = self.history_store.aligned_log_prices(exposures['underlyings'])
+        if len(timestamps) < 2:
+            raise ValueError("Not enough overlapping price history")
+        bar_seconds = float(np.median(np.diff(timestamps) / np.timedelta64(1, 's')))
+        step = max(1, int(round(horizon / bar_seconds)))
+        if step >= len(timestamps):
+            raise ValueError(f"Price history too short for {timeframe} horizon")
+        log_returns = log_prices[step:] - log_prices[:-step]
+
+        chunks = np.array_split(log_returns, max(1, min(self.workers, len(log_returns))))
+        pnl = np.concatenate(self._map(_historical_task, [
+            (exposures, chunk, horizon / SECONDS_PER_YEAR) for chunk in chunks
+        ]))
+        return self._summarize('historical', timeframe, pnl, exposures, start)
+
+    def monte_carlo(self, book: PositionBook, timeframe: str = '1D', scenarios: Optional[int] = None,
+                    valuation_time: Optional[datetime] = None) -> Dict[str, Any]:
+        """Simulate correlated lognormal moves and fully revalue options"""
+        start = time.perf_counter()
+        scenarios = scenarios or Config.VAR_MC_SCENARIOS
+        exposures = book_exposures(book, valuation_time)
+        horizon = timeframe_seconds(timeframe)
+        if not exposures['underlyings']:
+            return self._summarize('monte_carlo', timeframe, np.zeros(1), exposures, start)
+
+        covariance = self._horizon_covariance(exposures['underlyings'], horizon)
+        cholesky = np.linalg.cholesky(covariance + np.eye(len(covariance)) * 1e-12)
+        drift = -0.5 * np.diag(covariance)
+
+        task_count = math.ceil(scenarios / MC_TASK_SCENARIOS)
+        seeds = np.random.SeedSequence(self.seed).spawn(task_count)
+        sizes = [min(MC_TASK_SCENARIOS, scenarios - i * MC_TASK_SCENARIOS) for i in range(task_count)]
+        pnl = np.concatenate(self._map(_monte_carlo_task, [
+            (exposures, cholesky, drift, size, seed, horizon / SECONDS_PER_YEAR)
+            for size, seed in zip(sizes, seeds)
+        ]))
+        return self._summarize('monte_carlo', timeframe, pnl, exposures, start)
+
+    def run(self, book: PositionBook, method: str = 'historical',
+            timeframes: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """VaR/ES for each reporting timeframe"""
+        simulate = self.historical if method == 'historical' else self.monte_carlo
+        return [simulate(book, timeframe) for timeframe in timeframes or Config.REPORT_TIMEFRAMES]
+
+    def _horizon_covariance(self, underlyings: List[str], horizon: int) -> np.ndarray:
+        """Covariance of log returns over the horizon, from history when available"""
+        try:
+            timestamps, log_prices = self.history_store.aligned_log_prices(underlyings)
+            if len(timestamps) > 2:
+                bar_seconds = float(np.median(np.diff(timestamps) / np.timedelta64(1, 's')))
+                bar_returns = np.diff(log_prices, axis=0)
+                covariance = np.atleast_2d(np.cov(bar_returns, rowvar=False))
+                return covariance * horizon / bar_seconds
+        except ValueError as e:
+            logger.warning(f"{e}; using default volatility without correlation")
+
+        variance = Config.DEFAULT_ANNUAL_VOLATILITY ** 2 * horizon / SECONDS_PER_YEAR
+        return np.eye(len(underlyings)) * variance
+
+    def _summarize(self, method: str, timeframe: str, pnl: np.ndarray,
+                   exposures: Dict[str, Any], start: float) -> Dict[str, Any]:
+        runtime = time.perf_counter() - start
+        result = {
+            'method': method,
+            'timeframe': timeframe,
+            'scenarios': len(pnl),
+            'unvalued_options': exposures['unvalued_options'],
+        }
+        for level in self.confidence_levels:
+            label = int(round(level * 100))
+            threshold = np.quantile(pnl, 1 - level)
+            result[f'var_{label}'] = float(-threshold)
+            result[f'es_{label}'] = float(-pnl[pnl <= threshold].mean())
+        result['runtime_seconds'] = runtime
+        result['scenarios_per_second'] = len(pnl) / runtime if runtime else float('inf')
+        return result
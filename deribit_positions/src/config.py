@@ -1,3 +1,4 @@
+import json
 import os
 from dotenv import load_dotenv
 
@@ -9,14 +10,102 @@ class Config:
     TEST_URL = os.getenv('DERIBIT_TEST_URL')
     PROD_URL = os.getenv('DERIBIT_PROD_URL')
     
+    # Multi-account collection
+    ACCOUNTS_FILE = os.getenv('DERIBIT_ACCOUNTS_FILE', 'accounts.json')
+    ACCOUNT_CONCURRENCY = 8  # accounts fetched at once
+    NET_SIZE_TOLERANCE = 1e-9  # net size, as a share of the gross, below which legs count as offset
+    
+    # API client parameters
+    POSITION_CURRENCIES = ['BTC', 'ETH', 'SOL', 'USDC']
+    HTTP_POOL_SIZE = 10
+    HTTP_TIMEOUT = 10  # seconds
+    TOKEN_REFRESH_MARGIN = 60  # seconds before expiry
+    INSTRUMENT_CACHE_PATH = os.getenv('INSTRUMENT_CACHE_PATH', 'data/instruments.json')
+    INSTRUMENT_CACHE_TTL = 3600  # seconds before a currency's instruments are refetched
+    INSTRUMENT_PARSE_CACHE_SIZE = 65536
+    MARKET_DATA_TTL = 5  # seconds book summaries are shared before refetching
+    
+    # Rate limiting (Deribit non-matching-engine credit pool)
+    RATE_LIMIT_MAX_CREDITS = 50000
+    RATE_LIMIT_REFILL_RATE = 10000  # credits per second
+    RATE_LIMIT_REQUEST_COST = 500
+    RATE_LIMIT_MAX_RETRIES = 5
+    RATE_LIMIT_BASE_BACKOFF = 0.1  # seconds, doubled per retry before jitter
+    RATE_LIMIT_MAX_BACKOFF = 5  # seconds
+    
+    # WebSocket streaming parameters
+    WS_TEST_URL = os.getenv('DERIBIT_WS_TEST_URL', 'wss://test.deribit.com/ws/api/v2')
+    WS_PROD_URL = os.getenv('DERIBIT_WS_PROD_URL', 'wss://www.deribit.com/ws/api/v2')
+    WS_HEARTBEAT_INTERVAL = 30  # seconds
+    WS_RECONNECT_DELAY = 1  # seconds, doubled per failed attempt
+    WS_MAX_RECONNECT_DELAY = 30  # seconds
+    TICKER_INTERVAL = '100ms'
+    
     # Trading parameters
     BTC_MIN_TRADE_SIZE = 0.0001
     POSITION_UPDATE_INTERVAL = 60  # seconds
     
     # Risk parameters
     MAX_POSITION_SIZE = 1.0  # BTC
+    MAX_POSITION_SIZES = {'BTC': MAX_POSITION_SIZE}  # base-currency units per underlying; others are not checked
     MAX_LEVERAGE = 20
     STOP_LOSS_PERCENTAGE = 0.10  # 10%
     
+    # Monitoring and alerting
+    ALERT_LOG_FILE = os.getenv('ALERT_LOG_FILE', 'alerts.jsonl')  # empty to disable
+    ALERT_WEBHOOK_URL = os.getenv('ALERT_WEBHOOK_URL')
+    
+    # Incremental portfolio aggregates
+    AGGREGATE_CHECK = os.getenv('AGGREGATE_CHECK', 'false').lower() == 'true'  # full recompute after every change
+    AGGREGATE_CHECK_TOLERANCE = 1e-9  # relative to the gross value and PnL of the book
+    AGGREGATE_REBASE_INTERVAL = 10_000  # changes between exact rebuilds of the running sums
+    
+    # Snapshot history
+    SNAPSHOT_DIR = os.getenv('SNAPSHOT_DIR', 'data/snapshots')
+    SNAPSHOT_INTERVAL = 1  # seconds between snapshots in monitor mode
+    SNAPSHOT_ROLLUP_TIMEFRAME = '1M'  # portfolio rollup written on compaction
+    SNAPSHOT_COMPACT_TIMEFRAME = '1M'  # position snapshots are thinned to this on compaction
+    SNAPSHOT_RETENTION_DAYS = 30
+    
+    # VaR parameters
+    PRICE_HISTORY_DIR = os.getenv('PRICE_HISTORY_DIR', 'data/price_history')
+    VAR_CONFIDENCE_LEVELS = [0.95, 0.99]
+    VAR_MC_SCENARIOS = 10000
+    VAR_BATCH_CELLS = 2_000_000  # scenarios x option legs revalued per batch
+    VAR_WORKERS = os.cpu_count()
+    DEFAULT_ANNUAL_VOLATILITY = 0.60  # used when an underlying has no history
+    
+    # Stress test grid
+    STRESS_SPOT_SHOCKS = [-0.3, -0.2, -0.1, -0.05, 0.0, 0.05, 0.1, 0.2, 0.3]  # relative underlying moves
+    STRESS_VOL_SHOCKS = [-20, -10, 0, 10, 20]  # implied volatility points
+    STRESS_TIME_SHOCKS = [0, 1, 7]  # days forward
+    STRESS_BATCH_CELLS = 50_000  # option legs x grid cells per batch, sized to stay in cache
+    
+    # Margin estimates (Deribit standard margin schedule, amounts in quote currency)
+    # Collateral per underlying excluding unrealized PnL, as JSON ('{"BTC": 250000, "ETH": 80000}');
+    # futures on underlyings without a balance get isolated per-position estimates
+    MARGIN_ACCOUNT_BALANCES = {underlying: float(balance) for underlying, balance
+                               in json.loads(os.getenv('MARGIN_ACCOUNT_BALANCES', '{}')).items()}
+    MARGIN_FUTURE_INITIAL_RATE = 0.04  # of notional
+    MARGIN_FUTURE_MAINTENANCE_RATE = 0.02  # of notional
+    MARGIN_FUTURE_RATE_PER_SIZE = 0.00005  # added to both futures rates per unit of base-currency size
+    MARGIN_OPTION_INITIAL_RATE = 0.15  # of the underlying, less the out-of-the-money amount, for short options
+    MARGIN_OPTION_MIN_RATE = 0.10  # floor of the short option initial rate
+    MARGIN_OPTION_MAINTENANCE_RATE = 0.075  # of the underlying, for short options
+    PORTFOLIO_MARGIN_SPOT_SHOCKS = [-0.16, -0.12, -0.08, -0.04, 0.0, 0.04, 0.08, 0.12, 0.16]  # relative underlying moves
+    PORTFOLIO_MARGIN_VOL_SHOCKS = [-20, 0, 20]  # implied volatility points
+    PORTFOLIO_MARGIN_MAINTENANCE_RATIO = 0.8  # maintenance as a share of the portfolio initial margin
+    LIQUIDATION_DISTANCE_HIGH = 0.05  # distance to liquidation price labelled high risk, and alerted in monitor mode
+    LIQUIDATION_DISTANCE_MEDIUM = 0.15
+    MARGIN_UTILIZATION_LIMIT = 0.8  # maintenance margin / equity alerted in monitor mode
+    
+    # PnL attribution
+    OPTION_PRICES_IN_UNDERLYING = True  # Deribit marks options in the base coin; Greeks are converted to match
+    
     # Reporting parameters
-    REPORT_TIMEFRAMES = ['1H', '4H', '1D', '1W']
\ No newline at end of file
+    REPORT_TIMEFRAMES = ['1H', '4H', '1D', '1W']
+    EXPORT_CHUNK_ROWS = 50_000  # rows per CSV/Parquet/Arrow write
+    PLOT_TOP_N = 20
+    PLOT_STRIKE_BUCKETS = 20  # target bucket count when no strike width is given
+    PLOT_WEBGL_THRESHOLD = 1000  # points above which plots switch to WebGL traces
+    PLOTLY_JS_ASSET = os.getenv('PLOTLY_JS_ASSET', 'plotly.min.js')  # shared file next to reports, or 'cdn'
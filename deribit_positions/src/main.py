@@ -1,22 +1,122 @@
-from services.deribit_client import DeribitClient
-from reporting.position_reporter import PositionReporter
+from .services.deribit_client import DeribitClient
+from .services.deribit_stream import PositionStream
+from .monitoring.monitor import PositionMonitor
+from .storage.snapshot_store import SnapshotStore
+from .services.account_collector import AccountCollector, load_accounts
+from .reporting.position_reporter import PositionReporter
+from .config import Config
+import argparse
+import asyncio
 import logging
 from datetime import datetime
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+async def stream_positions():
+    """Keep a live position book from WebSocket updates and log it periodically"""
+    # The REST client only serves the instrument catalog here
+    catalog = DeribitClient(test_mode=True).catalog
+    stream = PositionStream(test_mode=True, catalog=catalog)
+    task = asyncio.create_task(stream.run())
+    try:
+        while True:
+            await asyncio.sleep(Config.POSITION_UPDATE_INTERVAL)
+            logger.info(
+                f"{len(stream.positions)} positions, value {stream.total_value:.4f}, "
+                f"PnL {stream.total_pnl:.4f}, "
+                f"mean update {stream.mean_processing_time * 1e6:.1f}us over {stream.messages_processed} messages"
+            )
+    finally:
+        await stream.stop()
+        await task
+
+async def monitor_positions():
+    """Stream positions, alert on limit breaches and log evaluation latency"""
+    catalog = DeribitClient(test_mode=True).catalog
+    monitor = PositionMonitor(PositionStream(test_mode=True, catalog=catalog), snapshot_store=SnapshotStore())
+    task = asyncio.create_task(monitor.run())
+    try:
+        while True:
+            await asyncio.sleep(Config.POSITION_UPDATE_INTERVAL)
+            latency = monitor.latency_report()
+            logger.info(
+                f"{len(monitor.stream.positions)} positions, {latency['active_alerts']} active alerts, "
+                f"rule evaluation mean {latency['mean_us']:.1f}us p99 {latency['p99_us']:.1f}us "
+                f"max {latency['max_us']:.1f}us over {latency['updates']} updates"
+            )
+    finally:
+        await monitor.stop()
+        await task
+
+def report_accounts(accounts_file: str):
+    """Collect every account concurrently and report per account and consolidated"""
+    accounts = load_accounts(accounts_file)
+    if not accounts:
+        raise ValueError(f"No accounts listed in {accounts_file}")
+    with AccountCollector(accounts) as collector:
+        result = asyncio.run(collector.collect())
+        for account, error in result.errors.items():
+            logger.error(f"Account {account} skipped: {error}")
+        
+        reporter = PositionReporter.for_accounts(result.positions, market_data=collector.market_data)
+        report = reporter.generate_summary_report()
+        
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        reporter.export_to_csv(f"position_report_consolidated_{timestamp}.csv")
+        # Every account's positions side by side, tagged with their account
+        PositionReporter(result.book, market_data=collector.market_data).export_to_csv(
+            f"position_report_accounts_{timestamp}.csv")
+        
+        print(f"\nCollected {len(result.positions)} accounts in {result.wall_time:.2f}s")
+        for account, metrics in report['accounts'].items():
+            print(f"\n{account} ({result.durations[account]:.2f}s):")
+            for key, value in metrics['portfolio_metrics'].items():
+                print(f"  {key}: {value}")
+        print("\nConsolidated:")
+        for key, value in report['portfolio_metrics'].items():
+            print(f"{key}: {value}")
+
 def main():
+    parser = argparse.ArgumentParser(description="Deribit positions risk analysis")
+    parser.add_argument('--stream', action='store_true', help="Stream live positions over WebSocket")
+    parser.add_argument('--monitor', action='store_true', help="Continuously monitor risk limits and alert on breaches")
+    parser.add_argument('--accounts', nargs='?', const=Config.ACCOUNTS_FILE, metavar='FILE',
+                        help="Report on every account listed in a JSON accounts file")
+    args = parser.parse_args()
+
+    if args.accounts:
+        report_accounts(args.accounts)
+        return
+
+    if args.monitor:
+        try:
+            asyncio.run(monitor_positions())
+        except KeyboardInterrupt:
+            logger.info("Stopped monitoring")
+        return
+
+    if args.stream:
+        try:
+            asyncio.run(stream_positions())
+        except KeyboardInterrupt:
+            logger.info("Stopped streaming")
+        return
+
     try:
         # Initialize Deribit client
         client = DeribitClient(test_mode=True)
         
-        # Fetch positions
-        positions = client.get_positions()
+        # Fetch positions straight into a columnar book
+        positions = client.get_position_book()
         logger.info(f"Fetched {len(positions)} positions")
         
+        # Keep history for timeframe reporting
+        with SnapshotStore() as store:
+            store.append(positions)
+        
         # Generate reports
-        reporter = PositionReporter(positions)
+        reporter = PositionReporter(positions, market_data=client.market_data)
         
         # Generate summary report
         report = reporter.generate_summary_report()
@@ -29,7 +129,7 @@ def main():
         
         # Generate and save position distribution plot
         fig = reporter.plot_position_distribution()
-        fig.write_html(f"position_distribution_{timestamp}.html")
+        reporter.save_plot(fig, f"position_distribution_{timestamp}.html")
         logger.info("Generated position distribution plot")
         
         # Print summary
@@ -41,4 +141,4 @@ def main():
         logger.error(f"An error occurred: {str(e)}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,215 @@
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Any, Optional, Tuple
+from urllib.parse import urlparse, parse_qs
+from ..services.instrument_catalog import parse_instrument_name
+
+class MockDeribitServer:
+    """Local stand-in for the Deribit HTTP API, for tests and benchmarks"""
+
+    def __init__(self, positions: Optional[Dict[str, List[Dict[str, Any]]]] = None,
+                 token_ttl: int = 900, latency: float = 0.0,
+                 host: str = '127.0.0.1', port: int = 0,
+                 instruments: Optional[Dict[str, List[Dict[str, Any]]]] = None,
+                 credit_limit: Optional[Tuple[float, float]] = None, request_cost: float = 500):
+        self.positions = positions or {}
+        self.instruments = instruments
+        # (max credits, refill per second) to emulate too_many_requests, or None for unlimited
+        self.credit_limit = credit_limit
+        self.request_cost = request_cost
+        self.credits = credit_limit[0] if credit_limit else 0.0
+        self._credits_updated_at = time.monotonic()
+        self.rate_limited_count = 0
+        self.token_ttl = token_ttl
+        self.latency = latency
+        self.access_tokens: Dict[str, float] = {}
+        self.refresh_tokens = set()
+        self.request_counts: Dict[str, int] = {}
+        self.connection_count = 0
+        self._lock = threading.Lock()
+        self.routes = {
+            '/api/v2/public/auth': self._auth,
+            '/api/v2/private/get_positions': self._get_positions,
+            '/api/v2/public/get_instruments': self._get_instruments,
+            '/api/v2/public/get_book_summary_by_currency': self._get_book_summary,
+        }
+        self._server = ThreadingHTTPServer((host, port), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> 'MockDeribitServer':
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # HTTP/1.1 keeps connections alive so pooled clients can reuse them
+            protocol_version = 'HTTP/1.1'
+            # Headers and body go out in separate writes; without TCP_NODELAY the body
+            # waits ~40 ms for the client's delayed ACK, which swamps benchmark timings
+            disable_nagle_algorithm = True
+
+            def setup(self):
+                super().setup()
+                with server._lock:
+                    server.connection_count += 1
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+                self._respond(*server.handle(url.path, params, self.headers))
+
+            def do_POST(self):
+                url = urlparse(self.path)
+                length = int(self.headers.get('Content-Length') or 0)
+                params = json.loads(self.rfile.read(length) or b'{}')
+                self._respond(*server.handle(url.path, params, self.headers))
+
+            def _respond(self, status: int, payload: Dict[str, Any]):
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def handle(self, path: str, params: Dict[str, Any], headers) -> Tuple[int, Dict[str, Any]]:
+        """Dispatch a request and wrap the result in a JSON-RPC envelope"""
+        with self._lock:
+            self.request_counts[path] = self.request_counts.get(path, 0) + 1
+        if self.latency:
+            time.sleep(self.latency)
+
+        if not self._spend_credits():
+            return self._error(429, 10028, 'too_many_requests')
+
+        route = self.routes.get(path)
+        if route is None:
+            return self._error(404, 10001, 'method_not_found')
+        if '/private/' in path and not self._authorized(headers):
+            return self._error(400, 13009, 'unauthorized')
+
+        try:
+            result = route(params)
+        except (KeyError, ValueError) as e:
+            return self._error(400, 11050, f'bad_request: {e}')
+        return 200, {'jsonrpc': '2.0', 'result': result, 'testnet': True}
+
+    @staticmethod
+    def _error(status: int, code: int, message: str) -> Tuple[int, Dict[str, Any]]:
+        return status, {'jsonrpc': '2.0', 'error': {'code': code, 'message': message}}
+
+    def _spend_credits(self) -> bool:
+        if self.credit_limit is None:
+            return True
+        max_credits, refill_rate = self.credit_limit
+        with self._lock:
+            now = time.monotonic()
+            self.credits = min(max_credits, self.credits + (now - self._credits_updated_at) * refill_rate)
+            self._credits_updated_at = now
+            if self.credits < self.request_cost:
+                self.rate_limited_count += 1
+                return False
+            self.credits -= self.request_cost
+            return True
+
+    def _authorized(self, headers) -> bool:
+        token = (headers.get('Authorization') or '').replace('Bearer ', '', 1)
+        with self._lock:
+            expires_at = self.access_tokens.get(token)
+        return expires_at is not None and expires_at > time.time()
+
+    def _issue_token(self) -> Dict[str, Any]:
+        access_token = uuid.uuid4().hex
+        refresh_token = uuid.uuid4().hex
+        with self._lock:
+            self.access_tokens[access_token] = time.time() + self.token_ttl
+            self.refresh_tokens.add(refresh_token)
+        return {
+            'access_token': access_token,
+            'refresh_token': refresh_token,
+            'expires_in': self.token_ttl,
+            'token_type': 'bearer',
+            'scope': 'session:mock trade:read_write',
+        }
+
+    def _auth(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        grant_type = params['grant_type']
+        if grant_type == 'client_credentials':
+            if not params.get('client_id') or not params.get('client_secret'):
+                raise ValueError('missing credentials')
+        elif grant_type == 'refresh_token':
+            with self._lock:
+                if params['refresh_token'] not in self.refresh_tokens:
+                    raise ValueError('invalid refresh token')
+                self.refresh_tokens.discard(params['refresh_token'])
+        else:
+            raise ValueError(f'unsupported grant_type {grant_type}')
+        return self._issue_token()
+
+    def _get_positions(self, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        return self.positions.get(params['currency'], [])
+
+
+    def _get_instruments(self, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        currency = params['currency']
+        if self.instruments is not None:
+            return self.instruments.get(currency, [])
+        # Without explicit definitions, describe the held instruments
+        return [instrument_payload(p['instrument_name']) for p in self.positions.get(currency, [])]
+
+    def _get_book_summary(self, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        return [{
+            'instrument_name': p['instrument_name'],
+            'mark_price': p['mark_price'],
+            'mark_iv': p.get('mark_iv'),
+            'underlying_price': p.get('index_price'),
+            'estimated_delivery_price': p.get('index_price'),
+        } for p in self.positions.get(params['currency'], [])]
+
+def instrument_payload(instrument_name: str, contract_size: float = 1.0,
+                       tick_size: float = 0.0001) -> Dict[str, Any]:
+    """A get_instruments entry synthesized from an instrument name"""
+    spec = parse_instrument_name(instrument_name)
+    if spec is None:
+        raise ValueError(f"Unparseable instrument name {instrument_name}")
+    expiration = spec.expiration_date
+    return {
+        'instrument_name': instrument_name,
+        'kind': spec.kind,
+        'base_currency': spec.base_currency,
+        'quote_currency': spec.quote_currency or 'USD',
+        'settlement_period': 'perpetual' if expiration is None else 'month',
+        'expiration_timestamp': int(expiration.timestamp() * 1000) if expiration else 32503708800000,
+        'strike': spec.strike,
+        'option_type': spec.option_type,
+        'contract_size': contract_size,
+        'tick_size': tick_size,
+        'is_active': True,
+    }
\ No newline at end of file
@@ -0,0 +1,131 @@
+import asyncio
+import json
+import time
+import uuid
+from typing import Dict, List, Any, Optional, Set
+import websockets
+
+class MockDeribitWebSocketServer:
+    """Local stand-in for the Deribit JSON-RPC WebSocket API, for tests and benchmarks"""
+
+    def __init__(self, positions: Optional[Dict[str, List[Dict[str, Any]]]] = None,
+                 host: str = '127.0.0.1', port: int = 0):
+        self.positions = positions or {}
+        self.host = host
+        self.port = port
+        self.heartbeat_interval: Optional[float] = None
+        self.connection_count = 0
+        self.request_counts: Dict[str, int] = {}
+        self._subscriptions: Dict[Any, Set[str]] = {}
+        self._server = None
+
+    @property
+    def url(self) -> str:
+        return f"ws://{self.host}:{self.port}"
+
+    async def start(self) -> 'MockDeribitWebSocketServer':
+        self._server = await websockets.serve(self._handle_connection, self.host, self.port)
+        self.port = next(iter(self._server.sockets)).getsockname()[1]
+        return self
+
+    async def stop(self):
+        self._server.close()
+        await self._server.wait_closed()
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.stop()
+
+    async def drop_connections(self):
+        """Close every client connection to exercise reconnect logic"""
+        for ws in list(self._subscriptions):
+            await ws.close()
+
+    async def push_ticker(self, instrument_name: str, mark_price: float, interval: str = '100ms'):
+        """Publish a ticker update to subscribed clients"""
+        await self._publish(f"ticker.{instrument_name}.{interval}", {
+            'instrument_name': instrument_name,
+            'mark_price': mark_price,
+            'timestamp': int(time.time() * 1000),
+        })
+
+    async def push_position(self, currency: str, position: Dict[str, Any]):
+        """Update the server-side book and publish a user.changes notification"""
+        book = [p for p in self.positions.get(currency, [])
+                if p['instrument_name'] != position['instrument_name']]
+        if position['size']:
+            book.append(position)
+        self.positions[currency] = book
+        await self._publish(f"user.changes.any.{currency}.raw", {
+            'trades': [],
+            'orders': [],
+            'positions': [position],
+        })
+
+    async def push_raw(self, frame: str):
+        """Send an arbitrary frame, e.g. one that is not valid JSON, to every client"""
+        for ws in list(self._subscriptions):
+            try:
+                await ws.send(frame)
+            except websockets.ConnectionClosed:
+                pass
+
+    async def _publish(self, channel: str, data: Dict[str, Any]):
+        message = json.dumps({
+            'jsonrpc': '2.0',
+            'method': 'subscription',
+            'params': {'channel': channel, 'data': data},
+        })
+        for ws, channels in list(self._subscriptions.items()):
+            if channel in channels:
+                try:
+                    await ws.send(message)
+                except websockets.ConnectionClosed:
+                    pass
+
+    async def _handle_connection(self, ws, path: Optional[str] = None):
+        self.connection_count += 1
+        self._subscriptions[ws] = set()
+        heartbeat = None
+        try:
+            async for raw in ws:
+                request = json.loads(raw)
+                method = request.get('method')
+                self.request_counts[method] = self.request_counts.get(method, 0) + 1
+                result = self._dispatch(ws, method, request.get('params', {}))
+                if method == 'public/set_heartbeat' and heartbeat is None:
+                    heartbeat = asyncio.create_task(self._send_heartbeats(ws))
+                await ws.send(json.dumps({'jsonrpc': '2.0', 'id': request.get('id'), 'result': result}))
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            if heartbeat is not None:
+                heartbeat.cancel()
+            self._subscriptions.pop(ws, None)
+
+    def _dispatch(self, ws, method: str, params: Dict[str, Any]) -> Any:
+        if method == 'public/auth':
+            return {'access_token': uuid.uuid4().hex, 'refresh_token': uuid.uuid4().hex,
+                    'expires_in': 900, 'token_type': 'bearer'}
+        if method == 'public/set_heartbeat':
+            self.heartbeat_interval = params['interval']
+            return 'ok'
+        if method == 'public/test':
+            return {'version': 'mock'}
+        if method == 'private/get_positions':
+            return self.positions.get(params['currency'], [])
+        if method in ('public/subscribe', 'private/subscribe'):
+            self._subscriptions[ws].update(params['channels'])
+            return params['channels']
+        if method in ('public/unsubscribe', 'private/unsubscribe'):
+            self._subscriptions[ws].difference_update(params['channels'])
+            return params['channels']
+        return None
+
+    async def _send_heartbeats(self, ws):
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            await ws.send(json.dumps({'jsonrpc': '2.0', 'method': 'heartbeat',
+                                      'params': {'type': 'test_request'}}))
@@ -1,11 +1,31 @@
-from dataclasses import dataclass
+import sys
+from dataclasses import FrozenInstanceError, dataclass
 from datetime import datetime
-from typing import Literal, Optional, Dict, Any
+from typing import Literal, Optional, Dict, Any, Tuple, Union
 
 PositionType = Literal['option', 'future']
 OptionType = Literal['call', 'put']
 Direction = Literal['long', 'short']
 
+# Categorical codes, shared with the PositionBook columns
+POSITION_TYPE_CODES = {'future': 0, 'option': 1}
+DIRECTION_CODES = {'long': 1, 'short': -1}
+OPTION_TYPE_CODES = {None: 0, 'call': 1, 'put': -1}
+POSITION_TYPE_NAMES = {code: name for name, code in POSITION_TYPE_CODES.items()}
+DIRECTION_NAMES = {code: name for name, code in DIRECTION_CODES.items()}
+OPTION_TYPE_NAMES = {code: name for name, code in OPTION_TYPE_CODES.items()}
+
+def is_inverse_future(instrument_name: str, position_type: str) -> bool:
+    """Deribit coin-margined futures (BTC-PERPETUAL) are sized in USD; linear
+    futures (BTC_USDC-PERPETUAL) and options are sized in the base currency"""
+    return position_type == 'future' and '_' not in instrument_name.split('-', 1)[0]
+
+def base_size(instrument_name: str, position_type: str, size: float, price: float) -> float:
+    """Position size in base-currency units"""
+    if is_inverse_future(instrument_name, position_type):
+        return size / price if price else float('nan')
+    return size
+
 @dataclass
 class Position:
     instrument_name: str
@@ -19,6 +39,11 @@ class Position:
     option_type: Optional[OptionType] = None
     strike_price: Optional[float] = None
     expiration_date: Optional[datetime] = None
+    mark_iv: Optional[float] = None  # implied volatility in percent
+    underlying_price: Optional[float] = None
+    contract_size: Optional[float] = None
+    tick_size: Optional[float] = None
+    account: Optional[str] = None  # set when positions are collected from several accounts
     
     @property
     def pnl(self) -> float:
@@ -31,6 +56,11 @@ class Position:
         """Calculate position's profit/loss percentage"""
         return (self.pnl / (self.entry_price * self.size)) * 100
     
+    @property
+    def base_size(self) -> float:
+        """Size in base-currency units; inverse futures are sized in USD"""
+        return base_size(self.instrument_name, self.position_type, self.size, self.current_price)
+    
     def to_dict(self) -> Dict[str, Any]:
         """Convert position to dictionary format"""
         return {
@@ -46,5 +76,157 @@ class Position:
             'leverage': self.leverage,
             'option_type': self.option_type,
             'strike_price': self.strike_price,
-            'expiration_date': self.expiration_date
-        }
\ No newline at end of file
+            'expiration_date': self.expiration_date,
+            'mark_iv': self.mark_iv,
+            'underlying_price': self.underlying_price,
+            'contract_size': self.contract_size,
+            'tick_size': self.tick_size,
+            'account': self.account
+        }
+
+def to_epoch_us(value: Union[datetime, int, None]) -> Optional[int]:
+    """Naive local datetime (or epoch microseconds) to epoch microseconds"""
+    if value is None or isinstance(value, int):
+        return value
+    return int(value.timestamp() * 1_000_000)
+
+def from_epoch_us(value: Optional[int]) -> Optional[datetime]:
+    if value is None:
+        return None
+    return datetime.fromtimestamp(value / 1_000_000)
+
+class CompactPosition:
+    """Memory-compact Position for large books and long-lived monitors
+
+    Slotted, so instances carry no __dict__. position_type, direction and
+    option_type are stored as small-int codes (shared by every instance) and
+    timestamps as epoch-microsecond ints; the properties return the same
+    values as Position, so either class can be passed where a Position is
+    read. Instrument names and account tags are interned.
+    """
+
+    __slots__ = ('instrument_name', '_position_type', '_direction', 'size', 'entry_price', 'current_price',
+                 'timestamp_us', 'leverage', '_option_type', 'strike_price', 'expiration_us', 'mark_iv',
+                 'underlying_price', 'contract_size', 'tick_size', 'account')
+
+    def __init__(self, instrument_name: str, position_type: PositionType, direction: Direction,
+                 size: float, entry_price: float, current_price: float, timestamp: Union[datetime, int],
+                 leverage: Optional[float] = None, option_type: Optional[OptionType] = None,
+                 strike_price: Optional[float] = None, expiration_date: Union[datetime, int, None] = None,
+                 mark_iv: Optional[float] = None, underlying_price: Optional[float] = None,
+                 contract_size: Optional[float] = None, tick_size: Optional[float] = None,
+                 account: Optional[str] = None):
+        # object.__setattr__ so the frozen subclass can share this constructor
+        init = object.__setattr__
+        init(self, 'instrument_name', sys.intern(instrument_name))
+        init(self, '_position_type', POSITION_TYPE_CODES[position_type])
+        init(self, '_direction', DIRECTION_CODES[direction])
+        init(self, 'size', size)
+        init(self, 'entry_price', entry_price)
+        init(self, 'current_price', current_price)
+        init(self, 'timestamp_us', to_epoch_us(timestamp))
+        init(self, 'leverage', leverage)
+        init(self, '_option_type', OPTION_TYPE_CODES[option_type])
+        init(self, 'strike_price', strike_price)
+        init(self, 'expiration_us', to_epoch_us(expiration_date))
+        init(self, 'mark_iv', mark_iv)
+        init(self, 'underlying_price', underlying_price)
+        init(self, 'contract_size', contract_size)
+        init(self, 'tick_size', tick_size)
+        init(self, 'account', sys.intern(account) if account is not None else None)
+
+    @classmethod
+    def from_position(cls, position: Position) -> 'CompactPosition':
+        return cls(**{name: getattr(position, name) for name in POSITION_FIELDS})
+
+    def to_position(self) -> Position:
+        return Position(**{name: getattr(self, name) for name in POSITION_FIELDS})
+
+    @property
+    def position_type(self) -> PositionType:
+        return POSITION_TYPE_NAMES[self._position_type]
+
+    @position_type.setter
+    def position_type(self, value: PositionType):
+        self._position_type = POSITION_TYPE_CODES[value]
+
+    @property
+    def direction(self) -> Direction:
+        return DIRECTION_NAMES[self._direction]
+
+    @direction.setter
+    def direction(self, value: Direction):
+        self._direction = DIRECTION_CODES[value]
+
+    @property
+    def option_type(self) -> Optional[OptionType]:
+        return OPTION_TYPE_NAMES[self._option_type]
+
+    @option_type.setter
+    def option_type(self, value: Optional[OptionType]):
+        self._option_type = OPTION_TYPE_CODES[value]
+
+    @property
+    def timestamp(self) -> datetime:
+        return from_epoch_us(self.timestamp_us)
+
+    @timestamp.setter
+    def timestamp(self, value: Union[datetime, int]):
+        self.timestamp_us = to_epoch_us(value)
+
+    @property
+    def expiration_date(self) -> Optional[datetime]:
+        return from_epoch_us(self.expiration_us)
+
+    @expiration_date.setter
+    def expiration_date(self, value: Union[datetime, int, None]):
+        self.expiration_us = to_epoch_us(value)
+
+    @property
+    def pnl(self) -> float:
+        """Calculate position's profit/loss"""
+        return self._direction * (self.current_price - self.entry_price) * self.size
+
+    @property
+    def pnl_percentage(self) -> float:
+        """Calculate position's profit/loss percentage"""
+        return (self.pnl / (self.entry_price * self.size)) * 100
+
+    base_size = Position.base_size
+    to_dict = Position.to_dict
+
+    def _values(self) -> Tuple:
+        return tuple(getattr(self, name) for name in CompactPosition.__slots__)
+
+    def __reduce__(self):
+        # Rebuild through __init__ with the raw epoch ints, which also works when frozen
+        args = tuple(getattr(self, name) for name in POSITION_FIELDS)
+        timestamps = {'timestamp': self.timestamp_us, 'expiration_date': self.expiration_us}
+        return type(self), tuple(timestamps.get(name, value) for name, value in zip(POSITION_FIELDS, args))
+
+    def __eq__(self, other: Any) -> bool:
+        if not isinstance(other, CompactPosition):
+            return NotImplemented
+        return self._values() == other._values()
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        fields = ', '.join(f"{name}={getattr(self, name)!r}" for name in POSITION_FIELDS)
+        return f"{type(self).__name__}({fields})"
+
+class FrozenCompactPosition(CompactPosition):
+    """Immutable, hashable CompactPosition"""
+
+    __slots__ = ()
+
+    def __setattr__(self, name: str, value: Any):
+        raise FrozenInstanceError(f"cannot assign to field {name!r}")
+
+    def __delattr__(self, name: str):
+        raise FrozenInstanceError(f"cannot delete field {name!r}")
+
+    def __hash__(self) -> int:
+        return hash(self._values())
+
+POSITION_FIELDS = tuple(Position.__dataclass_fields__)
@@ -0,0 +1,344 @@
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Any
+import numpy as np
+from .position import (OPTION_TYPE_CODES, OPTION_TYPE_NAMES, CompactPosition, FrozenCompactPosition, Position,
+                       is_inverse_future)
+
+# Low-cardinality float columns whose values compact positions share
+SHARED_VALUE_COLUMNS = ('strike', 'underlying_price', 'contract_size', 'tick_size', 'leverage')
+
+def row_key(instrument_name: str, account: Optional[str] = None):
+    """Index key of a row: the instrument name, or (account, name) for account-tagged positions"""
+    return instrument_name if account is None else (account, instrument_name)
+
+class PositionBook:
+    """Columnar (struct-of-arrays) position store with vectorized PnL
+
+    Rows are keyed by instrument name, or by (account, instrument name) when
+    positions are tagged with an account, so one book can hold the same
+    instrument for several accounts. Methods taking an instrument name take
+    the account as an optional second argument.
+    """
+
+    COLUMNS = {
+        'size': np.float64,
+        'entry_price': np.float64,
+        'current_price': np.float64,
+        'sign': np.int8,
+        'is_option': np.bool_,
+        'is_inverse': np.bool_,  # sized in USD rather than the base currency
+        'option_type': np.int8,
+        'strike': np.float64,
+        'expiry': 'datetime64[us]',
+        'timestamp': 'datetime64[us]',
+        'leverage': np.float64,
+        'mark_iv': np.float64,
+        'underlying_price': np.float64,
+        'contract_size': np.float64,
+        'tick_size': np.float64,
+    }
+
+    def __init__(self, capacity: int = 64):
+        self.instrument_names: List[str] = []
+        self.accounts: List[Optional[str]] = []
+        self._index: Dict[Any, int] = {}
+        self._capacity = max(capacity, 1)
+        self._columns = {
+            name: np.empty(self._capacity, dtype=dtype)
+            for name, dtype in self.COLUMNS.items()
+        }
+        # Bumped by every mutation, so cached results can tell they are stale
+        self.version = 0
+
+    @classmethod
+    def from_positions(cls, positions: Iterable[Position]) -> 'PositionBook':
+        """Build a book from Position objects in one pass per column"""
+        positions = list(positions)
+        book = cls(capacity=len(positions))
+        n = len(positions)
+        book.instrument_names = [p.instrument_name for p in positions]
+        book.accounts = [p.account for p in positions]
+        book._build_index()
+
+        columns = book._columns
+        columns['size'][:n] = [p.size for p in positions]
+        columns['entry_price'][:n] = [p.entry_price for p in positions]
+        columns['current_price'][:n] = [p.current_price for p in positions]
+        columns['sign'][:n] = [1 if p.direction == 'long' else -1 for p in positions]
+        columns['is_option'][:n] = [p.position_type == 'option' for p in positions]
+        columns['is_inverse'][:n] = [is_inverse_future(p.instrument_name, p.position_type) for p in positions]
+        columns['option_type'][:n] = [OPTION_TYPE_CODES[p.option_type] for p in positions]
+        columns['strike'][:n] = [np.nan if p.strike_price is None else p.strike_price for p in positions]
+        columns['expiry'][:n] = [_to_datetime64(p.expiration_date) for p in positions]
+        columns['timestamp'][:n] = [_to_datetime64(p.timestamp) for p in positions]
+        columns['leverage'][:n] = [np.nan if p.leverage is None else p.leverage for p in positions]
+        columns['mark_iv'][:n] = [np.nan if p.mark_iv is None else p.mark_iv for p in positions]
+        columns['underlying_price'][:n] = [np.nan if p.underlying_price is None else p.underlying_price for p in positions]
+        columns['contract_size'][:n] = [np.nan if p.contract_size is None else p.contract_size for p in positions]
+        columns['tick_size'][:n] = [np.nan if p.tick_size is None else p.tick_size for p in positions]
+        return book
+
+    @classmethod
+    def from_arrays(cls, instrument_names: List[str], accounts: Optional[List[Optional[str]]] = None,
+                    **columns: np.ndarray) -> 'PositionBook':
+        """Build a book directly from column arrays; missing columns default to NaN/NaT/0
+
+        A missing is_inverse column is derived from the instrument names.
+        """
+        n = len(instrument_names)
+        book = cls(capacity=n)
+        book.instrument_names = list(instrument_names)
+        book.accounts = list(accounts) if accounts is not None else [None] * n
+        book._build_index()
+
+        unknown = set(columns) - set(cls.COLUMNS)
+        if unknown:
+            raise ValueError(f"Unknown columns: {sorted(unknown)}")
+        for name, values in book._columns.items():
+            if name in columns:
+                values[:n] = columns[name]
+            elif name == 'is_inverse':
+                is_option = book.column('is_option')
+                values[:n] = [not option and is_inverse_future(instrument_name, 'future')
+                              for instrument_name, option in zip(book.instrument_names, is_option.tolist())]
+            elif values.dtype.kind == 'f':
+                values[:n] = np.nan
+            elif values.dtype.kind == 'M':
+                values[:n] = np.datetime64('NaT')
+            else:
+                values[:n] = 0
+        return book
+
+    def _build_index(self):
+        self._index = {row_key(name, account): row
+                       for row, (name, account) in enumerate(zip(self.instrument_names, self.accounts))}
+        if len(self._index) != len(self.instrument_names):
+            raise ValueError("Duplicate instrument names in positions")
+
+    def __len__(self) -> int:
+        return len(self.instrument_names)
+
+    def __contains__(self, instrument_name: str) -> bool:
+        return instrument_name in self._index
+
+    @property
+    def has_accounts(self) -> bool:
+        return any(account is not None for account in self.accounts)
+
+    def column(self, name: str) -> np.ndarray:
+        """Return a view of the live rows of a column"""
+        return self._columns[name][:len(self)]
+
+    def row(self, instrument_name: str, account: Optional[str] = None) -> int:
+        return self._index[row_key(instrument_name, account)]
+
+    def mark_changed(self):
+        """Record a change made by writing through column() views"""
+        self.version += 1
+
+    def _grow(self):
+        self._capacity *= 2
+        for name, values in self._columns.items():
+            grown = np.empty(self._capacity, dtype=values.dtype)
+            grown[:len(self)] = values[:len(self)]
+            self._columns[name] = grown
+
+    def add(self, position: Position):
+        """Append a position, or replace it if the instrument is already held"""
+        self.version += 1
+        key = row_key(position.instrument_name, position.account)
+        if key in self._index:
+            self._write_row(self._index[key], position)
+            return
+        if len(self) == self._capacity:
+            self._grow()
+        row = len(self)
+        self.instrument_names.append(position.instrument_name)
+        self.accounts.append(position.account)
+        self._index[key] = row
+        self._write_row(row, position)
+
+    def update(self, instrument_name: str, account: Optional[str] = None, **fields: Any):
+        """Update column values of one position in O(1)"""
+        row = self._index[row_key(instrument_name, account)]
+        self.version += 1
+        for name, value in fields.items():
+            self._columns[name][row] = value
+
+    def update_price(self, instrument_name: str, current_price: float, account: Optional[str] = None):
+        self.version += 1
+        self._columns['current_price'][self._index[row_key(instrument_name, account)]] = current_price
+
+    def remove(self, instrument_name: str, account: Optional[str] = None):
+        """Remove a position in O(1) by moving the last row into its slot"""
+        row = self._index.pop(row_key(instrument_name, account))
+        self.version += 1
+        last = len(self) - 1
+        if row != last:
+            moved_name, moved_account = self.instrument_names[last], self.accounts[last]
+            for values in self._columns.values():
+                values[row] = values[last]
+            self.instrument_names[row] = moved_name
+            self.accounts[row] = moved_account
+            self._index[row_key(moved_name, moved_account)] = row
+        self.instrument_names.pop()
+        self.accounts.pop()
+
+    def _write_row(self, row: int, position: Position):
+        columns = self._columns
+        columns['size'][row] = position.size
+        columns['entry_price'][row] = position.entry_price
+        columns['current_price'][row] = position.current_price
+        columns['sign'][row] = 1 if position.direction == 'long' else -1
+        columns['is_option'][row] = position.position_type == 'option'
+        columns['is_inverse'][row] = is_inverse_future(position.instrument_name, position.position_type)
+        columns['option_type'][row] = OPTION_TYPE_CODES[position.option_type]
+        columns['strike'][row] = np.nan if position.strike_price is None else position.strike_price
+        columns['expiry'][row] = _to_datetime64(position.expiration_date)
+        columns['timestamp'][row] = _to_datetime64(position.timestamp)
+        columns['leverage'][row] = np.nan if position.leverage is None else position.leverage
+        columns['mark_iv'][row] = np.nan if position.mark_iv is None else position.mark_iv
+        columns['underlying_price'][row] = np.nan if position.underlying_price is None else position.underlying_price
+        columns['contract_size'][row] = np.nan if position.contract_size is None else position.contract_size
+        columns['tick_size'][row] = np.nan if position.tick_size is None else position.tick_size
+
+    def position(self, instrument_name: str, account: Optional[str] = None) -> Position:
+        """Materialize a single Position"""
+        return self._make_position(self._index[row_key(instrument_name, account)])
+
+    def to_positions(self, compact: bool = False, frozen: bool = False) -> List[Position]:
+        """Materialize every Position, converting each column to Python values once
+
+        compact builds CompactPositions, which keep the book's epoch-microsecond
+        timestamps as ints and share one object per distinct strike, expiry,
+        underlying price, contract size, tick size and leverage; frozen makes
+        them FrozenCompactPositions.
+        """
+        columns = {name: self.column(name) for name in self.COLUMNS}
+        values = {
+            name: [None if value != value else value for value in column.tolist()]  # NaN -> None
+            for name, column in columns.items() if column.dtype.kind == 'f'
+        }
+        if compact:
+            position_class = FrozenCompactPosition if frozen else CompactPosition
+            timestamps = _epoch_us_list(columns['timestamp'])
+            expiries = _epoch_us_list(columns['expiry'])
+            # Few distinct values per column, so share the boxed objects
+            shared_expiries, shared_floats = {}, {}
+            expiries = [shared_expiries.setdefault(value, value) for value in expiries]
+            for name in SHARED_VALUE_COLUMNS:
+                values[name] = [shared_floats.setdefault(value, value) for value in values[name]]
+        else:
+            position_class = Position
+            timestamps = _datetime_list(columns['timestamp'])
+            expiries = _datetime_list(columns['expiry'])
+        is_option = columns['is_option'].tolist()
+        signs = columns['sign'].tolist()
+        option_types = columns['option_type'].tolist()
+        return [
+            position_class(
+                instrument_name=name,
+                position_type='option' if is_option[row] else 'future',
+                direction='long' if signs[row] > 0 else 'short',
+                size=values['size'][row],
+                entry_price=values['entry_price'][row],
+                current_price=values['current_price'][row],
+                timestamp=timestamps[row],
+                leverage=values['leverage'][row],
+                option_type=OPTION_TYPE_NAMES[option_types[row]],
+                strike_price=values['strike'][row],
+                expiration_date=expiries[row],
+                mark_iv=values['mark_iv'][row],
+                underlying_price=values['underlying_price'][row],
+                contract_size=values['contract_size'][row],
+                tick_size=values['tick_size'][row],
+                account=self.accounts[row]
+            )
+            for row, name in enumerate(self.instrument_names)
+        ]
+
+    def _make_position(self, row: int) -> Position:
+        columns = self._columns
+        strike = columns['strike'][row]
+        leverage = columns['leverage'][row]
+        mark_iv = columns['mark_iv'][row]
+        underlying_price = columns['underlying_price'][row]
+        contract_size = columns['contract_size'][row]
+        tick_size = columns['tick_size'][row]
+        return Position(
+            instrument_name=self.instrument_names[row],
+            position_type='option' if columns['is_option'][row] else 'future',
+            direction='long' if columns['sign'][row] > 0 else 'short',
+            size=float(columns['size'][row]),
+            entry_price=float(columns['entry_price'][row]),
+            current_price=float(columns['current_price'][row]),
+            timestamp=_from_datetime64(columns['timestamp'][row]),
+            leverage=None if np.isnan(leverage) else float(leverage),
+            option_type=OPTION_TYPE_NAMES[int(columns['option_type'][row])],
+            strike_price=None if np.isnan(strike) else float(strike),
+            expiration_date=_from_datetime64(columns['expiry'][row]),
+            mark_iv=None if np.isnan(mark_iv) else float(mark_iv),
+            underlying_price=None if np.isnan(underlying_price) else float(underlying_price),
+            contract_size=None if np.isnan(contract_size) else float(contract_size),
+            tick_size=None if np.isnan(tick_size) else float(tick_size),
+            account=self.accounts[row]
+        )
+
+    @property
+    def value(self) -> np.ndarray:
+        """Position values (size * current price)"""
+        return self.column('size') * self.column('current_price')
+
+    @property
+    def base_size(self) -> np.ndarray:
+        """Sizes in base-currency units; inverse futures are sized in USD"""
+        size = self.column('size')
+        price = self.column('current_price')
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(self.column('is_inverse'), size / np.where(price != 0, price, np.nan), size)
+
+    @property
+    def pnl(self) -> np.ndarray:
+        """Vectorized profit/loss for every position"""
+        return self.column('sign') * (self.column('current_price') - self.column('entry_price')) * self.column('size')
+
+    @property
+    def pnl_percentage(self) -> np.ndarray:
+        """Vectorized profit/loss percentage for every position"""
+        cost = self.column('entry_price') * self.column('size')
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return self.pnl / cost * 100
+
+    def portfolio_metrics(self) -> Dict[str, float]:
+        """Portfolio aggregates matching RiskCalculator.calculate_portfolio_metrics"""
+        total_value = float(self.value.sum())
+        total_pnl = float(self.pnl.sum())
+        position_types = np.unique(self.column('is_option'))
+
+        return {
+            'total_value': total_value,
+            'total_pnl': total_pnl,
+            'pnl_percentage': (total_pnl / total_value) * 100 if total_value else 0,
+            'diversity_score': len(position_types) / 2,
+            'position_count': len(self)
+        }
+
+def _to_datetime64(value: Optional[datetime]) -> np.datetime64:
+    if value is None:
+        return np.datetime64('NaT', 'us')
+    return np.datetime64(int(value.timestamp() * 1_000_000), 'us')
+
+def _epoch_us_list(values: np.ndarray) -> List[Optional[int]]:
+    micros = values.astype('datetime64[us]').astype(np.int64)
+    return [None if missing else value for missing, value in zip(np.isnat(values).tolist(), micros.tolist())]
+
+def _datetime_list(values: np.ndarray) -> List[Optional[datetime]]:
+    """Whole-column equivalent of _from_datetime64"""
+    micros = values.astype('datetime64[us]').astype(np.int64) / 1_000_000
+    return [None if missing else datetime.fromtimestamp(value)
+            for missing, value in zip(np.isnat(values).tolist(), micros.tolist())]
+
+def _from_datetime64(value: np.datetime64) -> Optional[datetime]:
+    if np.isnat(value):
+        return None
+    return datetime.fromtimestamp(value.astype('int64') / 1_000_000)
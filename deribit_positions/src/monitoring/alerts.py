@@ -0,0 +1,104 @@
+import json
+import logging
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Callable, Dict, List
+import requests
+from ..config import Config
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class Alert:
+    instrument_name: str
+    rule: str
+    message: str
+    value: float
+    limit: float
+    resolved: bool = False
+    timestamp: datetime = field(default_factory=datetime.now)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'instrument_name': self.instrument_name,
+            'rule': self.rule,
+            'message': self.message,
+            'value': self.value,
+            'limit': self.limit,
+            'resolved': self.resolved,
+            'timestamp': self.timestamp.isoformat()
+        }
+
+class AlertSink(ABC):
+    """Destination for limit alerts; emit must not block the monitor for long"""
+
+    @abstractmethod
+    def emit(self, alert: Alert):
+        ...
+
+    def close(self):
+        pass
+
+class LogSink(AlertSink):
+    def emit(self, alert: Alert):
+        if alert.resolved:
+            logger.info(f"Resolved {alert.rule} on {alert.instrument_name}")
+        else:
+            logger.warning(f"{alert.rule} on {alert.instrument_name}: {alert.message}")
+
+class FileSink(AlertSink):
+    """Appends alerts to a JSON-lines file"""
+
+    def __init__(self, path: str = Config.ALERT_LOG_FILE):
+        self.path = path
+        self._file = open(path, 'a')
+
+    def emit(self, alert: Alert):
+        self._file.write(json.dumps(alert.to_dict()) + '\n')
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+class CallbackSink(AlertSink):
+    """Hands alerts to a callable, e.g. to collect them in tests"""
+
+    def __init__(self, callback: Callable[[Alert], None]):
+        self.callback = callback
+
+    def emit(self, alert: Alert):
+        self.callback(alert)
+
+class WebhookSink(AlertSink):
+    """POSTs alerts as JSON from a background thread so slow endpoints never stall updates"""
+
+    def __init__(self, url: str = Config.ALERT_WEBHOOK_URL, timeout: float = Config.HTTP_TIMEOUT):
+        self.url = url
+        self.timeout = timeout
+        self.session = requests.Session()
+        self._executor = ThreadPoolExecutor(max_workers=1)
+
+    def emit(self, alert: Alert):
+        self._executor.submit(self._post, alert.to_dict())
+
+    def _post(self, payload: Dict[str, Any]):
+        try:
+            response = self.session.post(self.url, json=payload, timeout=self.timeout)
+            response.raise_for_status()
+        except requests.RequestException as e:
+            logger.error(f"Webhook delivery failed: {e}")
+
+    def close(self):
+        self._executor.shutdown()
+        self.session.close()
+
+def default_sinks() -> List[AlertSink]:
+    """Sinks enabled by configuration: always the log, plus file and webhook when set"""
+    sinks = [LogSink()]
+    if Config.ALERT_LOG_FILE:
+        sinks.append(FileSink(Config.ALERT_LOG_FILE))
+    if Config.ALERT_WEBHOOK_URL:
+        sinks.append(WebhookSink(Config.ALERT_WEBHOOK_URL))
+    return sinks
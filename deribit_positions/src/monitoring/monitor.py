@@ -0,0 +1,241 @@
+import asyncio
+import logging
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from ..config import Config
+from ..analysis.margin import MarginEstimator
+from ..models.position import Position
+from ..models.position_book import PositionBook
+from ..services.deribit_stream import PositionStream
+from ..storage.price_history import underlying_of
+from ..storage.snapshot_store import SnapshotStore
+from .alerts import Alert, AlertSink, default_sinks
+
+logger = logging.getLogger(__name__)
+
+class LimitRule(ABC):
+    """A per-position limit; check returns the breaching value or None"""
+    name = 'limit'
+
+    def __init__(self, limit: float):
+        self.limit = limit
+
+    @abstractmethod
+    def value(self, position: Position) -> Optional[float]:
+        """The measured value of the position that is compared with the limit"""
+
+    def limit_for(self, position: Position) -> Optional[float]:
+        """The limit that applies to this position; None if it is not checked"""
+        return self.limit
+
+    def breached(self, value: float, limit: Optional[float] = None) -> bool:
+        return value > (self.limit if limit is None else limit)
+
+    def check(self, position: Position) -> Optional[float]:
+        limit = self.limit_for(position)
+        if limit is None:
+            return None
+        value = self.value(position)
+        if value is not None and self.breached(value, limit):
+            return value
+        return None
+
+    def describe(self, value: float, limit: Optional[float] = None) -> str:
+        return f"{value:.4g} exceeds limit {self.limit if limit is None else limit:.4g}"
+
+class MaxPositionSizeRule(LimitRule):
+    """Breached when a position's base-currency size exceeds its underlying's limit
+
+    Inverse futures are sized in USD, so they are converted at the mark price
+    before the comparison. Underlyings without a limit are not checked.
+    """
+    name = 'max_position_size'
+
+    def __init__(self, limits: Optional[Dict[str, float]] = None):
+        self.limits = dict(Config.MAX_POSITION_SIZES if limits is None else limits)
+        super().__init__(self.limits.get('BTC', Config.MAX_POSITION_SIZE))
+
+    def limit_for(self, position: Position) -> Optional[float]:
+        return self.limits.get(underlying_of(position.instrument_name))
+
+    def value(self, position: Position) -> Optional[float]:
+        return position.base_size
+
+class MaxLeverageRule(LimitRule):
+    name = 'max_leverage'
+
+    def __init__(self, limit: float = Config.MAX_LEVERAGE):
+        super().__init__(limit)
+
+    def value(self, position: Position) -> Optional[float]:
+        return position.leverage
+
+class StopLossRule(LimitRule):
+    """Breached when the position has lost more than the stop-loss fraction of its cost"""
+    name = 'stop_loss'
+
+    def __init__(self, limit: float = Config.STOP_LOSS_PERCENTAGE):
+        super().__init__(limit)
+
+    def value(self, position: Position) -> Optional[float]:
+        if not position.entry_price or not position.size:
+            return None
+        return -position.pnl_percentage / 100
+
+    def describe(self, value: float, limit: Optional[float] = None) -> str:
+        return f"loss of {value:.2%} exceeds stop-loss {self.limit if limit is None else limit:.2%}"
+
+def default_rules() -> List[LimitRule]:
+    return [MaxPositionSizeRule(), MaxLeverageRule(), StopLossRule()]
+
+class PositionMonitor:
+    """Re-evaluates limit rules for the positions changed by each stream update
+
+    Alerts are deduplicated: a breach fires once when it starts and a resolved
+    alert fires once when it clears, however many updates happen in between.
+    After the rules, margin is re-estimated over a columnar mirror of the
+    stream's book: futures closer to liquidation than LIQUIDATION_DISTANCE_HIGH
+    and, for underlyings with a known balance, maintenance margin above
+    MARGIN_UTILIZATION_LIMIT of that underlying's equity raise alerts.
+    """
+
+    def __init__(self, stream: PositionStream, rules: Optional[List[LimitRule]] = None,
+                 sinks: Optional[List[AlertSink]] = None, latency_window: int = 10000,
+                 snapshot_store: Optional[SnapshotStore] = None,
+                 margin: Optional[MarginEstimator] = None):
+        self.stream = stream
+        self.snapshot_store = snapshot_store
+        self.rules = rules if rules is not None else default_rules()
+        self.margin = margin if margin is not None else MarginEstimator()
+        self.book = PositionBook()
+        self.last_margin: Optional[Dict[str, np.ndarray]] = None
+        self.sinks = sinks if sinks is not None else default_sinks()
+        self.active_alerts: Dict[Tuple[str, str], Alert] = {}
+
+        self.updates_evaluated = 0
+        self.alerts_fired = 0
+        self.total_evaluation_time = 0.0
+        self.max_evaluation_time = 0.0
+        self._recent_latencies = deque(maxlen=latency_window)
+
+        stream.on_update = self.on_update
+
+    def on_update(self, changed: Iterable[str]):
+        """Evaluate rules for the changed instruments only"""
+        start = time.perf_counter()
+        for name in changed:
+            position = self.stream.positions.get(name)
+            self._evaluate(name, position)
+            if position is not None:
+                self.book.add(position)
+            elif name in self.book:
+                self.book.remove(name)
+        self._evaluate_margin()
+
+        elapsed = time.perf_counter() - start
+        self.updates_evaluated += 1
+        self.total_evaluation_time += elapsed
+        self.max_evaluation_time = max(self.max_evaluation_time, elapsed)
+        self._recent_latencies.append(elapsed)
+
+    def _evaluate(self, instrument_name: str, position: Optional[Position]):
+        for rule in self.rules:
+            if position is None:
+                self._transition(instrument_name, rule.name, None, rule.limit, rule.describe)
+                continue
+            limit = rule.limit_for(position)
+            self._transition(instrument_name, rule.name, rule.check(position), limit,
+                             lambda value: rule.describe(value, limit))
+
+    def _evaluate_margin(self):
+        """Whole-book margin estimate; array arithmetic only, so cheap enough for every update"""
+        estimate = self.last_margin = self.margin.estimate(self.book)
+
+        # Cross margin is per underlying, so each underlying's utilization is checked on its own
+        limit = Config.MARGIN_UTILIZATION_LIMIT
+        over = {}
+        if self.margin.balances:
+            over = {underlying: margin['margin_utilization']
+                    for underlying, margin in self.margin.margin_by_underlying(self.book, estimate).items()
+                    if margin['margin_utilization'] is not None and margin['margin_utilization'] > limit}
+        active = [key[0] for key in self.active_alerts if key[1] == 'margin_utilization']
+        for underlying in set(over).union(active):
+            self._transition(underlying, 'margin_utilization', over.get(underlying), limit,
+                             lambda value: f"maintenance margin is {value:.1%} of equity")
+
+        limit = Config.LIQUIDATION_DISTANCE_HIGH
+        distance = estimate['liquidation_distance']
+        near = {self.book.instrument_names[row]: float(distance[row])
+                for row in np.flatnonzero(distance < limit)}
+        active = [key[0] for key in self.active_alerts if key[1] == 'liquidation_distance']
+        for name in set(near).union(active):
+            self._transition(name, 'liquidation_distance', near.get(name), limit,
+                             lambda value: f"{value:.2%} from liquidation, within {limit:.2%}")
+
+    def _transition(self, instrument_name: str, rule_name: str, value: Optional[float], limit: float,
+                    describe: Callable[[float], str]):
+        """Fire an alert when a breach starts and a resolved alert when it clears"""
+        key = (instrument_name, rule_name)
+        active = self.active_alerts.get(key)
+        if value is not None and active is None:
+            alert = Alert(instrument_name, rule_name, describe(value), value, limit)
+            self.active_alerts[key] = alert
+            self._emit(alert)
+        elif value is None and active is not None:
+            del self.active_alerts[key]
+            self._emit(Alert(instrument_name, rule_name, 'back within limit',
+                             active.value, active.limit, resolved=True))
+
+    def _emit(self, alert: Alert):
+        self.alerts_fired += 1
+        for sink in self.sinks:
+            try:
+                sink.emit(alert)
+            except Exception as e:
+                logger.error(f"Alert sink {type(sink).__name__} failed: {e}")
+
+    def latency_report(self) -> Dict[str, float]:
+        """Rule evaluation latency per update, in microseconds"""
+        recent = np.fromiter(self._recent_latencies, dtype=np.float64) * 1e6
+        return {
+            'updates': self.updates_evaluated,
+            'alerts_fired': self.alerts_fired,
+            'active_alerts': len(self.active_alerts),
+            'mean_us': self.total_evaluation_time / self.updates_evaluated * 1e6 if self.updates_evaluated else 0.0,
+            'p99_us': float(np.percentile(recent, 99)) if len(recent) else 0.0,
+            'max_us': self.max_evaluation_time * 1e6
+        }
+
+    async def run(self):
+        """Run the underlying stream until it is stopped, recording snapshots if configured"""
+        if self.snapshot_store is None:
+            await self.stream.run()
+            return
+        recorder = asyncio.create_task(self._record_snapshots())
+        try:
+            await self.stream.run()
+        finally:
+            recorder.cancel()
+
+    async def _record_snapshots(self):
+        store = self.snapshot_store
+        day = time.strftime('%Y-%m-%d', time.gmtime())
+        while True:
+            await asyncio.sleep(Config.SNAPSHOT_INTERVAL)
+            store.append(self.stream.positions.values())
+            today = time.strftime('%Y-%m-%d', time.gmtime())
+            if today != day:
+                day = today
+                # Compaction and retention touch only closed days, so run them off the event loop
+                await asyncio.to_thread(store.compact_closed_days)
+                await asyncio.to_thread(store.apply_retention)
+
+    async def stop(self):
+        await self.stream.stop()
+        for sink in self.sinks:
+            sink.close()
+        if self.snapshot_store is not None:
+            self.snapshot_store.close()
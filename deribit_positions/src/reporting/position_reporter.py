@@ -1,55 +1,235 @@
-from typing import List, Dict
+import os
+from typing import List, Dict, Iterator, Optional, Union
+import numpy as np
 import pandas as pd
 import plotly.graph_objects as go
+from plotly.offline import get_plotlyjs
 from datetime import datetime
+from ..config import Config
 from ..models.position import Position
+from ..analysis.attribution import AttributionEngine
 from ..analysis.risk_calculator import RiskCalculator
+from ..analysis.stress import StressEngine
+from ..models.position_book import PositionBook
+from ..services.market_data import MarketData
+from ..services.account_collector import consolidate
+
+# Indexed by option_type code + 1 (put -1, none 0, call 1)
+OPTION_TYPE_LABELS = np.array(['put', None, 'call'], dtype=object)
+
+REPORT_STRING_COLUMNS = ('instrument_name', 'account', 'position_type', 'direction', 'option_type', 'liquidation_risk')
+REPORT_DATETIME_COLUMNS = ('timestamp', 'expiration_date')
+PLOT_MODES = ('instrument', 'top', 'expiry', 'strike', 'type')
 
 class PositionReporter:
-    def __init__(self, positions: List[Position]):
-        self.positions = positions
+    def __init__(self, positions: Union[List[Position], PositionBook], market_data: Optional[MarketData] = None,
+                 accounts: Optional[Dict[str, List[Position]]] = None,
+                 previous: Union[List[Position], PositionBook, None] = None,
+                 previous_time: Optional[datetime] = None,
+                 offset_pnl: Optional[Dict[str, float]] = None):
         self.risk_calculator = RiskCalculator()
+        self.market_data = market_data
+        self.accounts = accounts
+        # PnL of instruments netted out of a consolidated book, per instrument
+        self.offset_pnl = offset_pnl
+        # An earlier snapshot to attribute the PnL change against
+        self.previous = previous
+        self.previous_time = previous_time
+        self.positions = positions
+
+    @classmethod
+    def for_accounts(cls, accounts: Dict[str, List[Position]],
+                     market_data: Optional[MarketData] = None) -> 'PositionReporter':
+        """Report on the consolidated book of several accounts, with per-account metrics"""
+        merged = [position for positions in accounts.values() for position in positions]
+        consolidation = consolidate(merged)
+        return cls(consolidation.positions, market_data, accounts, offset_pnl=consolidation.offset_pnl)
+
+    @property
+    def positions(self) -> Union[List[Position], PositionBook]:
+        """Position objects, or a PositionBook from DeribitClient.get_position_book"""
+        return self._positions
+
+    @positions.setter
+    def positions(self, positions: Union[List[Position], PositionBook]):
+        self._positions = positions
+        self.invalidate()
+
+    def invalidate(self):
+        """Drop the cached report model; call after mutating Position objects in place
+
+        Changes to a PositionBook are picked up from its version counter.
+        """
+        self._book: Optional[PositionBook] = None
+        self._book_version = -1
+        self._drop_results()
+
+    def _drop_results(self):
+        self._columns: Optional[Dict[str, np.ndarray]] = None
+        self._frame: Optional[pd.DataFrame] = None
+        self._attribution: Optional[pd.DataFrame] = None
+        self._summary: Optional[Dict] = None
+
+    def _check_book(self):
+        """Drop results built before the last change to the book"""
+        if self._book is not None and self._book.version != self._book_version:
+            self._drop_results()
+            self._book_version = self._book.version
+
+    @property
+    def book(self) -> PositionBook:
+        if self._book is None:
+            self._book = self.risk_calculator.as_book(self._positions, self.market_data)
+            self._book_version = self._book.version
+        return self._book
+
+    def report_columns(self) -> Dict[str, np.ndarray]:
+        """Position fields and risks as whole-book arrays, computed once per change"""
+        self._check_book()
+        if self._columns is None:
+            book = self.book
+            columns = {
+                'instrument_name': np.asarray(book.instrument_names, dtype=object),
+                'position_type': np.where(book.column('is_option'), 'option', 'future').astype(object),
+                'direction': np.where(book.column('sign') > 0, 'long', 'short').astype(object),
+                'size': book.column('size'),
+                'entry_price': book.column('entry_price'),
+                'current_price': book.column('current_price'),
+                'pnl': book.pnl,
+                'pnl_percentage': book.pnl_percentage,
+                'timestamp': book.column('timestamp'),
+                'leverage': book.column('leverage'),
+                'option_type': OPTION_TYPE_LABELS[book.column('option_type') + 1],
+                'strike_price': book.column('strike'),
+                'expiration_date': book.column('expiry'),
+                'mark_iv': book.column('mark_iv'),
+                'underlying_price': book.column('underlying_price'),
+            }
+            if book.has_accounts:
+                columns['account'] = np.asarray(book.accounts, dtype=object)
+            columns.update(self.risk_calculator.calculate_book_risks(book))
+            self._columns = columns
+        return self._columns
+
+    def report_frame(self) -> pd.DataFrame:
+        """Position report as a DataFrame, built column-wise and memoized"""
+        self._check_book()
+        if self._frame is None:
+            self._frame = pd.DataFrame(self.report_columns(), copy=False)
+        return self._frame
+
+    def iter_report_frames(self, chunk_size: int = Config.EXPORT_CHUNK_ROWS) -> Iterator[pd.DataFrame]:
+        """Position report in row chunks, so exports never hold the whole frame"""
+        self._check_book()
+        if self._frame is not None:
+            for start in range(0, max(len(self._frame), 1), chunk_size):
+                yield self._frame.iloc[start:start + chunk_size]
+            return
+        columns = self.report_columns()
+        rows = len(self.book)
+        for start in range(0, max(rows, 1), chunk_size):
+            yield pd.DataFrame({name: values[start:start + chunk_size] for name, values in columns.items()},
+                               copy=False)
 
     def generate_summary_report(self) -> Dict:
-        """Generate a summary report of all positions"""
-        portfolio_metrics = self.risk_calculator.calculate_portfolio_metrics(self.positions)
-        
-        position_summaries = []
-        for position in self.positions:
-            risks = self.risk_calculator.calculate_position_risks(position)
-            position_data = position.to_dict()
-            position_data.update(risks)
-            position_summaries.append(position_data)
-        
-        return {
-            'timestamp': datetime.now(),
-            'portfolio_metrics': portfolio_metrics,
-            'positions': position_summaries
-        }
-
-    def plot_position_distribution(self) -> go.Figure:
-        """Create a visual representation of position distribution"""
-        df = pd.DataFrame([p.to_dict() for p in self.positions])
+        """Generate a summary report of all positions
+
+        'positions' is the memoized report DataFrame, one row per position.
+        """
+        self._check_book()
+        if self._summary is None:
+            self._summary = {
+                'timestamp': datetime.now(),
+                'portfolio_metrics': self.portfolio_metrics(),
+                'greeks': self.risk_calculator.calculate_portfolio_greeks(self.book),
+                'margin': self.risk_calculator.calculate_margin(self.book),
+                'positions': self.report_frame()
+            }
+            if self.accounts is not None:
+                self._summary['accounts'] = self.account_metrics()
+            if self.previous is not None:
+                self._summary['pnl_attribution'] = AttributionEngine.summary(self.pnl_attribution())
+        return self._summary
+
+    def portfolio_metrics(self) -> Dict[str, float]:
+        """Portfolio metrics of the book, with the PnL of offset instruments added to total_pnl"""
+        metrics = self.risk_calculator.calculate_portfolio_metrics(self.book)
+        if self.offset_pnl:
+            offset_pnl = sum(self.offset_pnl.values())
+            metrics['offset_pnl'] = offset_pnl
+            metrics['total_pnl'] += offset_pnl
+            total_value = metrics['total_value']
+            metrics['pnl_percentage'] = (metrics['total_pnl'] / total_value) * 100 if total_value else 0
+        return metrics
+
+    def pnl_attribution(self) -> pd.DataFrame:
+        """PnL change since the previous snapshot per instrument, split into its components"""
+        if self.previous is None:
+            raise ValueError("PnL attribution needs a previous snapshot")
+        self._check_book()
+        if self._attribution is None:
+            previous = self.risk_calculator.as_book(self.previous)
+            attribution = AttributionEngine().attribute(previous, self.book, self.previous_time, datetime.now())
+            columns = ['instrument_name', 'status', 'previous_pnl', 'current_pnl', 'pnl_change']
+            columns += [name for name in attribution if name not in columns]
+            self._attribution = pd.DataFrame({name: attribution[name] for name in columns}, copy=False)
+        return self._attribution
+
+    def account_metrics(self) -> Dict[str, Dict]:
+        """Portfolio metrics and net Greeks per account"""
+        metrics = {}
+        for account, positions in (self.accounts or {}).items():
+            book = self.risk_calculator.as_book(positions, self.market_data)
+            metrics[account] = {
+                'portfolio_metrics': self.risk_calculator.calculate_portfolio_metrics(book),
+                'greeks': self.risk_calculator.calculate_portfolio_greeks(book)['portfolio']
+            }
+        return metrics
+
+    def plot_position_distribution(self, mode: str = 'instrument', top_n: int = Config.PLOT_TOP_N,
+                                   strike_bucket: Optional[float] = None) -> go.Figure:
+        """Create a visual representation of position distribution
+
+        mode is one of PLOT_MODES: 'instrument' (one point per position), 'top'
+        (top_n positions by absolute PnL plus 'other'), 'expiry', 'strike'
+        (options bucketed by strike_bucket) or 'type'.
+        """
+        if mode not in PLOT_MODES:
+            raise ValueError(f"Unknown plot mode {mode!r}, expected one of {PLOT_MODES}")
+        df = self.report_frame()
+        if mode == 'instrument':
+            labels, size, pnl, count = df['instrument_name'], df['size'], df['pnl'], None
+        else:
+            grouped = self._aggregate(df, mode, top_n, strike_bucket)
+            labels, size, pnl, count = grouped.index, grouped['size'], grouped['pnl'], grouped['count']
         
         fig = go.Figure()
         
-        # Add position sizes
-        fig.add_trace(go.Bar(
-            x=df['instrument_name'],
-            y=df['size'],
-            name='Position Size'
-        ))
-        
-        # Add PnL
-        fig.add_trace(go.Scatter(
-            x=df['instrument_name'],
-            y=df['pnl'],
-            name='PnL',
-            yaxis='y2'
-        ))
+        # Dense views render through WebGL; bars would create one SVG element per point
+        if len(labels) > Config.PLOT_WEBGL_THRESHOLD:
+            fig.add_trace(go.Scattergl(x=labels, y=size, mode='markers', name='Position Size'))
+            fig.add_trace(go.Scattergl(x=labels, y=pnl, mode='markers', name='PnL', yaxis='y2'))
+        else:
+            # Add position sizes
+            fig.add_trace(go.Bar(
+                x=labels,
+                y=size,
+                name='Position Size',
+                customdata=count,
+                hovertemplate='%{x}<br>Size %{y}<br>Positions %{customdata}' if count is not None else None
+            ))
+            
+            # Add PnL
+            fig.add_trace(go.Scatter(
+                x=labels,
+                y=pnl,
+                name='PnL',
+                yaxis='y2'
+            ))
         
+        title = 'Position Distribution and PnL'
         fig.update_layout(
-            title='Position Distribution and PnL',
+            title=title if mode == 'instrument' else f"{title} by {mode}",
             yaxis=dict(title='Position Size (BTC)'),
             yaxis2=dict(title='PnL', overlaying='y', side='right'),
             barmode='group'
@@ -57,8 +237,112 @@ class PositionReporter:
         
         return fig
 
-    def export_to_csv(self, filename: str):
-        """Export position data to CSV"""
-        report = self.generate_summary_report()
-        df = pd.DataFrame(report['positions'])
-        df.to_csv(filename, index=False)
\ No newline at end of file
+    @staticmethod
+    def _aggregate(df: pd.DataFrame, mode: str, top_n: int,
+                   strike_bucket: Optional[float]) -> pd.DataFrame:
+        """Sum size and PnL per plot bucket"""
+        if mode == 'top':
+            ranked = df['pnl'].abs().to_numpy().argsort(kind='stable')[::-1]
+            keys = np.full(len(df), 'other', dtype=object)
+            keys[ranked[:top_n]] = df['instrument_name'].to_numpy()[ranked[:top_n]]
+        elif mode == 'expiry':
+            expiry = pd.to_datetime(df['expiration_date']).dt.strftime('%Y-%m-%d')
+            keys = expiry.fillna('perpetual').to_numpy(dtype=object)
+        elif mode == 'strike':
+            strike = df['strike_price'].to_numpy(dtype=np.float64)
+            if strike_bucket is None:
+                spread = np.nanmax(strike) - np.nanmin(strike) if np.isfinite(strike).any() else 0.0
+                strike_bucket = _nice_bucket(spread / Config.PLOT_STRIKE_BUCKETS)
+            with np.errstate(invalid='ignore'):
+                lower = np.floor(strike / strike_bucket) * strike_bucket
+            keys = np.where(np.isfinite(lower), lower, np.nan)
+        else:
+            keys = df['position_type'].to_numpy(dtype=object)
+        
+        grouped = pd.DataFrame({'key': keys, 'size': df['size'].to_numpy(), 'pnl': df['pnl'].to_numpy()})
+        result = grouped.groupby('key', sort=True, dropna=False).agg(
+            size=('size', 'sum'), pnl=('pnl', 'sum'), count=('size', 'size'))
+        if mode == 'strike':
+            result.index = [f"{lower:g}-{lower + strike_bucket:g}" if np.isfinite(lower) else 'future'
+                            for lower in result.index]
+        elif mode == 'top':
+            result = result.loc[sorted(result.index, key=lambda key: key == 'other')]
+        return result
+
+    def save_plot(self, fig: go.Figure, filename: str):
+        """Write a figure as HTML that references a shared plotly.js file instead of embedding it"""
+        include = Config.PLOTLY_JS_ASSET
+        if include != 'cdn':
+            asset = os.path.join(os.path.dirname(os.path.abspath(filename)), include)
+            if not os.path.exists(asset):
+                with open(asset + '.tmp', 'w', encoding='utf-8') as f:
+                    f.write(get_plotlyjs())
+                os.replace(asset + '.tmp', asset)
+        fig.write_html(filename, include_plotlyjs=include)
+
+    def export_to_csv(self, filename: str, chunk_size: int = Config.EXPORT_CHUNK_ROWS):
+        """Export position data to CSV, writing chunk by chunk"""
+        for i, chunk in enumerate(self.iter_report_frames(chunk_size)):
+            chunk.to_csv(filename, mode='w' if i == 0 else 'a', header=i == 0, index=False)
+
+    def export_to_parquet(self, filename: str, chunk_size: int = Config.EXPORT_CHUNK_ROWS):
+        """Stream position data to a Parquet file, one row group per chunk"""
+        pa = _import_pyarrow()
+        import pyarrow.parquet as pq
+        schema = self._arrow_schema()
+        with pq.ParquetWriter(filename, schema) as writer:
+            for chunk in self.iter_report_frames(chunk_size):
+                writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+
+    def export_to_arrow(self, filename: str, chunk_size: int = Config.EXPORT_CHUNK_ROWS):
+        """Stream position data to an Arrow IPC file, one record batch per chunk"""
+        pa = _import_pyarrow()
+        schema = self._arrow_schema()
+        with pa.OSFile(filename, 'wb') as sink, pa.ipc.new_file(sink, schema) as writer:
+            for chunk in self.iter_report_frames(chunk_size):
+                writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+
+    def _arrow_schema(self):
+        # Explicit so chunks where a column is all null still share one schema
+        pa = _import_pyarrow()
+        fields = []
+        for name in self.report_columns():
+            if name in REPORT_STRING_COLUMNS:
+                fields.append(pa.field(name, pa.string()))
+            elif name in REPORT_DATETIME_COLUMNS:
+                fields.append(pa.field(name, pa.timestamp('us')))
+            else:
+                fields.append(pa.field(name, pa.float64()))
+        return pa.schema(fields)
+
+    def export_pnl_attribution(self, filename: str):
+        """Export the per-instrument PnL attribution to CSV"""
+        self.pnl_attribution().to_csv(filename, index=False)
+
+    def export_stress_grid(self, filename: str, engine: Optional[StressEngine] = None,
+                           per_position: bool = False):
+        """Export stress test PnL in long format, for the portfolio or per position"""
+        engine = engine or StressEngine()
+        book = self.book
+        if per_position:
+            records = engine.grid_records(engine.position_surface(book), book.instrument_names)
+        else:
+            records = engine.grid_records(engine.portfolio_surface(book))
+        pd.DataFrame(records).to_csv(filename, index=False)
+
+def _import_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.ipc
+    except ImportError as e:
+        raise ImportError("Parquet and Arrow exports require pyarrow (pip install pyarrow)") from e
+    return pyarrow
+
+def _nice_bucket(width: float) -> float:
+    """Round a bucket width up to 1, 2 or 5 times a power of ten"""
+    if not width > 0:
+        return 1.0
+    magnitude = 10 ** np.floor(np.log10(width))
+    for step in (1, 2, 5, 10):
+        if width <= step * magnitude:
+            return float(step * magnitude)
\ No newline at end of file
@@ -0,0 +1,150 @@
+import asyncio
+import json
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field, replace
+from typing import Dict, List, Optional
+from ..config import Config
+from ..models.position import Position
+from ..models.position_book import PositionBook
+from .deribit_client import DeribitClient
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class Account:
+    name: str
+    client_id: str
+    client_secret: str
+    base_url: Optional[str] = None
+    test_mode: bool = True
+
+def load_accounts(path: str = Config.ACCOUNTS_FILE) -> List[Account]:
+    """Read accounts from a JSON list of {name, client_id, client_secret[, base_url, test_mode]}"""
+    with open(path) as f:
+        return [Account(**entry) for entry in json.load(f)]
+
+@dataclass
+class CollectionResult:
+    positions: Dict[str, List[Position]] = field(default_factory=dict)
+    errors: Dict[str, Exception] = field(default_factory=dict)
+    durations: Dict[str, float] = field(default_factory=dict)
+    wall_time: float = 0.0
+
+    @property
+    def merged(self) -> List[Position]:
+        """Every account's positions in one list, tagged with their account"""
+        return [position for positions in self.positions.values() for position in positions]
+
+    @property
+    def book(self) -> PositionBook:
+        """Every account's positions in one book, one row per account and instrument"""
+        return PositionBook.from_positions(self.merged)
+
+class AccountCollector:
+    """Fetches positions for many accounts concurrently under a concurrency limit
+
+    Each account gets its own DeribitClient, and so its own credit scheduler,
+    because Deribit rate limits apply per account. The blocking clients run in
+    a dedicated pool of max_concurrency worker threads, so wall time follows
+    the slowest account rather than the number of accounts as long as the
+    limit is not the bottleneck.
+    """
+
+    def __init__(self, accounts: List[Account], max_concurrency: int = Config.ACCOUNT_CONCURRENCY,
+                 currencies: Optional[List[str]] = None):
+        if not accounts:
+            raise ValueError("No accounts to collect")
+        self.accounts = accounts
+        self.max_concurrency = max_concurrency
+        self.currencies = currencies
+        self.clients = {
+            account.name: DeribitClient(test_mode=account.test_mode, base_url=account.base_url,
+                                        client_id=account.client_id, client_secret=account.client_secret)
+            for account in accounts
+        }
+        # Instruments and market data are public, so one catalog and cache serve every account
+        shared = next(iter(self.clients.values()))
+        self.market_data = shared.market_data
+        for client in self.clients.values():
+            client.catalog = shared.catalog
+            client.market_data = shared.market_data
+        # Not the default executor, which is capped at min(32, cpu + 4) threads
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix='account')
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+        for client in self.clients.values():
+            client.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    async def collect(self) -> CollectionResult:
+        """Authenticate and fetch every account; failures are recorded per account"""
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        result = CollectionResult()
+        start = time.perf_counter()
+        await asyncio.gather(*(self._collect_account(account, semaphore, result) for account in self.accounts))
+        result.wall_time = time.perf_counter() - start
+        logger.info(f"Collected {len(result.positions)}/{len(self.accounts)} accounts in {result.wall_time:.2f}s")
+        return result
+
+    async def _collect_account(self, account: Account, semaphore: asyncio.Semaphore,
+                               result: CollectionResult):
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                positions = await asyncio.get_running_loop().run_in_executor(
+                    self._executor, self.clients[account.name].get_positions, self.currencies)
+            except Exception as e:
+                logger.error(f"Account {account.name} failed: {e}")
+                result.errors[account.name] = e
+                return
+            finally:
+                result.durations[account.name] = time.perf_counter() - start
+            result.positions[account.name] = [replace(position, account=account.name) for position in positions]
+
+@dataclass
+class Consolidation:
+    positions: List[Position] = field(default_factory=list)
+    # PnL of instruments whose legs fully offset, which no longer have a net position to carry it
+    offset_pnl: Dict[str, float] = field(default_factory=dict)
+
+def consolidate(positions: List[Position]) -> Consolidation:
+    """Net positions in the same instrument across accounts
+
+    The net entry price is the size-weighted average, which keeps the summed
+    PnL of the legs. Instruments whose legs offset to within NET_SIZE_TOLERANCE
+    of their gross size have no net position; their legs' PnL, which no longer
+    depends on the mark, is kept in offset_pnl.
+    """
+    legs: Dict[str, List[Position]] = {}
+    for position in positions:
+        legs.setdefault(position.instrument_name, []).append(position)
+
+    result = Consolidation()
+    for name, instrument_legs in legs.items():
+        if len(instrument_legs) == 1:
+            result.positions.append(replace(instrument_legs[0], account=None))
+            continue
+        signed_sizes = [leg.size if leg.direction == 'long' else -leg.size for leg in instrument_legs]
+        net_size = sum(signed_sizes)
+        if abs(net_size) <= Config.NET_SIZE_TOLERANCE * sum(leg.size for leg in instrument_legs):
+            result.offset_pnl[name] = sum(leg.pnl for leg in instrument_legs)
+            continue
+        entry_price = sum(size * leg.entry_price for size, leg in zip(signed_sizes, instrument_legs)) / net_size
+        latest = max(instrument_legs, key=lambda leg: leg.timestamp)
+        result.positions.append(replace(
+            latest,
+            direction='long' if net_size > 0 else 'short',
+            size=abs(net_size),
+            entry_price=entry_price,
+            leverage=None,
+            account=None
+        ))
+    return result
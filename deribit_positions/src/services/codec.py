@@ -0,0 +1,13 @@
+import json
+from typing import Any, Union
+
+try:
+    import orjson
+except ImportError:  # optional: the standard library parser gives the same result, slower
+    orjson = None
+
+def loads(data: Union[bytes, str]) -> Any:
+    """Decode a JSON response body, with orjson when it is installed"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
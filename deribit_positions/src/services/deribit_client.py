@@ -1,62 +1,243 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
 import requests
-from typing import Dict, List, Any
+from requests.adapters import HTTPAdapter
+from typing import Dict, List, Any, Optional
 from datetime import datetime
 from ..config import Config
-from ..models.position import Position
+from ..models.position import Position, is_inverse_future
+from ..models.position_book import OPTION_TYPE_CODES, PositionBook
+from .codec import loads
+from .instrument_catalog import InstrumentCatalog, InstrumentSpec, parse_instrument_name
+from .market_data import MarketData
+from .errors import DeribitAPIError, RateLimitError
+from .request_scheduler import PRIORITY_CRITICAL, PRIORITY_NORMAL, PRIORITY_REPORTING, RequestScheduler
+
+logger = logging.getLogger(__name__)
 
 class DeribitClient:
-    def __init__(self, test_mode: bool = True):
-        self.base_url = Config.TEST_URL if test_mode else Config.PROD_URL
+    def __init__(self, test_mode: bool = True, base_url: Optional[str] = None,
+                 client_id: Optional[str] = None, client_secret: Optional[str] = None,
+                 scheduler: Optional[RequestScheduler] = None):
+        self.base_url = base_url or (Config.TEST_URL if test_mode else Config.PROD_URL)
+        self.client_id = client_id or Config.CLIENT_ID
+        self.client_secret = client_secret or Config.CLIENT_SECRET
         self.access_token = None
         self.refresh_token = None
-        self.authenticate()
+        self.token_expires_at = 0.0
+        self._auth_lock = threading.Lock()
+        # Rate limits are per account, so clients of one account should share a scheduler
+        self.scheduler = scheduler or RequestScheduler()
+
+        # One pooled session so requests reuse TLS connections
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=Config.HTTP_POOL_SIZE,
+                              pool_maxsize=Config.HTTP_POOL_SIZE)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+        self.catalog = InstrumentCatalog(self)
+        self.market_data = MarketData(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """Close pooled connections"""
+        self.session.close()
 
     def authenticate(self):
         """Authenticate with Deribit API"""
-        endpoint = "/api/v2/public/auth"
-        data = {
+        self._request_token({
             "grant_type": "client_credentials",
-            "client_id": Config.CLIENT_ID,
-            "client_secret": Config.CLIENT_SECRET
-        }
-        
-        response = requests.post(f"{self.base_url}{endpoint}", json=data)
-        if response.status_code == 200:
-            result = response.json()["result"]
-            self.access_token = result["access_token"]
-            self.refresh_token = result["refresh_token"]
-        else:
-            raise Exception("Authentication failed")
+            "client_id": self.client_id,
+            "client_secret": self.client_secret
+        })
+
+    def refresh_access_token(self):
+        """Exchange the refresh token for a new access token"""
+        try:
+            self._request_token({
+                "grant_type": "refresh_token",
+                "refresh_token": self.refresh_token
+            })
+        except DeribitAPIError:
+            # Refresh tokens can expire too; fall back to full credentials
+            self.authenticate()
+
+    def _request_token(self, data: Dict[str, Any]):
+        result = self._send('POST', "/api/v2/public/auth", PRIORITY_CRITICAL, json=data)
+        self.access_token = result["access_token"]
+        self.refresh_token = result["refresh_token"]
+        self.token_expires_at = time.time() + result["expires_in"]
+
+    def ensure_authenticated(self):
+        """Authenticate lazily and refresh the token before it expires"""
+        with self._auth_lock:
+            if self.access_token is None:
+                self.authenticate()
+            elif time.time() >= self.token_expires_at - Config.TOKEN_REFRESH_MARGIN:
+                self.refresh_access_token()
+
+    def _send(self, method: str, endpoint: str, priority: int, private: bool = False,
+              cost: float = Config.RATE_LIMIT_REQUEST_COST, **kwargs) -> Any:
+        """Send a request through the credit scheduler, retrying too_many_requests"""
+        for attempt in range(Config.RATE_LIMIT_MAX_RETRIES + 1):
+            self.scheduler.acquire(cost, priority)
+            if private:
+                kwargs['headers'] = {"Authorization": f"Bearer {self.access_token}"}
+            response = self.session.request(method, f"{self.base_url}{endpoint}",
+                                            timeout=Config.HTTP_TIMEOUT, **kwargs)
+            if response.status_code == 200:
+                return loads(response.content)["result"]
+
+            error = DeribitAPIError.from_response(endpoint, response)
+            if not isinstance(error, RateLimitError) or attempt == Config.RATE_LIMIT_MAX_RETRIES:
+                raise error
+            self.scheduler.penalize()
+            delay = self.scheduler.backoff_delay(attempt)
+            logger.warning(f"Rate limited on {endpoint}, retrying in {delay:.2f}s")
+            time.sleep(delay)
+
+    def _private_get(self, endpoint: str, params: Dict[str, Any],
+                     priority: int = PRIORITY_NORMAL) -> Any:
+        self.ensure_authenticated()
+        return self._send('GET', endpoint, priority, private=True, params=params)
+
+    def _public_get(self, endpoint: str, params: Dict[str, Any],
+                    priority: int = PRIORITY_REPORTING) -> Any:
+        return self._send('GET', endpoint, priority, params=params)
+
+    def get_instruments(self, currency: str, expired: bool = False) -> List[Dict[str, Any]]:
+        """Get the instrument definitions of a currency"""
+        endpoint = "/api/v2/public/get_instruments"
+        return self._public_get(endpoint, {"currency": currency, "expired": str(expired).lower()})
+
+    def get_book_summary(self, currency: str) -> List[Dict[str, Any]]:
+        """Get mark price, IV and underlying price of every instrument of a currency"""
+        endpoint = "/api/v2/public/get_book_summary_by_currency"
+        return self._public_get(endpoint, {"currency": currency})
+
+    def get_positions(self, currencies: Optional[List[str]] = None) -> List[Position]:
+        """Get all open positions across currencies"""
+        return [self.parse_position(pos, self.catalog) for pos in self._fetch_positions(currencies)]
 
-    def get_positions(self) -> List[Position]:
-        """Get all open positions"""
+    def get_position_book(self, currencies: Optional[List[str]] = None) -> PositionBook:
+        """Get all open positions as a columnar book, without building Position objects"""
+        return self.parse_position_book(self._fetch_positions(currencies), self.catalog)
+
+    def _fetch_positions(self, currencies: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        currencies = currencies or Config.POSITION_CURRENCIES
+        self.catalog.refresh(currencies)
+
+        # Authenticate once up front instead of racing in every worker
+        self.ensure_authenticated()
+        with ThreadPoolExecutor(max_workers=len(currencies)) as executor:
+            results = list(executor.map(self._fetch_currency_positions, currencies))
+
+        return [pos for result in results for pos in result]
+
+    def _fetch_currency_positions(self, currency: str) -> List[Dict[str, Any]]:
         endpoint = "/api/v2/private/get_positions"
-        headers = {"Authorization": f"Bearer {self.access_token}"}
-        params = {"currency": "BTC"}
-        
-        response = requests.get(f"{self.base_url}{endpoint}", headers=headers, params=params)
-        if response.status_code != 200:
-            raise Exception("Failed to fetch positions")
-            
-        positions = []
-        result = response.json()["result"]
-        
-        for pos in result:
-            position_type = 'option' if 'option' in pos['instrument_name'].lower() else 'future'
-            
-            position = Position(
-                instrument_name=pos['instrument_name'],
-                position_type=position_type,
-                direction='long' if pos['size'] > 0 else 'short',
-                size=abs(pos['size']),
-                entry_price=pos['average_price'],
-                current_price=pos['mark_price'],
-                timestamp=datetime.fromtimestamp(pos['timestamp'] / 1000),
-                leverage=pos.get('leverage'),
-                option_type=pos.get('option_type'),
-                strike_price=pos.get('strike'),
-                expiration_date=datetime.fromtimestamp(pos['expiration_timestamp'] / 1000) if 'expiration_timestamp' in pos else None
-            )
-            positions.append(position)
-            
-        return positions
\ No newline at end of file
+        return self._private_get(endpoint, {"currency": currency})
+
+    def get_currency_positions(self, currency: str) -> List[Position]:
+        """Get open positions for a single currency"""
+        return [self.parse_position(pos, self.catalog) for pos in self._fetch_currency_positions(currency)]
+
+    @staticmethod
+    def parse_position(pos: Dict[str, Any], catalog: Optional[InstrumentCatalog] = None) -> Position:
+        """Build a Position from a Deribit position payload
+
+        Kind, strike, expiry and contract details come from the instrument
+        catalog, or from the instrument name when no catalog is given.
+        """
+        name = pos['instrument_name']
+        spec = catalog.get(name) if catalog is not None else parse_instrument_name(name)
+        if spec is not None:
+            position_type = spec.kind
+        else:
+            position_type = 'option' if pos.get('kind', '').startswith('option') else 'future'
+        # REST snapshots carry a timestamp; streamed position changes may not
+        timestamp = datetime.fromtimestamp(pos['timestamp'] / 1000) if 'timestamp' in pos else datetime.now()
+
+        return Position(
+            instrument_name=name,
+            position_type=position_type,
+            direction='long' if pos['size'] > 0 else 'short',
+            size=abs(pos['size']),
+            entry_price=pos['average_price'],
+            current_price=pos['mark_price'],
+            timestamp=timestamp,
+            leverage=pos.get('leverage'),
+            option_type=spec.option_type if spec else pos.get('option_type'),
+            strike_price=spec.strike if spec else pos.get('strike'),
+            expiration_date=spec.expiration_date if spec else None,
+            mark_iv=pos.get('mark_iv'),
+            underlying_price=pos.get('index_price'),
+            contract_size=spec.contract_size if spec else None,
+            tick_size=spec.tick_size if spec else None
+        )
+
+
+    @staticmethod
+    def parse_position_book(payloads: List[Dict[str, Any]],
+                            catalog: Optional[InstrumentCatalog] = None) -> PositionBook:
+        """Build a PositionBook straight from Deribit position payloads
+
+        Each field is gathered into a typed array in one pass and timestamps
+        are converted as whole columns. Position objects are only built if the
+        book is asked for them (position(), to_positions()).
+        """
+        names = [pos['instrument_name'] for pos in payloads]
+        lookup = catalog.get if catalog is not None else parse_instrument_name
+        specs = [lookup(name) or _payload_spec(pos) for name, pos in zip(names, payloads)]
+
+        def column(values: List[Any]) -> np.ndarray:
+            return np.array(values, dtype=np.float64)  # None becomes NaN
+
+        signed_size = column([pos['size'] for pos in payloads])
+        # REST snapshots carry a timestamp; streamed position changes may not
+        timestamp = column([pos.get('timestamp') for pos in payloads])
+        timestamp[np.isnan(timestamp)] = time.time() * 1000
+        return PositionBook.from_arrays(
+            names,
+            size=np.abs(signed_size),
+            entry_price=column([pos['average_price'] for pos in payloads]),
+            current_price=column([pos['mark_price'] for pos in payloads]),
+            sign=np.where(signed_size > 0, 1, -1),
+            is_option=np.array([spec.kind == 'option' for spec in specs], dtype=bool),
+            is_inverse=np.array([is_inverse_future(name, spec.kind) for name, spec in zip(names, specs)], dtype=bool),
+            option_type=np.array([OPTION_TYPE_CODES[spec.option_type] for spec in specs], dtype=np.int8),
+            strike=column([spec.strike for spec in specs]),
+            expiry=_ms_to_datetime64(column([spec.expiration_timestamp for spec in specs])),
+            timestamp=_ms_to_datetime64(timestamp),
+            leverage=column([pos.get('leverage') for pos in payloads]),
+            mark_iv=column([pos.get('mark_iv') for pos in payloads]),
+            underlying_price=column([pos.get('index_price') for pos in payloads]),
+            contract_size=column([spec.contract_size for spec in specs]),
+            tick_size=column([spec.tick_size for spec in specs])
+        )
+
+def _payload_spec(pos: Dict[str, Any]) -> InstrumentSpec:
+    """Stand-in spec for names the catalog and parser do not know, as in parse_position"""
+    return InstrumentSpec(
+        instrument_name=pos['instrument_name'],
+        kind='option' if pos.get('kind', '').startswith('option') else 'future',
+        base_currency=None,
+        strike=pos.get('strike'),
+        option_type=pos.get('option_type')
+    )
+
+def _ms_to_datetime64(milliseconds: np.ndarray) -> np.ndarray:
+    """Epoch milliseconds (NaN for missing) to datetime64[us]"""
+    missing = np.isnan(milliseconds)
+    micros = np.where(missing, 0, milliseconds * 1000).astype(np.int64)
+    micros[missing] = np.iinfo(np.int64).min  # NaT
+    return micros.view('datetime64[us]')
@@ -0,0 +1,267 @@
+import asyncio
+import itertools
+import json
+import logging
+import time
+from typing import Dict, List, Any, Optional, Callable
+import websockets
+from ..config import Config
+from ..analysis.portfolio_aggregator import PortfolioAggregator
+from ..models.position import Position
+from .deribit_client import DeribitClient
+from .instrument_catalog import InstrumentCatalog
+from .codec import loads
+from .errors import DeribitAPIError
+
+logger = logging.getLogger(__name__)
+
+class PositionStream:
+    """Live position book kept up to date from Deribit WebSocket subscriptions"""
+
+    def __init__(self, test_mode: bool = True, ws_url: Optional[str] = None,
+                 client_id: Optional[str] = None, client_secret: Optional[str] = None,
+                 currencies: Optional[List[str]] = None,
+                 on_update: Optional[Callable[[List[str]], None]] = None,
+                 catalog: Optional[InstrumentCatalog] = None):
+        self.ws_url = ws_url or (Config.WS_TEST_URL if test_mode else Config.WS_PROD_URL)
+        self.client_id = client_id or Config.CLIENT_ID
+        self.client_secret = client_secret or Config.CLIENT_SECRET
+        self.currencies = currencies or Config.POSITION_CURRENCIES
+        self.on_update = on_update
+        self.catalog = catalog
+
+        self.positions: Dict[str, Position] = {}
+        # Totals and per-type/per-expiry buckets, updated per changed position
+        self.aggregate = PortfolioAggregator()
+
+        self.messages_processed = 0
+        self.total_processing_time = 0.0
+        self.max_processing_time = 0.0
+        self.reconnects = 0
+
+        self._ids = itertools.count(1)
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._ticker_channels = set()
+        # Notifications held back while a resync snapshot is in flight
+        self._buffer: Optional[List[Dict[str, Any]]] = None
+        self._ws = None
+        self._running = False
+
+    @property
+    def total_value(self) -> float:
+        return self.aggregate.total_value
+
+    @property
+    def total_pnl(self) -> float:
+        return self.aggregate.total_pnl
+
+    @property
+    def mean_processing_time(self) -> float:
+        """Mean time spent applying one subscription message, in seconds"""
+        return self.total_processing_time / self.messages_processed if self.messages_processed else 0.0
+
+    def ticker_channel(self, instrument_name: str) -> str:
+        return f"ticker.{instrument_name}.{Config.TICKER_INTERVAL}"
+
+    async def run(self):
+        """Stream until stop() is called, reconnecting on connection loss"""
+        self._running = True
+        delay = Config.WS_RECONNECT_DELAY
+        while self._running:
+            try:
+                async with websockets.connect(self.ws_url) as ws:
+                    self._ws = ws
+                    await self._run_session(ws)
+                    delay = Config.WS_RECONNECT_DELAY
+            except (OSError, websockets.WebSocketException, asyncio.TimeoutError) as e:
+                if self._running:
+                    logger.warning(f"WebSocket connection lost: {e}")
+            except Exception as e:
+                # Anything else, e.g. a malformed snapshot, gets a fresh session rather than ending the stream
+                if self._running:
+                    logger.exception(f"WebSocket session failed: {e}")
+            finally:
+                self._ws = None
+                self._buffer = None
+
+            if self._running:
+                self.reconnects += 1
+                logger.info(f"Reconnecting in {delay}s")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, Config.WS_MAX_RECONNECT_DELAY)
+
+    async def stop(self):
+        """Stop streaming and close the connection"""
+        self._running = False
+        if self._ws is not None:
+            await self._ws.close()
+
+    async def _run_session(self, ws):
+        reader = asyncio.create_task(self._read_loop(ws))
+        # Requests awaiting a reply must not outlive the connection
+        reader.add_done_callback(lambda _: self._fail_pending(ConnectionError("WebSocket connection closed")))
+        try:
+            await self._call(ws, 'public/auth', {
+                'grant_type': 'client_credentials',
+                'client_id': self.client_id,
+                'client_secret': self.client_secret
+            })
+            await self._call(ws, 'public/set_heartbeat', {'interval': Config.WS_HEARTBEAT_INTERVAL})
+
+            # Subscribe before the snapshot so no change falls between the two; changes
+            # carry the full position, so replaying the buffer over the snapshot is safe
+            self._buffer = []
+            self._ticker_channels = set()
+            channels = [f"user.changes.any.{currency}.raw" for currency in self.currencies]
+            await self._call(ws, 'private/subscribe', {'channels': channels})
+            await self._resync(ws)
+            buffered, self._buffer = self._buffer, None
+            for params in buffered:
+                self._dispatch(params)
+
+            tickers = {self.ticker_channel(name) for name in self.positions} - self._ticker_channels
+            self._ticker_channels |= tickers
+            if tickers:
+                await self._call(ws, 'private/subscribe', {'channels': sorted(tickers)})
+            logger.info(f"Subscribed to {len(channels) + len(self._ticker_channels)} channels "
+                        f"({len(buffered)} changes replayed over the snapshot)")
+
+            await reader
+        finally:
+            reader.cancel()
+
+    async def _resync(self, ws):
+        if self.catalog is not None:
+            await asyncio.to_thread(self.catalog.refresh, self.currencies)
+        snapshots = await asyncio.gather(*(
+            self._call(ws, 'private/get_positions', {'currency': currency})
+            for currency in self.currencies
+        ))
+        # Positions closed while disconnected must be reported as changed too
+        previous = set(self.positions)
+        self.positions = {}
+        self.aggregate.clear()
+        for payload in itertools.chain.from_iterable(snapshots):
+            if payload['size']:
+                self._set_position(DeribitClient.parse_position(payload, self.catalog))
+        self._notify(list(self.positions) + sorted(previous - set(self.positions)))
+
+    async def _call(self, ws, method: str, params: Dict[str, Any]) -> Any:
+        request_id = next(self._ids)
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+        await ws.send(json.dumps({'jsonrpc': '2.0', 'id': request_id, 'method': method, 'params': params}))
+        return await future
+
+    def _fail_pending(self, error: Exception):
+        for future in self._pending.values():
+            if not future.done():
+                future.set_exception(error)
+        self._pending.clear()
+
+    async def _read_loop(self, ws):
+        # Heartbeats arrive every interval, so a silent socket is a dead one
+        timeout = Config.WS_HEARTBEAT_INTERVAL * 2
+        while True:
+            raw = await asyncio.wait_for(ws.recv(), timeout)
+            try:
+                message = loads(raw)
+                method = message.get('method')
+            except (ValueError, AttributeError) as e:
+                # A frame that is not a JSON object is skipped, not a reason to reconnect
+                logger.error(f"Skipping malformed message {raw[:200]!r}: {e}")
+                continue
+
+            if method == 'subscription':
+                if self._buffer is not None:
+                    self._buffer.append(message['params'])
+                else:
+                    self._dispatch(message['params'])
+            elif method == 'heartbeat':
+                if message['params'].get('type') == 'test_request':
+                    await ws.send(json.dumps({'jsonrpc': '2.0', 'id': next(self._ids),
+                                              'method': 'public/test', 'params': {}}))
+            elif 'id' in message:
+                future = self._pending.pop(message['id'], None)
+                if future is None or future.done():
+                    continue
+                if 'error' in message:
+                    error = message['error']
+                    future.set_exception(DeribitAPIError('websocket', 200, error.get('code'),
+                                                         error.get('message', ''), error.get('data')))
+                else:
+                    future.set_result(message.get('result'))
+
+    def _dispatch(self, params: Dict[str, Any]):
+        """Apply one notification; a bad message is logged and skipped, not fatal"""
+        try:
+            self._handle_notification(params)
+        except Exception as e:
+            logger.exception(f"Failed to apply {params.get('channel')} notification: {e}")
+
+    def _handle_notification(self, params: Dict[str, Any]):
+        start = time.perf_counter()
+        channel = params['channel']
+        data = params['data']
+
+        if channel.startswith('ticker.'):
+            changed = self._apply_ticker(data)
+        elif channel.startswith('user.changes.'):
+            changed = self._apply_user_changes(data)
+        else:
+            changed = []
+
+        elapsed = time.perf_counter() - start
+        self.messages_processed += 1
+        self.total_processing_time += elapsed
+        self.max_processing_time = max(self.max_processing_time, elapsed)
+        self._notify(changed)
+
+    def _apply_ticker(self, data: Dict[str, Any]) -> List[str]:
+        position = self.positions.get(data['instrument_name'])
+        if position is None:
+            return []
+        position.current_price = data['mark_price']
+        self.aggregate.update(position)
+        return [position.instrument_name]
+
+    def _apply_user_changes(self, data: Dict[str, Any]) -> List[str]:
+        changed = []
+        for payload in data.get('positions', []):
+            # Parse before touching the book, so a malformed entry leaves it as it was
+            try:
+                name = payload['instrument_name']
+                position = DeribitClient.parse_position(payload, self.catalog) if payload['size'] else None
+            except Exception as e:
+                logger.error(f"Skipping malformed position change {payload!r}: {e!r}")
+                continue
+            if self.positions.pop(name, None) is not None:
+                self.aggregate.remove(name)
+            if position is not None:
+                self._set_position(position)
+                self._subscribe_ticker(name)
+            changed.append(name)
+        return changed
+
+    def _subscribe_ticker(self, instrument_name: str):
+        channel = self.ticker_channel(instrument_name)
+        if channel in self._ticker_channels or self._ws is None:
+            return
+        self._ticker_channels.add(channel)
+        task = asyncio.ensure_future(self._call(self._ws, 'private/subscribe', {'channels': [channel]}))
+        task.add_done_callback(self._log_subscribe_error)
+
+    def _log_subscribe_error(self, task: asyncio.Future):
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning(f"Ticker subscription failed: {task.exception()}")
+
+    def _set_position(self, position: Position):
+        self.positions[position.instrument_name] = position
+        self.aggregate.add(position)
+
+    def _notify(self, changed: List[str]):
+        if changed and self.on_update is not None:
+            try:
+                self.on_update(changed)
+            except Exception as e:
+                logger.exception(f"on_update callback failed: {e}")
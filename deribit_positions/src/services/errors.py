@@ -0,0 +1,30 @@
+from typing import Any, Optional
+
+TOO_MANY_REQUESTS = 10028
+
+class DeribitAPIError(Exception):
+    """Error returned by the Deribit API, with the JSON-RPC error body preserved"""
+
+    def __init__(self, endpoint: str, status: int, code: Optional[int] = None,
+                 message: str = '', data: Any = None):
+        self.endpoint = endpoint
+        self.status = status
+        self.code = code
+        self.message = message
+        self.data = data
+        super().__init__(f"{endpoint} failed with HTTP {status}: {message or 'no message'}"
+                         + (f" (code {code})" if code is not None else ""))
+
+    @classmethod
+    def from_response(cls, endpoint: str, response) -> 'DeribitAPIError':
+        try:
+            error = response.json().get('error') or {}
+        except ValueError:
+            error = {'message': response.text[:200]}
+        error_class = RateLimitError if (response.status_code == 429
+                                         or error.get('code') == TOO_MANY_REQUESTS) else cls
+        return error_class(endpoint, response.status_code, error.get('code'),
+                           error.get('message', ''), error.get('data'))
+
+class RateLimitError(DeribitAPIError):
+    """too_many_requests: the account's credit pool is exhausted"""
@@ -0,0 +1,154 @@
+import json
+import os
+import re
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
+from ..config import Config
+
+# BTC-PERPETUAL, SOL_USDC-PERPETUAL, BTC-27DEC24, BTC-27DEC24-50000-C, XRP_USDC-30AUG24-0d625-C
+INSTRUMENT_PATTERN = re.compile(
+    r'^(?P<base>[A-Z0-9]+)(?:_(?P<quote>[A-Z0-9]+))?-'
+    r'(?:(?P<perpetual>PERPETUAL)|(?P<day>\d{1,2})(?P<month>[A-Z]{3})(?P<year>\d{2})'
+    r'(?:-(?P<strike>\d+(?:d\d+)?)-(?P<option_type>[CP]))?)$'
+)
+MONTHS = {name: i for i, name in enumerate(
+    ('JAN', 'FEB', 'MAR', 'APR', 'MAY', 'JUN', 'JUL', 'AUG', 'SEP', 'OCT', 'NOV', 'DEC'), start=1)}
+EXPIRY_HOUR_UTC = 8  # Deribit instruments expire at 08:00 UTC
+
+@dataclass(frozen=True)
+class InstrumentSpec:
+    instrument_name: str
+    kind: str  # 'option' or 'future'
+    base_currency: str
+    quote_currency: Optional[str] = None
+    expiration_date: Optional[datetime] = None
+    strike: Optional[float] = None
+    option_type: Optional[str] = None
+    contract_size: Optional[float] = None
+    tick_size: Optional[float] = None
+    expiration_timestamp: Optional[int] = None  # ms since epoch, for vectorized conversion
+
+    @classmethod
+    def from_payload(cls, payload: Dict[str, Any]) -> 'InstrumentSpec':
+        """Build a spec from a public/get_instruments entry"""
+        expiration = payload.get('expiration_timestamp')
+        # Perpetuals report a far-future expiration timestamp
+        perpetual = payload.get('settlement_period') == 'perpetual'
+        expiration = expiration if expiration and not perpetual else None
+        return cls(
+            instrument_name=payload['instrument_name'],
+            kind='option' if payload['kind'].startswith('option') else 'future',
+            base_currency=payload.get('base_currency'),
+            quote_currency=payload.get('quote_currency'),
+            expiration_date=datetime.fromtimestamp(expiration / 1000) if expiration else None,
+            strike=payload.get('strike'),
+            option_type=payload.get('option_type'),
+            contract_size=payload.get('contract_size'),
+            tick_size=payload.get('tick_size'),
+            expiration_timestamp=expiration
+        )
+
+@lru_cache(maxsize=Config.INSTRUMENT_PARSE_CACHE_SIZE)
+def parse_instrument_name(instrument_name: str) -> Optional[InstrumentSpec]:
+    """Parse kind, expiry, strike and option type out of a Deribit instrument name
+
+    Returns None for names that do not follow the future/option convention,
+    such as combos. Contract and tick sizes are only known from the catalog.
+    """
+    match = INSTRUMENT_PATTERN.match(instrument_name)
+    if match is None or (match.group('month') and match.group('month') not in MONTHS):
+        return None
+
+    expiration_date = expiration_timestamp = None
+    if not match.group('perpetual'):
+        expiry = datetime(2000 + int(match.group('year')), MONTHS[match.group('month')],
+                          int(match.group('day')), EXPIRY_HOUR_UTC, tzinfo=timezone.utc)
+        expiration_date = datetime.fromtimestamp(expiry.timestamp())
+        expiration_timestamp = int(expiry.timestamp() * 1000)
+
+    strike = match.group('strike')
+    option_type = match.group('option_type')
+    return InstrumentSpec(
+        instrument_name=instrument_name,
+        kind='option' if option_type else 'future',
+        base_currency=match.group('base'),
+        quote_currency=match.group('quote'),
+        expiration_date=expiration_date,
+        strike=float(strike.replace('d', '.')) if strike else None,
+        option_type={'C': 'call', 'P': 'put'}.get(option_type),
+        expiration_timestamp=expiration_timestamp
+    )
+
+class InstrumentCatalog:
+    """Instrument specs from public/get_instruments, cached on disk per currency
+
+    Lookups are O(1) dict hits; names missing from the catalog fall back to the
+    memoized name parser. refresh() only refetches currencies whose cached
+    entry is older than the TTL.
+    """
+
+    def __init__(self, client=None, cache_path: str = Config.INSTRUMENT_CACHE_PATH,
+                 ttl: float = Config.INSTRUMENT_CACHE_TTL):
+        self.client = client
+        self.cache_path = cache_path
+        self.ttl = ttl
+        self.instruments: Dict[str, InstrumentSpec] = {}
+        self._currencies: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return
+        try:
+            with open(self.cache_path) as f:
+                self._currencies = json.load(f)['currencies']
+        except (OSError, ValueError, KeyError):
+            self._currencies = {}
+            return
+        for entry in self._currencies.values():
+            for payload in entry['instruments']:
+                self.instruments[payload['instrument_name']] = InstrumentSpec.from_payload(payload)
+
+    def _save(self):
+        if not self.cache_path:
+            return
+        directory = os.path.dirname(self.cache_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.cache_path + '.tmp', 'w') as f:
+            json.dump({'currencies': self._currencies}, f)
+        os.replace(self.cache_path + '.tmp', self.cache_path)
+
+    def is_stale(self, currency: str) -> bool:
+        entry = self._currencies.get(currency)
+        return entry is None or time.time() - entry['fetched_at'] >= self.ttl
+
+    def refresh(self, currencies: Optional[List[str]] = None, force: bool = False):
+        """Refetch the instruments of stale (or all, if forced) currencies"""
+        if self.client is None:
+            return
+        currencies = currencies or Config.POSITION_CURRENCIES
+        with self._lock:
+            stale = [currency for currency in currencies if force or self.is_stale(currency)]
+            if not stale:
+                return
+            for currency in stale:
+                payloads = self.client.get_instruments(currency)
+                previous = self._currencies.get(currency, {}).get('instruments', [])
+                for payload in previous:
+                    self.instruments.pop(payload['instrument_name'], None)
+                for payload in payloads:
+                    self.instruments[payload['instrument_name']] = InstrumentSpec.from_payload(payload)
+                self._currencies[currency] = {'fetched_at': time.time(), 'instruments': payloads}
+            self._save()
+
+    def get(self, instrument_name: str) -> Optional[InstrumentSpec]:
+        spec = self.instruments.get(instrument_name)
+        if spec is None:
+            spec = parse_instrument_name(instrument_name)
+        return spec
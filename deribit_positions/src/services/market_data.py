@@ -0,0 +1,98 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional
+import numpy as np
+from ..config import Config
+from ..models.position import Position
+from ..models.position_book import PositionBook
+
+def currency_of(instrument_name: str) -> str:
+    """Currency whose book summaries list an instrument: the quote for linear ones, e.g. USDC for SOL_USDC-PERPETUAL"""
+    base, _, quote = instrument_name.split('-', 1)[0].partition('_')
+    return quote or base
+
+class MarketData:
+    """Mark prices, IVs and underlying prices from one book-summary call per currency
+
+    Summaries are cached for MARKET_DATA_TTL seconds, so every consumer that
+    shares an instance within that window is served from the same snapshot.
+    """
+
+    def __init__(self, client, ttl: float = Config.MARKET_DATA_TTL):
+        self.client = client
+        self.ttl = ttl
+        self.summaries: Dict[str, Dict[str, Any]] = {}
+        self._fetched_at: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def is_stale(self, currency: str) -> bool:
+        return time.time() - self._fetched_at.get(currency, 0.0) >= self.ttl
+
+    def refresh(self, currencies: Optional[Iterable[str]] = None, force: bool = False):
+        """Refetch the summaries of stale currencies, in parallel"""
+        currencies = list(currencies or Config.POSITION_CURRENCIES)
+        with self._lock:
+            stale = [currency for currency in currencies if force or self.is_stale(currency)]
+            if not stale:
+                return
+            with ThreadPoolExecutor(max_workers=len(stale)) as executor:
+                results = list(executor.map(self.client.get_book_summary, stale))
+            for currency, summaries in zip(stale, results):
+                for summary in summaries:
+                    self.summaries[summary['instrument_name']] = summary
+                self._fetched_at[currency] = time.time()
+
+    def refresh_for(self, instrument_names: Iterable[str], force: bool = False):
+        """Refresh only the currencies that the given instruments are listed under"""
+        self.refresh(sorted({currency_of(name) for name in instrument_names}), force)
+
+    def get(self, instrument_name: str) -> Optional[Dict[str, Any]]:
+        return self.summaries.get(instrument_name)
+
+    @staticmethod
+    def _underlying_price(summary: Dict[str, Any]) -> Optional[float]:
+        return summary.get('underlying_price') or summary.get('estimated_delivery_price')
+
+    def apply(self, book: PositionBook) -> int:
+        """Write mark price, IV and underlying price into the book; returns rows updated"""
+        summaries = [self.summaries.get(name) for name in book.instrument_names]
+        found = np.fromiter((summary is not None for summary in summaries), dtype=bool, count=len(book))
+        if not found.any():
+            return 0
+        hits = [summary for summary in summaries if summary is not None]
+        rows = np.flatnonzero(found)
+
+        def field(getter) -> np.ndarray:
+            values = [getter(summary) for summary in hits]
+            return np.array([np.nan if value is None else value for value in values], dtype=np.float64)
+
+        mark_price = field(lambda s: s.get('mark_price'))
+        mark_iv = field(lambda s: s.get('mark_iv'))
+        underlying_price = field(self._underlying_price)
+
+        # Keep existing values where the summary lacks a field
+        for name, values in (('current_price', mark_price), ('mark_iv', mark_iv),
+                             ('underlying_price', underlying_price)):
+            column = book.column(name)
+            known = np.isfinite(values)
+            column[rows[known]] = values[known]
+        book.mark_changed()
+        return len(rows)
+
+    def apply_positions(self, positions: List[Position]) -> int:
+        """Update Position objects in place; returns how many were found"""
+        updated = 0
+        for position in positions:
+            summary = self.summaries.get(position.instrument_name)
+            if summary is None:
+                continue
+            if summary.get('mark_price') is not None:
+                position.current_price = summary['mark_price']
+            if summary.get('mark_iv') is not None:
+                position.mark_iv = summary['mark_iv']
+            underlying_price = self._underlying_price(summary)
+            if underlying_price is not None:
+                position.underlying_price = underlying_price
+            updated += 1
+        return updated
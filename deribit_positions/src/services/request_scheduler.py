@@ -0,0 +1,102 @@
+import heapq
+import itertools
+import random
+import threading
+import time
+from typing import Any, Dict
+from ..config import Config
+
+# Lower values are served first
+PRIORITY_CRITICAL = 0  # auth and order-critical requests
+PRIORITY_NORMAL = 1  # position snapshots
+PRIORITY_REPORTING = 2  # instruments, market data and other reporting reads
+
+class RequestScheduler:
+    """Client-side model of Deribit's per-account credit pool with a priority queue
+
+    Each request waits until it is the highest-priority waiter and the pool
+    holds enough credits for it. Credits refill continuously up to the cap.
+    """
+
+    def __init__(self, max_credits: float = Config.RATE_LIMIT_MAX_CREDITS,
+                 refill_rate: float = Config.RATE_LIMIT_REFILL_RATE):
+        self.max_credits = max_credits
+        self.refill_rate = refill_rate
+        self.credits = max_credits
+        self._updated_at = time.monotonic()
+        self._waiters = []
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+
+        self.requests = 0
+        self.rate_limited = 0
+        self.retries = 0
+        self.max_queue_depth = 0
+        self.total_wait_time = 0.0
+        self.max_wait_time = 0.0
+        self.wait_time_by_priority: Dict[int, float] = {}
+        self.requests_by_priority: Dict[int, int] = {}
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._waiters)
+
+    def _refill(self):
+        now = time.monotonic()
+        self.credits = min(self.max_credits, self.credits + (now - self._updated_at) * self.refill_rate)
+        self._updated_at = now
+
+    def acquire(self, cost: float = Config.RATE_LIMIT_REQUEST_COST, priority: int = PRIORITY_NORMAL):
+        """Block until the request may be sent, then spend its credits"""
+        start = time.monotonic()
+        with self._condition:
+            ticket = (priority, next(self._sequence))
+            heapq.heappush(self._waiters, ticket)
+            self.max_queue_depth = max(self.max_queue_depth, len(self._waiters))
+            while True:
+                self._refill()
+                if self._waiters[0] == ticket and self.credits >= cost:
+                    break
+                shortfall = max(cost - self.credits, 0.0)
+                # Wake when the credits should be there, or when the head of the queue changes
+                self._condition.wait(shortfall / self.refill_rate if shortfall else None)
+            heapq.heappop(self._waiters)
+            self.credits -= cost
+            self._condition.notify_all()
+
+            waited = time.monotonic() - start
+            self.requests += 1
+            self.total_wait_time += waited
+            self.max_wait_time = max(self.max_wait_time, waited)
+            self.wait_time_by_priority[priority] = self.wait_time_by_priority.get(priority, 0.0) + waited
+            self.requests_by_priority[priority] = self.requests_by_priority.get(priority, 0) + 1
+
+    def penalize(self):
+        """The server rejected a request for lack of credits; assume the pool is empty"""
+        with self._condition:
+            self.rate_limited += 1
+            self._refill()
+            self.credits = 0.0
+
+    def backoff_delay(self, attempt: int) -> float:
+        """Full-jitter exponential backoff for the given retry attempt"""
+        with self._condition:
+            self.retries += 1
+        ceiling = min(Config.RATE_LIMIT_MAX_BACKOFF, Config.RATE_LIMIT_BASE_BACKOFF * 2 ** attempt)
+        return random.uniform(0, ceiling)
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            'requests': self.requests,
+            'queue_depth': self.queue_depth,
+            'max_queue_depth': self.max_queue_depth,
+            'rate_limited': self.rate_limited,
+            'retries': self.retries,
+            'mean_wait_seconds': self.total_wait_time / self.requests if self.requests else 0.0,
+            'max_wait_seconds': self.max_wait_time,
+            'mean_wait_by_priority': {
+                priority: self.wait_time_by_priority[priority] / count
+                for priority, count in self.requests_by_priority.items()
+            },
+            'credits': self.credits,
+        }
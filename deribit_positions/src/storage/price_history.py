@@ -0,0 +1,67 @@
+import os
+import re
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from ..config import Config
+
+TIMEFRAME_UNITS = {'M': 60, 'H': 3600, 'D': 86400, 'W': 7 * 86400}
+TIMEFRAME_PATTERN = re.compile(r'^(\d+)([MHDW])$')
+
+def timeframe_seconds(timeframe: str) -> int:
+    """Convert a timeframe such as '4H' or '1W' to seconds"""
+    match = TIMEFRAME_PATTERN.match(timeframe.upper())
+    if match is None:
+        raise ValueError(f"Unsupported timeframe: {timeframe}")
+    return int(match.group(1)) * TIMEFRAME_UNITS[match.group(2)]
+
+def underlying_of(instrument_name: str) -> str:
+    """Underlying currency of an instrument, e.g. 'SOL' for 'SOL_USDC-PERPETUAL'"""
+    return instrument_name.split('-', 1)[0].split('_', 1)[0]
+
+class PriceHistoryStore:
+    """Local store of underlying price history, one .npz file per underlying"""
+
+    def __init__(self, directory: str = Config.PRICE_HISTORY_DIR):
+        self.directory = directory
+        self._cache: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+
+    def _path(self, underlying: str) -> str:
+        return os.path.join(self.directory, f"{underlying}.npz")
+
+    def save(self, underlying: str, timestamps: np.ndarray, prices: np.ndarray):
+        """Store a price series; timestamps are datetime64 or epoch milliseconds"""
+        timestamps = np.asarray(timestamps).astype('datetime64[ms]')
+        prices = np.asarray(prices, dtype=np.float64)
+        order = np.argsort(timestamps)
+        os.makedirs(self.directory, exist_ok=True)
+        np.savez(self._path(underlying), timestamps=timestamps[order].astype(np.int64), prices=prices[order])
+        self._cache.pop(underlying, None)
+
+    def load(self, underlying: str) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """Return (timestamps, prices) for an underlying, or None if not stored"""
+        if underlying not in self._cache:
+            path = self._path(underlying)
+            if not os.path.exists(path):
+                return None
+            with np.load(path) as data:
+                self._cache[underlying] = (data['timestamps'].astype('datetime64[ms]'), data['prices'])
+        return self._cache[underlying]
+
+    def aligned_log_prices(self, underlyings: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """Log prices of several underlyings on their common timestamps (T x U)"""
+        series = {}
+        for underlying in underlyings:
+            loaded = self.load(underlying)
+            if loaded is None:
+                raise ValueError(f"No price history for {underlying}")
+            series[underlying] = loaded
+
+        common = series[underlyings[0]][0]
+        for timestamps, _ in series.values():
+            common = np.intersect1d(common, timestamps)
+
+        columns = []
+        for underlying in underlyings:
+            timestamps, prices = series[underlying]
+            columns.append(np.log(prices[np.searchsorted(timestamps, common)]))
+        return common, np.column_stack(columns) if columns else np.empty((len(common), 0))
@@ -0,0 +1,295 @@
+import json
+import os
+import shutil
+from datetime import datetime, timedelta
+from typing import BinaryIO, Dict, Iterable, List, Optional, Tuple, Union
+import numpy as np
+from ..config import Config
+from ..models.position import Position
+from ..models.position_book import PositionBook
+from .price_history import timeframe_seconds
+
+PORTFOLIO_DTYPE = np.dtype([
+    ('timestamp', '<i8'),  # epoch milliseconds
+    ('total_value', '<f8'),
+    ('total_pnl', '<f8'),
+    ('position_count', '<i4'),
+])
+POSITION_DTYPE = np.dtype([
+    ('timestamp', '<i8'),
+    ('instrument_id', '<i4'),
+    ('size', '<f8'),
+    ('current_price', '<f8'),
+    ('pnl', '<f8'),
+])
+BAR_DTYPE = np.dtype([
+    ('timestamp', '<i8'),  # bucket start
+    ('total_value', '<f8'),  # last in bucket
+    ('pnl_open', '<f8'),
+    ('pnl_high', '<f8'),
+    ('pnl_low', '<f8'),
+    ('pnl_close', '<f8'),
+    ('position_count', '<i4'),
+])
+
+PORTFOLIO_FILE = 'portfolio.bin'
+POSITIONS_FILE = 'positions.bin'
+ROLLUP_FILE = 'portfolio_rollup.bin'
+INSTRUMENTS_FILE = 'instruments.json'
+
+TimeLike = Union[datetime, np.datetime64, int]
+
+def _to_ms(value: TimeLike) -> int:
+    if isinstance(value, datetime):
+        return int(value.timestamp() * 1000)
+    if isinstance(value, np.datetime64):
+        return int(value.astype('datetime64[ms]').astype(np.int64))
+    return int(value)
+
+def _day_of(timestamp_ms: int) -> str:
+    return str(np.datetime64(timestamp_ms, 'ms').astype('datetime64[D]'))
+
+def bars_from_snapshots(records: np.ndarray) -> np.ndarray:
+    """View raw portfolio snapshots as one-snapshot bars"""
+    bars = np.empty(len(records), dtype=BAR_DTYPE)
+    bars['timestamp'] = records['timestamp']
+    bars['total_value'] = records['total_value']
+    for field in ('pnl_open', 'pnl_high', 'pnl_low', 'pnl_close'):
+        bars[field] = records['total_pnl']
+    bars['position_count'] = records['position_count']
+    return bars
+
+def resample_bars(bars: np.ndarray, seconds: int) -> np.ndarray:
+    """Aggregate time-sorted bars into buckets of the given width"""
+    if not len(bars):
+        return np.empty(0, dtype=BAR_DTYPE)
+    width = seconds * 1000
+    buckets = bars['timestamp'] // width
+    starts = np.concatenate(([0], np.flatnonzero(np.diff(buckets)) + 1))
+    ends = np.append(starts[1:], len(bars)) - 1
+
+    resampled = np.empty(len(starts), dtype=BAR_DTYPE)
+    resampled['timestamp'] = buckets[starts] * width
+    resampled['total_value'] = bars['total_value'][ends]
+    resampled['pnl_open'] = bars['pnl_open'][starts]
+    resampled['pnl_high'] = np.maximum.reduceat(bars['pnl_high'], starts)
+    resampled['pnl_low'] = np.minimum.reduceat(bars['pnl_low'], starts)
+    resampled['pnl_close'] = bars['pnl_close'][ends]
+    resampled['position_count'] = bars['position_count'][ends]
+    return resampled
+
+class SnapshotStore:
+    """Append-only columnar history of portfolio and position snapshots
+
+    Each UTC day is a directory of fixed-width binary record files that are
+    appended to and read back through np.memmap. Compacted days also carry a
+    rollup at SNAPSHOT_ROLLUP_TIMEFRAME that coarse range queries read instead
+    of the raw snapshots.
+    """
+
+    def __init__(self, directory: str = Config.SNAPSHOT_DIR):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._instrument_ids: Dict[str, int] = {}
+        self._instrument_names: List[str] = []
+        self._load_instruments()
+        self._open_day: Optional[str] = None
+        self._files: Dict[str, BinaryIO] = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        for handle in self._files.values():
+            handle.close()
+        self._files = {}
+        self._open_day = None
+
+    def flush(self):
+        for handle in self._files.values():
+            handle.flush()
+
+    def _load_instruments(self):
+        path = os.path.join(self.directory, INSTRUMENTS_FILE)
+        if os.path.exists(path):
+            with open(path) as f:
+                self._instrument_names = json.load(f)
+            self._instrument_ids = {name: i for i, name in enumerate(self._instrument_names)}
+
+    def _instrument_id_array(self, instrument_names: List[str]) -> np.ndarray:
+        """Stable integer ids for instrument names, registering new ones in one write"""
+        new_names = [name for name in dict.fromkeys(instrument_names) if name not in self._instrument_ids]
+        if new_names:
+            for name in new_names:
+                self._instrument_ids[name] = len(self._instrument_names)
+                self._instrument_names.append(name)
+            path = os.path.join(self.directory, INSTRUMENTS_FILE)
+            with open(path + '.tmp', 'w') as f:
+                json.dump(self._instrument_names, f)
+            os.replace(path + '.tmp', path)
+        ids = self._instrument_ids
+        return np.fromiter((ids[name] for name in instrument_names), dtype=np.int32, count=len(instrument_names))
+
+    def _day_path(self, day: str, filename: str) -> str:
+        return os.path.join(self.directory, day, filename)
+
+    def _handle(self, day: str, filename: str) -> BinaryIO:
+        if day != self._open_day:
+            self.close()
+            os.makedirs(os.path.join(self.directory, day), exist_ok=True)
+            self._open_day = day
+        if filename not in self._files:
+            self._files[filename] = open(self._day_path(day, filename), 'ab')
+        return self._files[filename]
+
+    def append(self, positions: Union[PositionBook, Iterable[Position]],
+               timestamp: Optional[TimeLike] = None):
+        """Append one snapshot of the book; cost is one buffered write per file"""
+        book = positions if isinstance(positions, PositionBook) else PositionBook.from_positions(positions)
+        timestamp_ms = _to_ms(timestamp if timestamp is not None else datetime.now())
+        day = _day_of(timestamp_ms)
+
+        value = book.value
+        pnl = book.pnl
+        portfolio = np.zeros(1, dtype=PORTFOLIO_DTYPE)
+        portfolio['timestamp'] = timestamp_ms
+        portfolio['total_value'] = value.sum()
+        portfolio['total_pnl'] = pnl.sum()
+        portfolio['position_count'] = len(book)
+
+        rows = np.empty(len(book), dtype=POSITION_DTYPE)
+        rows['timestamp'] = timestamp_ms
+        rows['instrument_id'] = self._instrument_id_array(book.instrument_names)
+        rows['size'] = book.column('sign') * book.column('size')
+        rows['current_price'] = book.column('current_price')
+        rows['pnl'] = pnl
+
+        self._handle(day, PORTFOLIO_FILE).write(portfolio.tobytes())
+        self._handle(day, POSITIONS_FILE).write(rows.tobytes())
+
+    def days(self) -> List[str]:
+        """Stored days, oldest first"""
+        return sorted(name for name in os.listdir(self.directory)
+                      if os.path.isdir(os.path.join(self.directory, name)))
+
+    def _days_between(self, start_ms: int, end_ms: int) -> List[str]:
+        first, last = _day_of(start_ms), _day_of(end_ms)
+        return [day for day in self.days() if first <= day <= last]
+
+    def _read(self, day: str, filename: str, dtype: np.dtype) -> np.ndarray:
+        path = self._day_path(day, filename)
+        if day == self._open_day and filename in self._files:
+            self._files[filename].flush()
+        if not os.path.exists(path) or os.path.getsize(path) < dtype.itemsize:
+            return np.empty(0, dtype=dtype)
+        # Ignore a trailing partial record left by an interrupted write
+        count = os.path.getsize(path) // dtype.itemsize
+        return np.memmap(path, dtype=dtype, mode='r', shape=(count,))
+
+    @staticmethod
+    def _slice(records: np.ndarray, start_ms: int, end_ms: int) -> np.ndarray:
+        timestamps = records['timestamp']
+        if len(timestamps) > 1 and (np.diff(timestamps) < 0).any():
+            return records[(timestamps >= start_ms) & (timestamps < end_ms)]
+        lo, hi = np.searchsorted(timestamps, [start_ms, end_ms])
+        return records[lo:hi]
+
+    def portfolio(self, start: TimeLike, end: TimeLike) -> np.ndarray:
+        """Raw portfolio snapshots in [start, end)"""
+        start_ms, end_ms = _to_ms(start), _to_ms(end)
+        parts = [self._slice(self._read(day, PORTFOLIO_FILE, PORTFOLIO_DTYPE), start_ms, end_ms)
+                 for day in self._days_between(start_ms, end_ms)]
+        return np.concatenate(parts) if parts else np.empty(0, dtype=PORTFOLIO_DTYPE)
+
+    def positions(self, start: TimeLike, end: TimeLike,
+                  instrument_name: Optional[str] = None) -> np.ndarray:
+        """Raw position snapshots in [start, end), optionally for one instrument"""
+        start_ms, end_ms = _to_ms(start), _to_ms(end)
+        instrument_id = self._instrument_ids.get(instrument_name) if instrument_name else None
+        if instrument_name and instrument_id is None:
+            return np.empty(0, dtype=POSITION_DTYPE)
+        parts = []
+        for day in self._days_between(start_ms, end_ms):
+            records = self._slice(self._read(day, POSITIONS_FILE, POSITION_DTYPE), start_ms, end_ms)
+            if instrument_id is not None:
+                records = records[records['instrument_id'] == instrument_id]
+            parts.append(records)
+        return np.concatenate(parts) if parts else np.empty(0, dtype=POSITION_DTYPE)
+
+    def instrument_names(self, instrument_ids: np.ndarray) -> np.ndarray:
+        return np.asarray(self._instrument_names, dtype=object)[instrument_ids]
+
+    def resample(self, start: TimeLike, end: TimeLike, timeframe: str) -> np.ndarray:
+        """Portfolio value and PnL OHLC bars per timeframe bucket in [start, end)
+
+        Compacted days are served from their rollup when the timeframe is at
+        least as coarse as the rollup resolution.
+        """
+        start_ms, end_ms = _to_ms(start), _to_ms(end)
+        seconds = timeframe_seconds(timeframe)
+        use_rollup = seconds >= timeframe_seconds(Config.SNAPSHOT_ROLLUP_TIMEFRAME)
+        parts = []
+        for day in self._days_between(start_ms, end_ms):
+            rollup = self._read(day, ROLLUP_FILE, BAR_DTYPE) if use_rollup else None
+            if rollup is not None and len(rollup):
+                parts.append(self._slice(rollup, start_ms, end_ms))
+            else:
+                raw = self._slice(self._read(day, PORTFOLIO_FILE, PORTFOLIO_DTYPE), start_ms, end_ms)
+                if len(raw) > 1 and (np.diff(raw['timestamp']) < 0).any():
+                    raw = raw[np.argsort(raw['timestamp'], kind='stable')]
+                parts.append(bars_from_snapshots(raw))
+        bars = np.concatenate(parts) if parts else np.empty(0, dtype=BAR_DTYPE)
+        return resample_bars(bars, seconds)
+
+    def compact(self, day: str, position_timeframe: str = Config.SNAPSHOT_COMPACT_TIMEFRAME):
+        """Sort and deduplicate a closed day, write its rollup and thin old position rows
+
+        Position snapshots are reduced to the last row per instrument per
+        position_timeframe bucket; portfolio snapshots are kept at full resolution.
+        """
+        if day == self._open_day:
+            self.close()
+
+        portfolio = np.array(self._read(day, PORTFOLIO_FILE, PORTFOLIO_DTYPE))
+        portfolio = portfolio[np.argsort(portfolio['timestamp'], kind='stable')]
+        keep = np.append(np.diff(portfolio['timestamp']) != 0, True) if len(portfolio) else np.empty(0, dtype=bool)
+        portfolio = portfolio[keep]
+        rollup = resample_bars(bars_from_snapshots(portfolio),
+                               timeframe_seconds(Config.SNAPSHOT_ROLLUP_TIMEFRAME))
+
+        positions = np.array(self._read(day, POSITIONS_FILE, POSITION_DTYPE))
+        width = timeframe_seconds(position_timeframe) * 1000
+        order = np.lexsort((positions['timestamp'], positions['instrument_id'], positions['timestamp'] // width))
+        positions = positions[order]
+        bucket = positions['timestamp'] // width
+        last = np.append((np.diff(bucket) != 0) | (np.diff(positions['instrument_id']) != 0), True) \
+            if len(positions) else np.empty(0, dtype=bool)
+        positions = positions[last]
+        positions = positions[np.argsort(positions['timestamp'], kind='stable')]
+
+        for filename, records in ((PORTFOLIO_FILE, portfolio), (POSITIONS_FILE, positions), (ROLLUP_FILE, rollup)):
+            path = self._day_path(day, filename)
+            records.tofile(path + '.tmp')
+            os.replace(path + '.tmp', path)
+
+    def compact_closed_days(self):
+        """Compact every stored day before today that has no rollup yet"""
+        today = _day_of(_to_ms(datetime.now()))
+        for day in self.days():
+            if day < today and not os.path.exists(self._day_path(day, ROLLUP_FILE)):
+                self.compact(day)
+
+    def apply_retention(self, retention_days: int = Config.SNAPSHOT_RETENTION_DAYS) -> List[str]:
+        """Delete days older than the retention window; returns the deleted days"""
+        cutoff = _day_of(_to_ms(datetime.now() - timedelta(days=retention_days)))
+        deleted = []
+        for day in self.days():
+            if day < cutoff:
+                if day == self._open_day:
+                    self.close()
+                shutil.rmtree(os.path.join(self.directory, day))
+                deleted.append(day)
+        return deleted
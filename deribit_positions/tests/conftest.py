@@ -0,0 +1,25 @@
+import time
+from typing import Any, Dict
+import pytest
+from src.config import Config
+
+@pytest.fixture(autouse=True)
+def no_instrument_cache(monkeypatch):
+    """Keep the instrument catalog in memory so tests never read or write data/"""
+    monkeypatch.setattr(Config, 'INSTRUMENT_CACHE_PATH', '')
+
+def position_payload(instrument_name: str, size: float, price: float = 60_000.0,
+                     **fields: Any) -> Dict[str, Any]:
+    """A get_positions entry; size is signed, in USD for inverse futures"""
+    payload = {
+        'instrument_name': instrument_name,
+        'kind': 'option' if instrument_name.endswith(('-C', '-P')) else 'future',
+        'size': size,
+        'average_price': price,
+        'mark_price': price,
+        'index_price': price,
+        'leverage': 10,
+        'timestamp': int(time.time() * 1000),
+    }
+    payload.update(fields)
+    return payload
@@ -0,0 +1,71 @@
+import pytest
+from src.config import Config
+from src.mock.deribit_server import MockDeribitServer
+from src.services.deribit_client import DeribitClient
+from src.services.request_scheduler import RequestScheduler
+from conftest import position_payload
+
+POSITIONS = {
+    'BTC': [position_payload('BTC-PERPETUAL', 10_000.0), position_payload('BTC-27DEC30', -20_000.0)],
+    'ETH': [position_payload('ETH-PERPETUAL', 3_000.0, price=3_000.0)],
+}
+
+@pytest.fixture
+def server():
+    with MockDeribitServer(POSITIONS) as server:
+        yield server
+
+def make_client(server, **kwargs) -> DeribitClient:
+    return DeribitClient(base_url=server.url, client_id='id', client_secret='secret', **kwargs)
+
+def test_authenticates_lazily_once(server):
+    with make_client(server) as client:
+        assert client.access_token is None
+        client.get_positions(['BTC', 'ETH'])
+        client.get_positions(['BTC', 'ETH'])
+        assert client.access_token in server.access_tokens
+    assert server.request_counts['/api/v2/public/auth'] == 1
+
+def test_refreshes_token_before_expiry(server):
+    with make_client(server) as client:
+        client.ensure_authenticated()
+        first_access, first_refresh = client.access_token, client.refresh_token
+        # Inside the refresh margin, so the next request refreshes first
+        client.token_expires_at = 0.0
+        client.get_positions(['BTC'])
+        assert client.access_token != first_access
+        assert first_refresh not in server.refresh_tokens
+    assert server.request_counts['/api/v2/public/auth'] == 2
+
+def test_refresh_falls_back_to_credentials(server):
+    with make_client(server) as client:
+        client.ensure_authenticated()
+        client.refresh_token = 'expired'
+        client.token_expires_at = 0.0
+        client.get_positions(['BTC'])
+        assert client.access_token in server.access_tokens
+    # Rejected refresh, then a full client_credentials grant
+    assert server.request_counts['/api/v2/public/auth'] == 3
+
+def test_merges_currencies(server):
+    with make_client(server) as client:
+        positions = client.get_positions(['BTC', 'ETH'])
+        book = client.get_position_book(['BTC', 'ETH'])
+    names = sorted(p['instrument_name'] for payloads in POSITIONS.values() for p in payloads)
+    assert sorted(p.instrument_name for p in positions) == names
+    assert sorted(book.instrument_names) == names
+    short = next(p for p in positions if p.instrument_name == 'BTC-27DEC30')
+    assert (short.direction, short.size) == ('short', 20_000.0)
+    assert server.request_counts['/api/v2/private/get_positions'] == 4
+
+def test_retries_too_many_requests(monkeypatch):
+    monkeypatch.setattr(Config, 'RATE_LIMIT_BASE_BACKOFF', 0.01)
+    # The server allows two requests at a time; the client scheduler does not know that
+    with MockDeribitServer(POSITIONS, credit_limit=(1_000, 20_000), request_cost=500) as server:
+        scheduler = RequestScheduler(max_credits=1e9, refill_rate=1e9)
+        with make_client(server, scheduler=scheduler) as client:
+            for _ in range(3):
+                assert len(client.get_positions(['BTC', 'ETH'])) == 3
+        assert server.rate_limited_count > 0
+        assert scheduler.rate_limited == server.rate_limited_count
+        assert scheduler.retries == scheduler.rate_limited
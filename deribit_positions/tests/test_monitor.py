@@ -0,0 +1,41 @@
+import asyncio
+import time
+from src.mock.deribit_ws_server import MockDeribitWebSocketServer
+from src.monitoring.alerts import CallbackSink
+from src.monitoring.monitor import PositionMonitor, StopLossRule
+from src.services.deribit_stream import PositionStream
+from conftest import position_payload
+
+async def wait_for(predicate, timeout: float = 5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, 'timed out waiting for the monitor'
+        await asyncio.sleep(0.01)
+
+def test_stop_loss_alert_fires_once_and_resolves_once():
+    async def scenario():
+        got = []
+        # Low leverage keeps the liquidation-distance check quiet over this price range
+        perp = position_payload('BTC-PERPETUAL', 10_000.0, leverage=2)
+        async with MockDeribitWebSocketServer({'BTC': [perp]}) as server:
+            stream = PositionStream(ws_url=server.url, client_id='id', client_secret='secret', currencies=['BTC'])
+            monitor = PositionMonitor(stream, rules=[StopLossRule()], sinks=[CallbackSink(got.append)])
+            task = asyncio.create_task(monitor.run())
+            await wait_for(lambda: 'BTC-PERPETUAL' in stream.positions)
+
+            # Three breaching ticks, one alert
+            for price in (53_000.0, 52_000.0, 51_000.0):
+                await server.push_ticker('BTC-PERPETUAL', price)
+            await wait_for(lambda: stream.positions['BTC-PERPETUAL'].current_price == 51_000.0)
+            assert [(a.rule, a.resolved) for a in got] == [('stop_loss', False)]
+            assert len(monitor.active_alerts) == 1
+
+            await server.push_ticker('BTC-PERPETUAL', 59_000.0)
+            await server.push_ticker('BTC-PERPETUAL', 59_500.0)
+            await wait_for(lambda: stream.positions['BTC-PERPETUAL'].current_price == 59_500.0)
+            assert [(a.rule, a.resolved) for a in got] == [('stop_loss', False), ('stop_loss', True)]
+            assert not monitor.active_alerts
+
+            await monitor.stop()
+            await task
+    asyncio.run(scenario())
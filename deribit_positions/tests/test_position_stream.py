@@ -0,0 +1,82 @@
+import asyncio
+import time
+import pytest
+from src.config import Config
+from src.mock.deribit_ws_server import MockDeribitWebSocketServer
+from src.services.deribit_stream import PositionStream
+from conftest import position_payload
+
+@pytest.fixture(autouse=True)
+def fast_reconnect(monkeypatch):
+    monkeypatch.setattr(Config, 'WS_RECONNECT_DELAY', 0.05)
+
+async def wait_for(predicate, timeout: float = 5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, 'timed out waiting for the stream'
+        await asyncio.sleep(0.01)
+
+def make_stream(server, **kwargs) -> PositionStream:
+    return PositionStream(ws_url=server.url, client_id='id', client_secret='secret',
+                          currencies=['BTC'], **kwargs)
+
+def test_resyncs_book_after_dropped_connection():
+    async def scenario():
+        async with MockDeribitWebSocketServer({'BTC': [position_payload('BTC-PERPETUAL', 10_000.0)]}) as server:
+            stream = make_stream(server)
+            task = asyncio.create_task(stream.run())
+            await wait_for(lambda: 'BTC-PERPETUAL' in stream.positions)
+
+            # Book changes while the client is disconnected
+            server.positions['BTC'] = [position_payload('BTC-27DEC30', -20_000.0)]
+            await server.drop_connections()
+            await wait_for(lambda: 'BTC-27DEC30' in stream.positions)
+
+            assert sorted(stream.positions) == ['BTC-27DEC30']
+            assert stream.reconnects >= 1
+            assert server.connection_count == 2
+            await stream.stop()
+            await task
+    asyncio.run(scenario())
+
+def test_replays_change_pushed_during_snapshot():
+    class RacyServer(MockDeribitWebSocketServer):
+        raced = False
+
+        def _dispatch(self, ws, method, params):
+            if method == 'private/get_positions' and not self.raced:
+                # Snapshot is taken before the change is published
+                self.raced = True
+                snapshot = list(self.positions.get(params['currency'], []))
+                asyncio.ensure_future(self.push_position('BTC', position_payload('BTC-27DEC30', -20_000.0)))
+                return snapshot
+            return super()._dispatch(ws, method, params)
+
+    async def scenario():
+        async with RacyServer({'BTC': [position_payload('BTC-PERPETUAL', 10_000.0)]}) as server:
+            stream = make_stream(server)
+            task = asyncio.create_task(stream.run())
+            await wait_for(lambda: 'BTC-27DEC30' in stream.positions)
+
+            assert sorted(stream.positions) == ['BTC-27DEC30', 'BTC-PERPETUAL']
+            assert stream.reconnects == 0
+            await stream.stop()
+            await task
+    asyncio.run(scenario())
+
+def test_skips_malformed_frame_without_reconnecting():
+    async def scenario():
+        async with MockDeribitWebSocketServer({'BTC': [position_payload('BTC-PERPETUAL', 10_000.0)]}) as server:
+            stream = make_stream(server)
+            task = asyncio.create_task(stream.run())
+            await wait_for(lambda: 'BTC-PERPETUAL' in stream.positions)
+
+            await server.push_raw('not json')
+            await server.push_ticker('BTC-PERPETUAL', 61_000.0)
+            await wait_for(lambda: stream.positions['BTC-PERPETUAL'].current_price == 61_000.0)
+
+            assert stream.reconnects == 0
+            assert server.connection_count == 1
+            await stream.stop()
+            await task
+    asyncio.run(scenario())
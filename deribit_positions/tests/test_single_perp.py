@@ -0,0 +1,82 @@
+"""Risk engines on one 10k USD BTC-PERPETUAL at 60k, i.e. 1/6 BTC long
+
+Inverse futures are sized in USD, so every engine has to convert to base
+units; treating the size as coin inflates the figures by 60,000x.
+"""
+import math
+from datetime import datetime, timedelta
+import numpy as np
+import pytest
+from src.config import Config
+from src.analysis.greeks import GreeksEngine
+from src.analysis.margin import MarginEstimator
+from src.analysis.stress import StressEngine
+from src.analysis.var_engine import VarEngine
+from src.models.position import Position
+from src.models.position_book import PositionBook
+from src.storage.price_history import PriceHistoryStore
+
+SIZE_USD = 10_000.0
+PRICE = 60_000.0
+BASE_SIZE = SIZE_USD / PRICE
+
+def perpetual(direction: str = 'long') -> Position:
+    return Position('BTC-PERPETUAL', 'future', direction, SIZE_USD, PRICE, PRICE, datetime.now(), leverage=10.0)
+
+@pytest.fixture
+def book() -> PositionBook:
+    return PositionBook.from_positions([perpetual()])
+
+def test_base_size(book):
+    assert book.column('is_inverse').tolist() == [True]
+    assert book.base_size[0] == pytest.approx(BASE_SIZE)
+    assert perpetual().base_size == pytest.approx(BASE_SIZE)
+
+def test_delta_is_in_coin(book):
+    assert GreeksEngine().portfolio_greeks(book)['delta'] == pytest.approx(BASE_SIZE)
+
+def test_delta_nets_with_an_option():
+    call = Position('BTC-27DEC30-60000-C', 'option', 'long', 1.0, 0.05, 0.05, datetime.now(),
+                    option_type='call', strike_price=PRICE, expiration_date=datetime.now() + timedelta(days=30),
+                    mark_iv=60.0, underlying_price=PRICE)
+    book = PositionBook.from_positions([perpetual('short'), call])
+    delta = GreeksEngine().portfolio_greeks(book)['delta']
+    assert 0.3 < delta < 0.5  # an ATM call's ~0.5 less 1/6 BTC
+
+def test_stress_pnl_is_linear_in_usd_size(book):
+    engine = StressEngine([-0.1, 0.0, 0.1], [0], [0])
+    np.testing.assert_allclose(engine.portfolio_surface(book).ravel(), [-1_000.0, 0.0, 1_000.0])
+    np.testing.assert_allclose(engine.position_surface(book).ravel(), [-1_000.0, 0.0, 1_000.0])
+
+def test_monte_carlo_var(book, tmp_path):
+    with VarEngine(PriceHistoryStore(str(tmp_path)), workers=1, seed=1) as engine:
+        result = engine.monte_carlo(book, '1D', scenarios=20_000)
+    # Normal approximation with the default volatility and no history
+    expected = SIZE_USD * Config.DEFAULT_ANNUAL_VOLATILITY * math.sqrt(1 / 365) * 1.645
+    assert result['var_95'] == pytest.approx(expected, rel=0.05)
+
+def test_standard_margin(book):
+    estimate = MarginEstimator(balances={}).estimate(book)
+    rate = Config.MARGIN_FUTURE_INITIAL_RATE + Config.MARGIN_FUTURE_RATE_PER_SIZE * BASE_SIZE
+    assert estimate['initial_margin'][0] == pytest.approx(SIZE_USD * rate)
+    # Isolated at 10x leverage: liquidated about 10% below entry
+    assert 0.88 * PRICE < estimate['liquidation_price'][0] < 0.92 * PRICE
+
+def test_portfolio_margin_not_above_standard(book):
+    estimator = MarginEstimator(balances={})
+    standard = estimator.estimate(book)
+    portfolio = estimator.portfolio_margin(book)['BTC']
+    assert 0 < portfolio['initial_margin'] <= standard['initial_margin'][0] + 1e-9
+    assert portfolio['maintenance_margin'] <= standard['maintenance_margin'][0] + 1e-9
+
+def test_cross_margin_per_underlying(book):
+    estimator = MarginEstimator(balances={'BTC': 1_000.0})
+    by_underlying = estimator.margin_by_underlying(book)
+    assert by_underlying['BTC']['equity'] == pytest.approx(1_000.0)
+    maintenance = by_underlying['BTC']['maintenance_margin']
+    assert by_underlying['BTC']['margin_utilization'] == pytest.approx(maintenance / 1_000.0)
+    # 1k of collateral on 10k of exposure: liquidated roughly 8% lower
+    liquidation = estimator.estimate(book)['liquidation_price'][0]
+    assert 0.9 * PRICE < liquidation < 0.93 * PRICE
+    # An underlying without a balance is not cross margined
+    assert 'ETH' not in estimator.equity(book)
@@ -2,7 +2,9 @@ import os
 import json
 import re
 import shutil
+import hashlib
 from anthropic import Anthropic, APIStatusError, APIError
+from anthropic.types import Message
 from tavily import TavilyClient
 import asyncio
 from rich.console import Console
@@ -13,6 +15,8 @@ from rich.table import Table
 from prompt_toolkit import PromptSession
 from prompt_toolkit.styles import Style
 import logging
+import time
+from collections import deque
 from typing import Dict, Any, Optional, List, Union
 from datetime import datetime
 import glob
@@ -43,6 +47,64 @@ console = Console()
 token_usage = {"input": 0, "output": 0}
 MAX_CONTEXT_TOKENS = 200000
 
+# Model routing tiers, cheapest first. Costs are USD per million tokens.
+MODEL_TIERS = [
+    {
+        "name": "fast",
+        "model": "claude-3-5-haiku-20241022",
+        "max_tokens": 4096,
+        "input_cost": 0.80,
+        "output_cost": 4.00,
+    },
+    {
+        "name": "standard",
+        "model": "claude-3-5-sonnet-20241022",
+        "max_tokens": 8000,
+        "input_cost": 3.00,
+        "output_cost": 15.00,
+    },
+]
+FAST_TIER_MAX_PROMPT_CHARS = 600
+MAX_CONTINUATIONS = 3
+MAX_TOOL_ROUNDS = 10
+TRUNCATED_TOOL_CALL_PROMPT = (
+    "Your last tool call was cut off by the output limit and was not run. "
+    "Retry it as several smaller patch_file calls."
+)
+FILE_OP_TRIGGERS = [
+    "create",
+    "build",
+    "implement",
+    "write",
+    "refactor",
+    "rewrite",
+    "fix",
+    "edit",
+    "modify",
+    "generate",
+    "add",
+    "file",
+    "code",
+    "function",
+    "class",
+]
+
+# Speculative prefetch of files likely needed during a turn
+PREFETCH_MAX_BYTES = 8 * 1024 * 1024
+PREFETCH_MAX_FILE_BYTES = 512 * 1024
+PREFETCH_HISTORY_TURNS = 4
+RECENT_EDITS_LIMIT = 5
+
+# Opt-in response cache for repeated prompts
+RESPONSE_CACHE_ENABLED = os.getenv("CLAUDE_RESPONSE_CACHE", "").lower() in (
+    "1",
+    "true",
+    "yes",
+)
+RESPONSE_CACHE_DIR = os.getenv("CLAUDE_RESPONSE_CACHE_DIR", ".response_cache")
+RESPONSE_CACHE_MAX_BYTES = 100 * 1024 * 1024
+RESPONSE_CACHE_TTL = 24 * 60 * 60  # seconds
+
 # Conversation and project management
 conversation_history = []
 file_contents = {}
@@ -65,32 +127,17 @@ You are Claude, an AI assistant powered by Anthropic's Claude-3.5-Sonnet model,
 </capabilities>
 
 <file_operations_format>
-CRITICAL: ALL code modifications MUST be wrapped in proper file operation commands. Raw code snippets are NOT allowed.
-When you need to perform file operations, use the following format:
-
-For creating files:
-```file:create
-path: relative/path/to/file.ext
-content:
-Your file content here
-```
-
-For editing files:
-```file:edit
-path: relative/path/to/file.ext
-content:
-Updated file content here
-```
-
-For reading files:
-```file:read
-path: relative/path/to/file.ext
-```
-
-For deleting files:
-```file:delete
-path: relative/path/to/file.ext
-```
+CRITICAL: ALL code modifications MUST be made through the file tools. Raw code snippets are NOT allowed.
+Use the following tools for file operations:
+
+- create_file: create a new file with its full content
+- edit_file: replace the full content of an existing file
+- patch_file: replace one exact snippet of an existing file (preferred for small changes)
+- read_file: read the content of a file
+- delete_file: delete a file
+- list_files: list all files in the project
+
+Tool results are returned in the same turn. Independent tool calls can be issued together in one response and are executed in parallel.
 </file_operations_format>
 
 <file_operations>
@@ -149,17 +196,78 @@ When using search capabilities:
 Always strive for clarity, efficiency, and best practices in your responses. Maintain project context and file consistency throughout the conversation.
 
 IMPORTANT RULES:
-- NEVER show raw code snippets outside of file operation commands
-- ALWAYS use the exact format shown above
-- Code changes MUST be executed through file operations
-- Include the full file content in create/edit operations
+- NEVER show raw code snippets outside of file tool calls
+- Code changes MUST be executed through the file tools
+- Include the full file content in create_file/edit_file calls
 - No partial code snippets or examples without proper file operations
-- When suggesting code changes, always use file:create for new files or file:edit for existing files
+- When suggesting code changes, always use create_file for new files and edit_file or patch_file for existing files
 - Do not truncate or abbreviate file content with "..." or similar
 - All file paths must be relative to the project root
 """
 
 
+def _path_schema(**extra_properties) -> Dict[str, Any]:
+    properties = {
+        "path": {
+            "type": "string",
+            "description": "File path relative to the project root",
+        }
+    }
+    properties.update(extra_properties)
+    return {
+        "type": "object",
+        "properties": properties,
+        "required": list(properties),
+    }
+
+
+FILE_TOOLS = [
+    {
+        "name": "create_file",
+        "description": "Create a new file with the given full content.",
+        "input_schema": _path_schema(
+            content={"type": "string", "description": "Full file content"}
+        ),
+    },
+    {
+        "name": "edit_file",
+        "description": "Replace the full content of an existing file.",
+        "input_schema": _path_schema(
+            content={"type": "string", "description": "Full file content"}
+        ),
+    },
+    {
+        "name": "patch_file",
+        "description": (
+            "Replace one exact occurrence of old_text with new_text in an "
+            "existing file. Prefer this over edit_file for small changes."
+        ),
+        "input_schema": _path_schema(
+            old_text={
+                "type": "string",
+                "description": "Exact text to replace; must occur once",
+            },
+            new_text={"type": "string", "description": "Replacement text"},
+        ),
+    },
+    {
+        "name": "read_file",
+        "description": "Read the content of a file.",
+        "input_schema": _path_schema(),
+    },
+    {
+        "name": "delete_file",
+        "description": "Delete a file.",
+        "input_schema": _path_schema(),
+    },
+    {
+        "name": "list_files",
+        "description": "List all files in the current project.",
+        "input_schema": {"type": "object", "properties": {}},
+    },
+]
+
+
 class ChatHistoryManager:
     def __init__(self, base_dir: str = "."):
         self.base_dir = base_dir
@@ -263,11 +371,136 @@ class ChatHistoryManager:
         return sorted(history_files, key=lambda x: x["timestamp"], reverse=True)
 
 
+class ResponseCache:
+    """On-disk LRU cache of API responses keyed by a hash of the request."""
+
+    def __init__(
+        self,
+        cache_dir: str = RESPONSE_CACHE_DIR,
+        max_bytes: int = RESPONSE_CACHE_MAX_BYTES,
+        ttl: float = RESPONSE_CACHE_TTL,
+        enabled: bool = RESPONSE_CACHE_ENABLED,
+    ):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(
+        model: str,
+        system: str,
+        messages: List[Dict],
+        temperature: float,
+        tools: List[Dict],
+        file_hashes: Dict[str, str],
+    ) -> str:
+        payload = json.dumps(
+            {
+                "model": model,
+                "system": system,
+                "messages": messages,
+                "temperature": temperature,
+                "tools": tools,
+                "files": file_hashes,
+            },
+            sort_keys=True,
+            default=str,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def get(self, key: str) -> Optional[Dict]:
+        path = self._entry_path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+
+        if time.time() - entry["created"] > self.ttl:
+            self._remove(path)
+            self.misses += 1
+            return None
+
+        # Touch the entry so eviction treats it as recently used
+        os.utime(path)
+        self.hits += 1
+        return entry["response"]
+
+    def put(self, key: str, response: Dict) -> None:
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self._entry_path(key)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"created": time.time(), "response": response}, f)
+        os.replace(tmp_path, path)
+        self._evict()
+
+    def _evict(self) -> None:
+        """Drop least recently used entries until the cache fits max_bytes."""
+        entries = []
+        total = 0
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.endswith(".json"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            self._remove(path)
+            total -= size
+
+    @staticmethod
+    def _remove(path: str) -> None:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def clear(self) -> int:
+        if not os.path.isdir(self.cache_dir):
+            return 0
+        removed = 0
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.endswith(".json"):
+                self._remove(entry.path)
+                removed += 1
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        entries = 0
+        size = 0
+        if os.path.isdir(self.cache_dir):
+            for entry in os.scandir(self.cache_dir):
+                if entry.name.endswith(".json"):
+                    entries += 1
+                    size += entry.stat().st_size
+        return {
+            "enabled": self.enabled,
+            "entries": entries,
+            "bytes": size,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
 class ProjectManager:
     def __init__(self):
         self.current_project = None
         self.project_root = None
         self.file_contents = {}
+        self.lexer_cache = {}
+        # Bumped on every write, so a read that raced a write can tell
+        self.write_versions: Dict[str, int] = {}
+        self.recent_edits = deque(maxlen=RECENT_EDITS_LIMIT)
         self.project_structure = {}
         self.chat_history_manager = ChatHistoryManager()
 
@@ -315,15 +548,11 @@ class ProjectManager:
 
             full_path = os.path.join(self.project_root, path)
 
-            # Create directories if they don't exist
-            os.makedirs(os.path.dirname(full_path), exist_ok=True)
-
-            # Write the file
-            with open(full_path, "w", encoding="utf-8") as f:
-                f.write(content)
+            # Create directories and write the file off the event loop
+            await asyncio.to_thread(self._write_text, full_path, content)
 
             # Update internal tracking
-            self.file_contents[path] = content
+            self._record_write(path, content)
             self.scan_project()
 
             return f"✓ File created successfully: {path}"
@@ -354,11 +583,10 @@ class ProjectManager:
                 raise FileNotFoundError(f"File not found: {path}")
 
             # Write the updated content
-            with open(full_path, "w", encoding="utf-8") as f:
-                f.write(content)
+            await asyncio.to_thread(self._write_text, full_path, content)
 
             # Update internal tracking
-            self.file_contents[path] = content
+            self._record_write(path, content)
 
             return f"✓ File updated successfully: {path}"
 
@@ -366,35 +594,105 @@ class ProjectManager:
             logging.error(f"Error editing file {path}: {str(e)}", exc_info=True)
             raise
 
+    async def patch_file(self, path: str, old_text: str, new_text: str) -> str:
+        """Replace one exact snippet of an existing file."""
+        try:
+            if not self.current_project:
+                raise ValueError("No active project selected")
+
+            path = os.path.normpath(path)
+            if path.startswith(("/", "..")):
+                raise ValueError(
+                    "Invalid path: must be relative to project root"
+                )
+
+            full_path = os.path.join(self.project_root, path)
+            if not os.path.exists(full_path):
+                raise FileNotFoundError(f"File not found: {path}")
+
+            content = self.file_contents.get(path)
+            if content is None:
+                content = await asyncio.to_thread(self._read_text, full_path)
+
+            occurrences = content.count(old_text)
+            if occurrences != 1:
+                raise ValueError(
+                    f"old_text must occur exactly once in {path}, found {occurrences}"
+                )
+
+            content = content.replace(old_text, new_text)
+            await asyncio.to_thread(self._write_text, full_path, content)
+            self._record_write(path, content)
+
+            return f"✓ File patched successfully: {path}"
+
+        except Exception as e:
+            logging.error(
+                f"Error patching file {path}: {str(e)}", exc_info=True
+            )
+            raise
+
+    def _record_write(self, path: str, content: Optional[str]) -> None:
+        """Track a write or delete (content None) in the caches."""
+        self.write_versions[path] = self.write_versions.get(path, 0) + 1
+        if content is None:
+            self.file_contents.pop(path, None)
+            self.lexer_cache.pop(path, None)
+        else:
+            self.file_contents[path] = content
+            self.recent_edits.append(path)
+
     async def read_file(self, path: str) -> str:
         """Read the content of a file."""
         try:
+            path = os.path.normpath(path)
             if path in self.file_contents:
                 return self.file_contents[path]
 
+            version = self.write_versions.get(path, 0)
             full_path = os.path.join(self.project_root, path)
-            with open(full_path, "r") as f:
-                content = f.read()
+            content = await asyncio.to_thread(self._read_text, full_path)
 
+            # A write that landed during the read is newer than what was read
+            if self.write_versions.get(path, 0) != version:
+                return self.file_contents.get(path, content)
             self.file_contents[path] = content
             return content
         except Exception as e:
             return f"Error reading file: {str(e)}"
 
+    async def get_lexer(self, path: str, content: str) -> str:
+        """Resolve and cache the syntax highlighting lexer for a file."""
+        if path not in self.lexer_cache:
+            self.lexer_cache[path] = await asyncio.to_thread(
+                Syntax.guess_lexer, path, content
+            )
+        return self.lexer_cache[path]
+
     async def delete_file(self, path: str) -> str:
         """Delete a file from the project."""
         try:
             full_path = os.path.join(self.project_root, path)
             os.remove(full_path)
 
-            if path in self.file_contents:
-                del self.file_contents[path]
+            self._record_write(os.path.normpath(path), None)
 
             self.scan_project()
             return f"File deleted: {path}"
         except Exception as e:
             return f"Error deleting file: {str(e)}"
 
+    @staticmethod
+    def _read_text(full_path: str) -> str:
+        with open(full_path, "r", encoding="utf-8") as f:
+            return f.read()
+
+    @staticmethod
+    def _write_text(full_path: str, content: str) -> None:
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        with open(full_path, "w", encoding="utf-8") as f:
+            f.write(content)
+
     def get_project_files(self) -> List[str]:
         """Get a list of all files in the project."""
         files = []
@@ -431,8 +729,137 @@ class ProjectManager:
         console.print(table)
 
 
-# Initialize project manager
+class FilePrefetcher:
+    """Warm the file cache with files a turn is likely to need."""
+
+    PATH_PATTERN = re.compile(r"[\w./-]+\.\w+")
+    IMPORT_PATTERN = re.compile(r"^\s*(?:from|import)\s+([\w.]+)", re.MULTILINE)
+
+    def __init__(
+        self,
+        project_manager: ProjectManager,
+        max_bytes: int = PREFETCH_MAX_BYTES,
+    ):
+        self.project_manager = project_manager
+        self.max_bytes = max_bytes
+        self.task: Optional[asyncio.Task] = None
+
+    @staticmethod
+    def _module_paths(module: str, project_files: List[str]) -> List[str]:
+        module_path = module.lstrip(".").replace(".", "/")
+        if not module_path:
+            return []
+        suffixes = (f"{module_path}.py", f"{module_path}/__init__.py")
+        return [
+            path
+            for path in project_files
+            for suffix in suffixes
+            if path == suffix or path.endswith(f"/{suffix}")
+        ]
+
+    def candidates(self, texts: List[str], project_files: List[str]) -> List[str]:
+        """Collect files mentioned, imported or next to recent edits."""
+        file_set = set(project_files)
+        by_name: Dict[str, List[str]] = {}
+        for path in project_files:
+            by_name.setdefault(os.path.basename(path), []).append(path)
+
+        candidates: List[str] = []
+
+        def add(path: str) -> None:
+            if path in file_set and path not in candidates:
+                candidates.append(path)
+
+        for text in texts:
+            for token in self.PATH_PATTERN.findall(text):
+                token = os.path.normpath(token)
+                if token in file_set:
+                    add(token)
+                else:
+                    for path in by_name.get(os.path.basename(token), []):
+                        add(path)
+            for module in self.IMPORT_PATTERN.findall(text):
+                for path in self._module_paths(module, project_files):
+                    add(path)
+
+        for edited in reversed(list(self.project_manager.recent_edits)):
+            directory = os.path.dirname(edited)
+            for path in project_files:
+                if os.path.dirname(path) == directory:
+                    add(path)
+
+        return candidates
+
+    async def _prefetch(self, texts: List[str]) -> None:
+        manager = self.project_manager
+        # The tree walk and matching are blocking, so keep them off the event loop
+        project_files = await asyncio.to_thread(manager.get_project_files)
+        queue = await asyncio.to_thread(self.candidates, texts, project_files)
+        budget = self.max_bytes - sum(
+            len(content) for content in manager.file_contents.values()
+        )
+        initial = set(queue)
+        seen = set(queue)
+        loaded = 0
+
+        while queue and budget > 0:
+            path = queue.pop(0)
+            if path not in manager.file_contents:
+                try:
+                    size = os.path.getsize(
+                        os.path.join(manager.project_root, path)
+                    )
+                except OSError:
+                    continue
+                if size > PREFETCH_MAX_FILE_BYTES or size > budget:
+                    continue
+
+                content = await manager.read_file(path)
+                if path not in manager.file_contents:
+                    continue  # read_file returned an error message
+                budget -= len(content)
+                loaded += 1
+            else:
+                content = manager.file_contents[path]
+
+            await manager.get_lexer(path, content)
+
+            # Follow imports of Python files one level deep
+            if path.endswith(".py") and path in initial:
+                for module in self.IMPORT_PATTERN.findall(content):
+                    for module_path in self._module_paths(
+                        module, project_files
+                    ):
+                        if module_path not in seen:
+                            seen.add(module_path)
+                            queue.append(module_path)
+
+        logging.info(f"Prefetched {loaded} files")
+
+    def start(self, texts: List[str]) -> None:
+        """Start prefetching in the background for the current turn."""
+        if not self.project_manager.current_project:
+            return
+        self.task = asyncio.create_task(self._prefetch(texts))
+
+    async def stop(self) -> None:
+        """Cancel any prefetch still running when the turn ends."""
+        if self.task is None:
+            return
+        task, self.task = self.task, None
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logging.error(f"Prefetch error: {str(e)}")
+
+
+# Initialize project manager, prefetcher and response cache
 project_manager = ProjectManager()
+file_prefetcher = FilePrefetcher(project_manager)
+response_cache = ResponseCache()
 
 
 async def perform_search(query: str) -> Optional[Dict]:
@@ -470,6 +897,83 @@ def should_perform_search(text: str) -> bool:
     return any(trigger in text_lower for trigger in search_triggers)
 
 
+def route_request(user_input: str) -> Dict[str, Any]:
+    """Pick a model tier for a turn using local heuristics."""
+    text_lower = user_input.lower()
+    words = set(re.findall(r"[a-z_:]+", text_lower))
+
+    if "```" in user_input or "file:" in text_lower:
+        return {"tier": len(MODEL_TIERS) - 1, "reason": "file operations"}
+    if any(trigger in words for trigger in FILE_OP_TRIGGERS):
+        return {"tier": len(MODEL_TIERS) - 1, "reason": "code generation"}
+    if len(user_input) > FAST_TIER_MAX_PROMPT_CHARS:
+        return {"tier": len(MODEL_TIERS) - 1, "reason": "long prompt"}
+    return {"tier": 0, "reason": "short question"}
+
+
+def needs_escalation(response) -> Optional[str]:
+    """Return the reason a response should be retried on a bigger model."""
+    if response.stop_reason == "max_tokens":
+        return "truncated at max_tokens"
+    has_output = any(
+        block.type == "tool_use"
+        or (block.type == "text" and block.text.strip())
+        for block in response.content
+    )
+    if not has_output:
+        return "empty response"
+    return None
+
+
+FILE_BLOCK_OPEN_PATTERN = re.compile(r"```file:(?:create|edit|read|delete)\n")
+FENCE_PATTERN = re.compile(r"```(\w*)")
+
+
+def incomplete_file_operation_start(text: str) -> Optional[int]:
+    """Offset of the last file block if it has no closing fence, else None.
+
+    Fences inside the block that carry a language tag (```python) open a
+    nested code block, so a file with its own code blocks, such as a
+    Markdown document, is only closed by the bare fence after them.
+    """
+    opening = None
+    for opening in FILE_BLOCK_OPEN_PATTERN.finditer(text):
+        pass
+    if opening is None:
+        return None
+    depth = 0
+    for fence in FENCE_PATTERN.finditer(text, opening.end()):
+        if fence.group(1):
+            depth += 1
+        elif depth:
+            depth -= 1
+        else:
+            return None
+    return opening.start()
+
+
+def estimate_cost(tier: Dict[str, Any], usage) -> float:
+    """Estimate the USD cost of a call from its token usage."""
+    return (
+        usage.input_tokens * tier["input_cost"]
+        + usage.output_tokens * tier["output_cost"]
+    ) / 1_000_000
+
+
+def log_routing_decision(
+    tier: Dict[str, Any], reason: str, response, latency: float
+) -> None:
+    """Log the model chosen for a call with its latency and cost impact."""
+    cost = estimate_cost(tier, response.usage)
+    baseline_cost = estimate_cost(MODEL_TIERS[-1], response.usage)
+    logging.info(
+        f"Routed to {tier['name']} ({tier['model']}, max_tokens={tier['max_tokens']}) "
+        f"because of {reason}: latency {latency:.2f}s, "
+        f"cost ${cost:.4f} (saved ${baseline_cost - cost:.4f}), "
+        f"stop_reason={response.stop_reason}"
+    )
+
+
 async def retry_with_backoff(func, *args, max_retries=5, initial_delay=1):
     """Execute a function with exponential backoff retry logic."""
     delay = initial_delay
@@ -503,7 +1007,42 @@ async def retry_with_backoff(func, *args, max_retries=5, initial_delay=1):
     raise last_exception
 
 
-async def chat_with_claude(user_input: str):
+def _request_strings(value: Any):
+    """Yield every string in a request's system prompt or message structure."""
+    if isinstance(value, str):
+        yield value
+    elif isinstance(value, dict):
+        for item in value.values():
+            yield from _request_strings(item)
+    elif isinstance(value, (list, tuple)):
+        for item in value:
+            yield from _request_strings(item)
+
+
+def referenced_file_hashes(system: str, messages: List[Dict]) -> Dict[str, str]:
+    """Hash the content of project files mentioned in a request.
+
+    Paths are matched as whole path tokens, so "a.py" does not match
+    "data.py". Walks and reads the project, so run it off the event loop.
+    """
+    if not project_manager.current_project:
+        return {}
+
+    mentioned = {
+        os.path.normpath(token)
+        for text in _request_strings([system, messages])
+        for token in FilePrefetcher.PATH_PATTERN.findall(text)
+    }
+    file_hashes = {}
+    for path in project_manager.get_project_files():
+        if path in mentioned:
+            full_path = os.path.join(project_manager.project_root, path)
+            with open(full_path, "rb") as f:
+                file_hashes[path] = hashlib.sha256(f.read()).hexdigest()
+    return file_hashes
+
+
+async def chat_with_claude(user_input: str, bypass_cache: bool = False):
     """Main function to interact with Claude with modern API features."""
     if not isinstance(user_input, str):
         raise ValueError("user_input must be a string")
@@ -526,6 +1065,17 @@ async def chat_with_claude(user_input: str):
             if search_results:
                 user_input = f"{user_input}\n\nRelevant information:\n{json.dumps(search_results, indent=2)}"
 
+        # Prefetch files the turn is likely to need while the model runs
+        recent_turns = conversation_history[-PREFETCH_HISTORY_TURNS * 2 :]
+        file_prefetcher.start(
+            [user_input]
+            + [
+                msg["content"]
+                for msg in recent_turns
+                if isinstance(msg["content"], str)
+            ]
+        )
+
         # Prepare conversation messages
         message_history = []
         for msg in conversation_history:
@@ -536,32 +1086,180 @@ async def chat_with_claude(user_input: str):
         # Add current user message
         message_history.append({"role": "user", "content": user_input})
 
+        temperature = 0.7
+
         # Create the API call function
-        def make_api_call():
+        def make_api_call(model: str, max_tokens: int, messages: List[Dict]):
             return client.messages.create(
-                model="claude-3-5-sonnet-20241022",
-                max_tokens=8000,
-                messages=message_history,
+                model=model,
+                max_tokens=max_tokens,
+                messages=messages,
                 system=full_system_prompt,
-                temperature=0.7,
+                tools=FILE_TOOLS,
+                temperature=temperature,
                 extra_headers={
                     "anthropic-beta": "prompt-caching-2024-07-31",
                     "anthropic-version": "2023-06-01",
                 },
             )
 
-        # Execute API call with retry logic
-        response = await retry_with_backoff(make_api_call)
+        async def call_model(
+            tier: Dict[str, Any], reason: str, messages: List[Dict]
+        ):
+            start_time = time.perf_counter()
+
+            # Serve repeated requests from the response cache if enabled
+            cache_key = None
+            if response_cache.enabled and not bypass_cache:
+                cache_key = response_cache.make_key(
+                    tier["model"],
+                    full_system_prompt,
+                    messages,
+                    temperature,
+                    FILE_TOOLS,
+                    await asyncio.to_thread(
+                        referenced_file_hashes, full_system_prompt, messages
+                    ),
+                )
+                cached = response_cache.get(cache_key)
+                if cached is not None:
+                    logging.info(
+                        f"Response cache hit for {tier['model']} ({reason}): "
+                        f"{(time.perf_counter() - start_time) * 1000:.1f}ms"
+                    )
+                    return Message.model_validate(cached)
+
+            response = await retry_with_backoff(
+                make_api_call, tier["model"], tier["max_tokens"], messages
+            )
+            latency = time.perf_counter() - start_time
+            if cache_key:
+                # The response is already paid for; a full disk must not lose it
+                try:
+                    response_cache.put(
+                        cache_key, response.model_dump(mode="json")
+                    )
+                except OSError as e:
+                    logging.warning(f"Response cache write failed: {str(e)}")
+
+            # Update token usage
+            token_usage["input"] += response.usage.input_tokens
+            token_usage["output"] += response.usage.output_tokens
+            log_routing_decision(tier, reason, response, latency)
+            return response
+
+        # Route the turn, escalating to a bigger tier when needed
+        decision = route_request(user_input)
+        tier_index = decision["tier"]
+        reason = decision["reason"]
+        while True:
+            tier = MODEL_TIERS[tier_index]
+            response = await call_model(tier, reason, message_history)
+
+            escalation_reason = needs_escalation(response)
+            if not escalation_reason or tier_index == len(MODEL_TIERS) - 1:
+                break
+            tier_index += 1
+            reason = f"escalation ({escalation_reason})"
+
+        # Run the tool loop, continuing text that was cut off at max_tokens
+        turn_messages = list(message_history)
+        assistant_response = ""
+        pending_text = ""
+        tool_rounds = 0
+        continuations = 0
+        while True:
+            text = pending_text + "".join(
+                block.text for block in response.content if block.type == "text"
+            )
+            pending_text = ""
+            tool_calls = [
+                block for block in response.content if block.type == "tool_use"
+            ]
 
-        # Update token usage
-        token_usage["input"] += response.usage.input_tokens
-        token_usage["output"] += response.usage.output_tokens
+            if (
+                response.stop_reason == "tool_use"
+                and tool_rounds < MAX_TOOL_ROUNDS
+            ):
+                tool_rounds += 1
+                results = await execute_tool_calls(tool_calls)
+                assistant_response += text
+                for tool_call, result in zip(tool_calls, results):
+                    assistant_response += summarize_tool_call(tool_call, result)
+
+                assistant_content = (
+                    [{"type": "text", "text": text}] if text.strip() else []
+                )
+                assistant_content += [
+                    {
+                        "type": "tool_use",
+                        "id": tool_call.id,
+                        "name": tool_call.name,
+                        "input": tool_call.input,
+                    }
+                    for tool_call in tool_calls
+                ]
+                turn_messages += [
+                    {"role": "assistant", "content": assistant_content},
+                    {"role": "user", "content": results},
+                ]
+                request_messages = turn_messages
+                reason = f"tool results {tool_rounds}/{MAX_TOOL_ROUNDS}"
+
+            elif (
+                response.stop_reason == "max_tokens"
+                and continuations < MAX_CONTINUATIONS
+            ):
+                continuations += 1
+                reason = f"continuation {continuations}/{MAX_CONTINUATIONS}"
+                if tool_calls:
+                    # A tool call cut off mid-input cannot be resumed
+                    assistant_response += text
+                    turn_messages += [
+                        {
+                            "role": "assistant",
+                            "content": text.strip() or "(output truncated)",
+                        },
+                        {"role": "user", "content": TRUNCATED_TOOL_CALL_PROMPT},
+                    ]
+                    request_messages = turn_messages
+                else:
+                    # The API rejects assistant prefills that end in whitespace
+                    pending_text = text.rstrip()
+                    request_messages = turn_messages + [
+                        {"role": "assistant", "content": pending_text}
+                    ]
 
-        # Extract response content
-        assistant_response = response.content[0].text
+            else:
+                if response.stop_reason == "tool_use":
+                    logging.warning(
+                        f"Stopped after {MAX_TOOL_ROUNDS} tool rounds"
+                    )
+                assistant_response += text
+                break
 
-        # Process any file operations in the response
-        assistant_response = await process_file_operations(assistant_response)
+            response = await call_model(tier, reason, request_messages)
+
+        # Only hand complete blocks to the file operation executor
+        incomplete_block = ""
+        cut = incomplete_file_operation_start(assistant_response)
+        if cut is not None:
+            incomplete_block = assistant_response[cut:]
+            assistant_response = assistant_response[:cut]
+            console.print(
+                "Response is still truncated; the unfinished block was not applied.",
+                style="bold yellow",
+            )
+            logging.warning(
+                f"Incomplete block left after {continuations} continuations"
+            )
+
+        # Fall back to fenced file operation blocks if the model used them
+        if "```file:" in assistant_response:
+            assistant_response = await process_file_operations(
+                assistant_response
+            )
+        assistant_response += incomplete_block
 
         # Format code blocks in the response
         formatted_response = format_code_blocks(assistant_response)
@@ -608,6 +1306,9 @@ async def chat_with_claude(user_input: str):
         logging.error(f"Unexpected error in chat: {str(e)}", exc_info=True)
         return f"Error: {error_msg}"
 
+    finally:
+        await file_prefetcher.stop()
+
 
 async def process_file_operations(response: str) -> str:
     """Process any file operations in Claude's response."""
@@ -668,6 +1369,83 @@ async def process_file_operations(response: str) -> str:
     return modified_response
 
 
+async def execute_tool_call(tool_call) -> Dict[str, Any]:
+    """Execute a single file tool call and build its tool_result block."""
+    args = tool_call.input
+    try:
+        if tool_call.name == "create_file":
+            result = await project_manager.create_file(
+                args["path"], args["content"]
+            )
+        elif tool_call.name == "edit_file":
+            result = await project_manager.edit_file(
+                args["path"], args["content"]
+            )
+        elif tool_call.name == "patch_file":
+            result = await project_manager.patch_file(
+                args["path"], args["old_text"], args["new_text"]
+            )
+        elif tool_call.name == "read_file":
+            result = await project_manager.read_file(args["path"])
+        elif tool_call.name == "delete_file":
+            result = await project_manager.delete_file(args["path"])
+        elif tool_call.name == "list_files":
+            if not project_manager.current_project:
+                raise ValueError("No active project selected")
+            result = "\n".join(project_manager.get_project_files()) or "(empty)"
+        else:
+            raise ValueError(f"Unknown tool: {tool_call.name}")
+
+        logging.info(
+            f"Tool {tool_call.name} completed for path: {args.get('path', '-')}"
+        )
+        return {
+            "type": "tool_result",
+            "tool_use_id": tool_call.id,
+            "content": result,
+        }
+
+    except Exception as e:
+        logging.error(f"Tool error ({tool_call.name}): {str(e)}")
+        return {
+            "type": "tool_result",
+            "tool_use_id": tool_call.id,
+            "content": f"Error: {str(e)}",
+            "is_error": True,
+        }
+
+
+async def execute_tool_calls(tool_calls: List) -> List[Dict[str, Any]]:
+    """Execute tool calls, running calls on different paths in parallel.
+
+    Calls that touch the same path keep their original order.
+    """
+    groups: Dict[str, List] = {}
+    for tool_call in tool_calls:
+        groups.setdefault(tool_call.input.get("path", ""), []).append(tool_call)
+
+    async def run_group(group: List) -> List[Dict[str, Any]]:
+        return [await execute_tool_call(tool_call) for tool_call in group]
+
+    results = {}
+    for group_results in await asyncio.gather(
+        *(run_group(group) for group in groups.values())
+    ):
+        for result in group_results:
+            results[result["tool_use_id"]] = result
+
+    return [results[tool_call.id] for tool_call in tool_calls]
+
+
+def summarize_tool_call(tool_call, result: Dict[str, Any]) -> str:
+    """Render a tool call result for the transcript."""
+    if tool_call.name == "read_file" and not result.get("is_error"):
+        summary = f"✓ Read {tool_call.input.get('path')}"
+    else:
+        summary = result["content"]
+    return f"\n### File Operation Result ({tool_call.name}):\n{summary}\n"
+
+
 def display_token_usage():
     """Display current token usage statistics and estimated costs."""
     from rich.table import Table
@@ -776,6 +1554,33 @@ async def handle_chat_command(command: str):
             console.print("No chat history found", style="yellow")
 
 
+def handle_cache_command(command: str):
+    """Handle response cache commands."""
+    action = command.lower()
+
+    if action == "on":
+        response_cache.enabled = True
+        console.print("Response cache enabled", style="green")
+    elif action == "off":
+        response_cache.enabled = False
+        console.print("Response cache disabled", style="yellow")
+    elif action == "clear":
+        removed = response_cache.clear()
+        console.print(f"Removed {removed} cached responses", style="yellow")
+    elif action == "status":
+        stats = response_cache.stats()
+        table = Table(title="Response Cache")
+        table.add_column("Setting", style="cyan")
+        table.add_column("Value", style="green")
+        table.add_row("Enabled", "Yes" if stats["enabled"] else "No")
+        table.add_row("Entries", str(stats["entries"]))
+        table.add_row("Size", f"{stats['bytes']:,} bytes")
+        table.add_row("Hits / Misses", f"{stats['hits']} / {stats['misses']}")
+        console.print(table)
+    else:
+        console.print(f"Unknown cache command: {action}", style="bold red")
+
+
 async def main():
     console.print(
         Panel(
@@ -785,6 +1590,8 @@ async def main():
             "- 'save': Save chat history\n"
             "- 'clear': Clear conversation history\n"
             "- 'tokens': Display token usage\n"
+            "- 'cache on|off|clear|status': Manage the response cache\n"
+            "- 'fresh <message>': Send a message without the response cache\n"
             "- 'search <query>': Perform a direct web search\n"
             "- 'project new <name>': Create a new project\n"
             "- 'project switch <name>': Switch to an existing project\n"
@@ -837,6 +1644,15 @@ async def main():
                 display_token_usage()
                 continue
 
+            elif user_input.lower().startswith("cache "):
+                handle_cache_command(user_input[6:].strip())
+                continue
+
+            elif user_input.lower().startswith("fresh "):
+                await chat_with_claude(user_input[6:].strip(), bypass_cache=True)
+                display_token_usage()
+                continue
+
             elif user_input.lower().startswith("project "):
                 await handle_project_command(user_input[8:].strip())
                 continue
@@ -968,7 +1784,8 @@ async def handle_file_command(command: str):
         if content.startswith("Error"):
             console.print(content, style="bold red")
         else:
-            syntax = Syntax(content, guess_lexer=True)
+            lexer = await project_manager.get_lexer(file_path, content)
+            syntax = Syntax(content, lexer)
             console.print(Panel(syntax, title=file_path, border_style="blue"))
 
     elif action == "list":